@@ -0,0 +1,68 @@
+# app/config.py
+"""
+Process-wide settings, read from the environment (and .env) exactly once at import.
+Modules import `settings` instead of calling load_dotenv()/os.getenv() themselves.
+"""
+import os
+from dotenv import load_dotenv
+
+_OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no", "off", "")
+
+
+class Settings:
+    def __init__(self):
+        self.database_url = os.getenv("DATABASE_URL", "sqlite:///./app/data/app.db")
+        # Apply pending migrations on boot; set AUTO_MIGRATE=0 where a deploy step runs them
+        self.auto_migrate = _flag("AUTO_MIGRATE", "1")
+        self.submissions_log = os.getenv("SUBMISSIONS_LOG", "app/data/submissions.jsonl")
+
+        self.judge0_url = os.getenv("JUDGE0_URL", "https://judge0-ce.p.rapidapi.com")
+        self.rapidapi_key = os.getenv("x-rapidapi-key")
+        self.judge0_timeout_s = float(os.getenv("JUDGE0_TIMEOUT_S", "30"))
+
+        self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+        self.openrouter_url = os.getenv("OPENROUTER_URL", _OPENROUTER_URL)
+        self.or_model = os.getenv("OR_MODEL", "openrouter/auto")
+        self.prompt_cache = _flag("OR_PROMPT_CACHE", "1")
+
+        self.http_max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+
+        self.rate_limit_enabled = _flag("RATE_LIMIT_ENABLED", "1")
+        # Overrides as "execute=30/10,submit=20/5" (requests per minute / burst); see app/services/rate_limit.py
+        self.rate_limits = os.getenv("RATE_LIMITS", "")
+        self.rate_limit_redis_url = os.getenv("RATE_LIMIT_REDIS_URL")
+        self.breaker_failure_rate = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+        self.breaker_window = int(os.getenv("BREAKER_WINDOW", "20"))
+        self.breaker_min_calls = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+        self.breaker_open_s = float(os.getenv("BREAKER_OPEN_S", "15"))
+        self.breaker_max_open_s = float(os.getenv("BREAKER_MAX_OPEN_S", "300"))
+        # Background thread draining submissions queued while Judge0 was unavailable
+        self.evaluation_worker = _flag("EVALUATION_WORKER", "1")
+        self.evaluation_poll_s = float(os.getenv("EVALUATION_POLL_S", "5"))
+
+        self.sandbox_max_inflight = int(os.getenv("SANDBOX_MAX_INFLIGHT", "32"))
+        self.llm_max_inflight = int(os.getenv("LLM_MAX_INFLIGHT", "16"))
+        # Generated questions at least this similar (estimated Jaccard) to a stored one are near-duplicates
+        self.question_dedup_threshold = float(os.getenv("QUESTION_DEDUP_THRESHOLD", "0.7"))
+        self.question_dedup_regenerate = int(os.getenv("QUESTION_DEDUP_REGENERATE", "1"))
+        # Columnar analytics store and how often the app refreshes it (0 = only via the CLI)
+        self.analytics_dir = os.getenv("ANALYTICS_DIR", "app/data/analytics")
+        self.analytics_export_s = float(os.getenv("ANALYTICS_EXPORT_S", "0"))
+        # Cached per-user GET responses (app/services/response_cache.py); share them across workers via Redis
+        self.response_cache_redis_url = os.getenv("RESPONSE_CACHE_REDIS_URL")
+        # Per-worker caches miss other workers' writes, so several workers (WEB_CONCURRENCY, read by
+        # uvicorn and gunicorn) without Redis default to no caching
+        multi_worker = int(os.getenv("WEB_CONCURRENCY") or "1") > 1
+        self.response_cache = _flag("RESPONSE_CACHE", "0" if multi_worker and not self.response_cache_redis_url else "1")
+        self.response_cache_ttl_s = float(os.getenv("RESPONSE_CACHE_TTL_S", "300"))
+        self.response_cache_max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+        self.trace_slow_ms = float(os.getenv("TRACE_SLOW_MS", "1000"))
+        self.otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+
+load_dotenv()
+settings = Settings()
@@ -1,15 +1,16 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-import os
+from app.config import settings
 
-DB_URL = os.getenv("DATABASE_URL", "sqlite:///./app/data/app.db")
+DB_URL = settings.database_url
 engine = create_engine(DB_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
 def create_tables():
-    import app.db.models as models
-    Base.metadata.create_all(bind=engine)
+    # Kept for scripts; schema changes go through app.db.migrations
+    from app.db.migrations import upgrade
+    upgrade(engine)
 
 def get_db():
     db = SessionLocal()
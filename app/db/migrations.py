@@ -0,0 +1,159 @@
+# app/db/migrations.py
+"""
+Versioned schema migrations. The schema_version table records which steps have run, so
+booting a worker costs one version lookup instead of a create_all() pass over every table.
+
+    python -m app.db.migrations upgrade     # apply pending migrations (deploy step)
+    python -m app.db.migrations current     # print the applied and head versions
+
+Each step runs in its own transaction and must be idempotent, because a database created by
+the baseline step already has everything the models declare.
+"""
+import argparse, logging
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, MetaData, String, Table, func, inspect, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from app.db.db import Base, engine as default_engine
+
+log = logging.getLogger("migrations")
+
+_meta = MetaData()
+schema_version = Table(
+    "schema_version", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime),
+)
+
+
+def _baseline(conn):
+    # Creates missing tables only, so databases that predate migrations are adopted as-is
+    import app.db.models  # noqa: F401
+    Base.metadata.create_all(bind=conn)
+
+
+def _create_index(conn, name: str, table: str, *columns: str):
+    # Bound to a throwaway Table so the step stays fixed even if the models change later
+    t = Table(table, MetaData(), *(Column(c) for c in columns))
+    Index(name, *(t.c[c] for c in columns)).create(bind=conn, checkfirst=True)
+
+
+def _hot_query_indexes(conn):
+    _create_index(conn, "ix_submissions_user_id", "submissions", "user_id")
+    _create_index(conn, "ix_submissions_question_id", "submissions", "question_id")
+    _create_index(conn, "ix_submission_tests_submission_id", "submission_tests", "submission_id")
+    _create_index(conn, "ix_study_plans_user_id", "study_plans", "user_id")
+    _create_index(conn, "ix_study_plan_items_plan_id", "study_plan_items", "plan_id")
+    _create_index(conn, "ix_long_term_memory_user_id_key", "long_term_memory", "user_id", "key")
+
+
+def _evaluation_jobs(conn):
+    from app.db.models import EvaluationJob
+    EvaluationJob.__table__.create(bind=conn, checkfirst=True)
+
+
+def _add_column(conn, table: str, column: str, ddl_type: str):
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def _test_verdicts(conn):
+    _add_column(conn, "submission_tests", "verdict", "VARCHAR(8)")
+
+
+def _submission_source(conn):
+    _add_column(conn, "submissions", "source_code", "TEXT")
+
+
+def _question_minhash(conn):
+    _add_column(conn, "questions", "minhash", LargeBinary().compile(dialect=conn.dialect))
+    _create_index(conn, "ix_questions_created_at", "questions", "created_at")
+
+
+def _question_pool(conn):
+    # Existing rows stay NULL: generated and client-supplied questions cannot be told apart
+    _add_column(conn, "questions", "origin", "VARCHAR")
+    _add_column(conn, "questions", "kind", "VARCHAR")
+    _add_column(conn, "questions", "topic_key", "VARCHAR")
+    _create_index(conn, "ix_questions_pool", "questions", "origin", "kind", "difficulty", "created_at")
+
+
+def _submission_run_hidden(conn):
+    _add_column(conn, "submissions", "run_hidden", "BOOLEAN")
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "indexes for user, question, submission and plan lookups", _hot_query_indexes),
+    (3, "evaluation_jobs queue for submissions deferred while Judge0 is down", _evaluation_jobs),
+    (4, "per-test verdict on submission_tests", _test_verdicts),
+    (5, "source code on submissions for re-grading", _submission_source),
+    (6, "near-duplicate signatures on questions", _question_minhash),
+    (7, "origin, kind and topics of pooled questions", _question_pool),
+    (8, "test set of each submission for re-grading", _submission_run_hidden),
+]
+HEAD = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine=None, target: int = HEAD) -> list:
+    """Apply pending migrations up to target; returns the versions applied."""
+    engine = engine or default_engine
+    with engine.begin() as conn:
+        _meta.create_all(bind=conn)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version > target:
+            break
+        try:
+            with engine.begin() as conn:
+                if current_version(conn) >= version:
+                    continue
+                step(conn)
+                conn.execute(insert(schema_version).values(
+                    version=version, description=description, applied_at=datetime.utcnow()))
+        except SQLAlchemyError:
+            # Another worker may have applied the same step concurrently
+            with engine.connect() as conn:
+                if current_version(conn) < version:
+                    raise
+            continue
+        log.info("applied migration %s: %s", version, description)
+        applied.append(version)
+    return applied
+
+
+def ensure_schema(engine=None, auto_migrate: bool = True) -> int:
+    """Boot-time check: return the schema version, migrating first if allowed."""
+    engine = engine or default_engine
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version >= HEAD:
+        return version
+    if not auto_migrate:
+        raise RuntimeError(f"database schema is at version {version}, expected {HEAD}; "
+                           "run `python -m app.db.migrations upgrade`")
+    upgrade(engine)
+    return HEAD
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["upgrade", "current"])
+    ap.add_argument("--target", type=int, default=HEAD)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "upgrade":
+        applied = upgrade(target=args.target)
+        print(f"applied: {applied or 'nothing'}")
+    with default_engine.connect() as conn:
+        print(f"current: {current_version(conn)}  head: {HEAD}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, Boolean, ForeignKey, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.db import Base
@@ -18,17 +18,25 @@ class Question(Base):
     difficulty = Column(String)
     topics = Column(JSON)  # list of strings
     raw = Column(JSON)     # full question JSON (sample and hidden tests etc.)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    minhash = Column(LargeBinary, nullable=True)  # near-duplicate signature, see services/question_dedup.py
+    # Set only for questions generated by the server (services/question_pool.py), never for client-supplied ones
+    origin = Column(String, nullable=True)
+    kind = Column(String, nullable=True)       # "coding" | "aptitude"
+    topic_key = Column(String, nullable=True)  # lowercased topics as "|arrays|hashing|"
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    __table_args__ = (Index("ix_questions_pool", "origin", "kind", "difficulty", "created_at"),)
 
 class Submission(Base):
     __tablename__ = "submissions"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
-    question_id = Column(String, ForeignKey("questions.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    question_id = Column(String, ForeignKey("questions.id"), nullable=True, index=True)
     language_id = Column(Integer)
     score_percent = Column(Float)
     passed = Column(Integer)
     total = Column(Integer)
+    source_code = Column(Text, nullable=True)  # kept so the submission can be re-graded
+    run_hidden = Column(Boolean, nullable=True)  # graded on hidden and stress tests too; NULL before migration 8
     created_at = Column(DateTime, default=datetime.utcnow)
     # relationships
     tests = relationship("SubmissionTest", back_populates="submission")
@@ -36,7 +44,7 @@ class Submission(Base):
 class SubmissionTest(Base):
     __tablename__ = "submission_tests"
     id = Column(Integer, primary_key=True, index=True)
-    submission_id = Column(Integer, ForeignKey("submissions.id"))
+    submission_id = Column(Integer, ForeignKey("submissions.id"), index=True)
     test_index = Column(Integer)
     stdin = Column(Text)
     expected = Column(Text)
@@ -45,10 +53,12 @@ class SubmissionTest(Base):
     passed = Column(Boolean)
     time = Column(Float)
     memory = Column(Integer)
+    verdict = Column(String(8))
     submission = relationship("Submission", back_populates="tests")
 
 class LongTermMemory(Base):
     __tablename__ = "long_term_memory"
+    __table_args__ = (Index("ix_long_term_memory_user_id_key", "user_id", "key"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     key = Column(String, index=True)   # e.g., 'goal', 'preferred_lang'
@@ -58,7 +68,7 @@ class LongTermMemory(Base):
 class StudyPlan(Base):
     __tablename__ = "study_plans"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     title = Column(String)
     raw = Column(JSON)  # store full plan JSON returned by LLM
     status = Column(String, default="active")
@@ -68,7 +78,18 @@ class StudyPlan(Base):
 class StudyPlanItem(Base):
     __tablename__ = "study_plan_items"
     id = Column(Integer, primary_key=True, index=True)
-    plan_id = Column(Integer, ForeignKey("study_plans.id"))
+    plan_id = Column(Integer, ForeignKey("study_plans.id"), index=True)
     item_index = Column(Integer)  # position
     raw = Column(JSON)            # e.g. {"day":"Mon","task":"Practice arrays","duration_min":45}
     completed = Column(Boolean, default=False)
+
+class EvaluationJob(Base):
+    __tablename__ = "evaluation_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id"), index=True)
+    status = Column(String, default="queued", index=True)  # queued | running | done | failed
+    payload = Column(JSON)   # everything needed to evaluate: source, language, testcases, limits
+    result = Column(JSON)    # summary, verdict and feedback once done
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
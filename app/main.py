@@ -1,17 +1,59 @@
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from app.routers import questions, executor, submissions, users  
-from app.routers import plans, memory
-from app.db.db import create_tables
+from app.routers import plans, memory, metrics, analytics
+from app.config import settings
+from app.db.db import engine
+from app.db.migrations import ensure_schema
+from app.services.metrics import (
+    HTTP_REQUEST_SECONDS, HTTP_REQUEST_DB_QUERIES, instrument_engine, start_request_query_count
+)
+from app.services import tracing
+from app.services.http_client import close_clients
+from app.services.evaluation_queue import start_worker
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    create_tables()
+    # Startup: a version check, not create_all; see app/db/migrations.py
+    ensure_schema(engine, auto_migrate=settings.auto_migrate)
+    worker = start_worker(settings.evaluation_poll_s) if settings.evaluation_worker else None
+    exporter = None
+    if settings.analytics_export_s > 0:
+        from app.services.analytics_export import start_exporter  # numpy only when enabled
+        exporter = start_exporter(settings.analytics_export_s)
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    if worker is not None:
+        worker.set()
+    if exporter is not None:
+        exporter.set()
+    close_clients()
 
 app = FastAPI(title="Placement Prep AI", lifespan=lifespan)
+instrument_engine(engine)
+tracing.instrument_engine(engine)
+tracing.configure_exporter()
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    queries = start_request_query_count()
+    start = time.perf_counter()
+    status = 500
+    with tracing.start_trace(f"{request.method} {request.url.path}") as root:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Trace-Id"] = root.trace.trace_id
+            return response
+        finally:
+            # Label by route template so /users/1 and /users/2 share a series
+            route = request.scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            root.name = f"{request.method} {path}"
+            root.set(status=status, db_queries=queries[0])
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=path, status=status)
+            HTTP_REQUEST_DB_QUERIES.observe(queries[0], method=request.method, route=path)
 
 app.include_router(questions.router, prefix="/questions", tags=["question"])
 app.include_router(executor.router, prefix="/executor", tags=["executor"])
@@ -20,3 +62,5 @@ app.include_router(users.router)
 app.include_router(plans.router)
 app.include_router(plans.alias_router)
 app.include_router(memory.router)
+app.include_router(metrics.router)
+app.include_router(analytics.router)
@@ -23,6 +23,13 @@ class CodingQuestion(BaseModel):
     hidden_testcases: List[HiddenTestCase]
     hints: List[str]
     canonical_solution: Optional[str]
+    checker: Optional[str] = None  # "default" | "exact" | "whitespace" | "float" | "unordered"
+    time_limit_s: Optional[float] = None     # per-test CPU time limit forwarded to the executor
+    memory_limit_kb: Optional[int] = None    # per-test memory limit forwarded to the executor
+    input_generator: Optional[str] = None    # program printing one max-constraint input for the seed on stdin
+    generator_language_id: Optional[int] = None   # defaults to Python 3
+    canonical_language_id: Optional[int] = None   # defaults to Python 3
+    stress_testcases: List[HiddenTestCase] = []   # cached generator + canonical_solution outputs
 
 class AptitudeQuestion(BaseModel):
     id: str
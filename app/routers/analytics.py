@@ -0,0 +1,66 @@
+# app/routers/analytics.py
+"""Cohort dashboards served from the precomputed summary written by app.services.analytics_export."""
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.services.analytics import load_summary
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+def _summary() -> dict:
+    summary = load_summary()
+    if summary is None:
+        raise HTTPException(status_code=503, detail="analytics have not been exported yet; "
+                                                    "run `python -m app.services.analytics_export`")
+    return summary
+
+
+def _cohort(summary: dict, cohort: str) -> dict:
+    data = summary["cohorts"].get(cohort)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"unknown cohort {cohort!r}")
+    return data
+
+
+@router.get("/cohorts")
+def list_cohorts():
+    """Signup-month cohorts ("all" is everyone) with their user and submission counts."""
+    s = _summary()
+    return {
+        "exported_at": s.get("exported_at"),
+        "cohorts": [{"cohort": name, "users": c["users"], "submissions": c["submissions"]}
+                    for name, c in s["cohorts"].items()],
+    }
+
+
+@router.get("/cohorts/{cohort}/topics")
+def cohort_topics(cohort: str, min_attempts: int = Query(0, ge=0)):
+    """Per-topic accuracy (passed / attempted tests) for the cohort, weakest first."""
+    s = _summary()
+    topics = [t for t in _cohort(s, cohort)["topics"] if t["attempts"] >= min_attempts]
+    return {"cohort": cohort, "exported_at": s.get("exported_at"), "topics": topics}
+
+
+@router.get("/cohorts/{cohort}/trends")
+def cohort_trends(cohort: str):
+    """Weekly submissions, solve rate and mean score for the cohort."""
+    s = _summary()
+    return {"cohort": cohort, "exported_at": s.get("exported_at"), "weeks": _cohort(s, cohort)["trends"]}
+
+
+@router.get("/questions/calibration")
+def question_calibration(
+    min_submissions: int = Query(1, ge=1),
+    mismatched: bool = Query(False, description="only questions whose calibrated difficulty differs from the label"),
+    difficulty: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=5000),
+):
+    """Observed solve rate, mean score and median accepted runtime per question, most attempted first."""
+    s = _summary()
+    rows = [
+        q for q in s["questions"]
+        if q["submissions"] >= min_submissions
+        and (difficulty is None or q["difficulty"] == difficulty)
+        and (not mismatched or (q["calibrated"] is not None and q["calibrated"] != q["difficulty"]))
+    ]
+    return {"exported_at": s.get("exported_at"), "count": len(rows), "questions": rows[:limit]}
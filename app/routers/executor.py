@@ -1,11 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from app.services.judge0_client import execute_code
 from app.models.code_model import CodeSubmission
+from app.services.rate_limit import limit
 
 router = APIRouter()
 
 
-@router.post("/execute")
+@router.post("/execute", dependencies=[Depends(limit("execute"))])
 def run_code(submission: CodeSubmission):
     result = execute_code(
         submission.source_code,
@@ -0,0 +1,11 @@
+# app/routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.metrics import render
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -1,10 +1,17 @@
 # app/routers/plans.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from datetime import datetime
-from app.services.study_plan import generate_study_plan, save_study_plan
+from app.services.study_plan import (
+    save_study_plan, enrich_saved_plan, llm_enrichment_enabled,
+    plans_to_dicts, plan_to_dict, replace_plan_items, update_plan_item
+)
+from app.services.plan_scheduler import build_local_plan, is_enriched
 from app.services.analytics import compute_weak_topics
+from app.services.rate_limit import limit
+from app.services.circuit_breaker import is_open
+from app.services.response_cache import cached_response, invalidate_plan
 
 router = APIRouter(prefix="/plans", tags=["plans"])
 
@@ -19,50 +26,44 @@ class PlanUpdate(BaseModel):
     goal: Optional[str] = None
     plan_json: Optional[Dict[str, Any]] = None
 
-@router.post("/generate")
-def generate_plan(profile: ProfileIn):
-    try:
-        weak = compute_weak_topics(profile.user_id)
-        plan = generate_study_plan(
-            user_profile=profile.model_dump(exclude={"user_id"}),
-            weak_topics=weak
-        )
-        plan_id = save_study_plan(profile.user_id, plan)
-        return {"ok": True, "plan_id": plan_id, "plan": plan, "fallback": False}
-    except Exception as e:
-        # Fallback: produce a simple local plan when external API is unavailable
-        days = profile.preferred_days or ["Mon", "Tue", "Wed", "Thu", "Fri"]
-        hours = max(1, profile.hours_per_week)
-        per_day = max(1, hours // max(1, len(days)))
-        items = []
-        for d in days:
-            items.append({
-                "day": d,
-                "topic": "core practice",
-                "activity": "Solve coding problems and review notes",
-                "duration_min": per_day * 60,
-                "notes": "Generated by offline fallback due to external service unavailability"
-            })
-        fallback_plan = {
-            "id": "local-fallback",
-            "title": profile.goal or "Study Plan",
-            "weeks": 4,
-            "total_hours_per_week": hours,
-            "items": items
-        }
-        plan_id = save_study_plan(profile.user_id, fallback_plan)
-        return {"ok": True, "plan_id": plan_id, "plan": fallback_plan, "fallback": True, "warning": str(e)}
+class PlanItemUpdate(BaseModel):
+    completed: Optional[bool] = None
+    day: Optional[str] = None
+    topic: Optional[str] = None
+    activity: Optional[str] = None
+    duration_min: Optional[int] = None
+    notes: Optional[str] = None
+
+@router.post("/generate", dependencies=[Depends(limit("plan"))])
+def generate_plan(profile: ProfileIn, background_tasks: BackgroundTasks):
+    weak = compute_weak_topics(profile.user_id)
+    plan, cache_key = build_local_plan(profile.model_dump(exclude={"user_id"}), weak)
+    plan_id = save_study_plan(profile.user_id, plan)
+    # Activity text is enriched by the LLM off the request path, once per cache key
+    enrichment = "disabled"
+    if is_enriched(cache_key):
+        enrichment = "cached"
+    elif llm_enrichment_enabled() and is_open("openrouter"):
+        # The local plan stands on its own; skip enrichment rather than queue calls to a dead upstream
+        enrichment = "unavailable"
+    elif llm_enrichment_enabled():
+        background_tasks.add_task(enrich_saved_plan, plan_id, plan, cache_key)
+        enrichment = "pending"
+    return {"ok": True, "plan_id": plan_id, "plan": plan, "fallback": False, "enrichment": enrichment}
 
 @router.get("/user/{user_id}")
-def get_plans(user_id: int):
+def get_plans(user_id: int, request: Request):
     from app.db.db import SessionLocal
     from app.db.models import StudyPlan
-    db = SessionLocal()
-    try:
-        plans = db.query(StudyPlan).filter(StudyPlan.user_id==user_id).all()
-        return {"ok": True, "plans": [ {"id": p.id, "title": p.title, "raw": p.raw, "status": p.status} for p in plans ]}
-    finally:
-        db.close()
+
+    def load():
+        db = SessionLocal()
+        try:
+            plans = db.query(StudyPlan).filter(StudyPlan.user_id==user_id).all()
+            return {"ok": True, "plans": plans_to_dicts(db, plans)}
+        finally:
+            db.close()
+    return cached_response(request, "plans_by_user", user_id, f"user:{user_id}", load)
 
 
 @router.put("/{plan_id}")
@@ -77,23 +78,43 @@ def update_plan(plan_id: int, payload: PlanUpdate):
         if payload.goal is not None:
             plan.title = payload.goal[:255]
         if payload.plan_json is not None:
-            plan.raw = payload.plan_json
+            replace_plan_items(db, plan, payload.plan_json)
         plan.updated_at = datetime.utcnow()
         db.add(plan)
         db.commit()
+        invalidate_plan(plan.id, plan.user_id)
         db.refresh(plan)
-        return {"ok": True, "plan": {"id": plan.id, "title": plan.title, "raw": plan.raw, "status": plan.status}}
+        return {"ok": True, "plan": plan_to_dict(db, plan)}
+    finally:
+        db.close()
+
+
+@router.patch("/{plan_id}/items/{item_id}")
+def update_plan_item_route(plan_id: int, item_id: int, payload: PlanItemUpdate):
+    from app.db.db import SessionLocal
+    db = SessionLocal()
+    try:
+        changes = payload.model_dump(exclude_unset=True, exclude={"completed"})
+        item = update_plan_item(db, plan_id, item_id, changes, completed=payload.completed)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Study plan item not found")
+        return {"ok": True, "item": item}
     finally:
         db.close()
 
 
+@router.patch("/{plan_id}/items/{item_id}/complete")
+def complete_plan_item(plan_id: int, item_id: int, completed: bool = True):
+    return update_plan_item_route(plan_id, item_id, PlanItemUpdate(completed=completed))
+
+
 # Alias router to support "/study-plans" paths
 alias_router = APIRouter(prefix="/study-plans", tags=["plans"])
 
 
-@alias_router.post("/")
-def generate_plan_alias(profile: ProfileIn):
-    return generate_plan(profile)
+@alias_router.post("/", dependencies=[Depends(limit("plan"))])
+def generate_plan_alias(profile: ProfileIn, background_tasks: BackgroundTasks):
+    return generate_plan(profile, background_tasks)
 
 
 @alias_router.put("/{plan_id}")
@@ -101,15 +122,23 @@ def update_plan_alias(plan_id: int, payload: PlanUpdate):
     return update_plan(plan_id, payload)
 
 
+@alias_router.patch("/{plan_id}/items/{item_id}")
+def update_plan_item_alias(plan_id: int, item_id: int, payload: PlanItemUpdate):
+    return update_plan_item_route(plan_id, item_id, payload)
+
+
 @alias_router.get("/{plan_id}")
-def get_plan_alias(plan_id: int):
+def get_plan_alias(plan_id: int, request: Request):
     from app.db.db import SessionLocal
     from app.db.models import StudyPlan
-    db = SessionLocal()
-    try:
-        plan = db.get(StudyPlan, plan_id)
-        if not plan:
-            raise HTTPException(status_code=404, detail="Study plan not found")
-        return {"ok": True, "plan": {"id": plan.id, "title": plan.title, "raw": plan.raw, "status": plan.status}}
-    finally:
-        db.close()
+
+    def load():
+        db = SessionLocal()
+        try:
+            plan = db.get(StudyPlan, plan_id)
+            if not plan:
+                raise HTTPException(status_code=404, detail="Study plan not found")
+            return {"ok": True, "plan": plan_to_dict(db, plan)}
+        finally:
+            db.close()
+    return cached_response(request, "plan", plan_id, f"plan:{plan_id}", load)
@@ -1,16 +1,61 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from app.services.api import generate_question
+from app.services.stress_tests import ensure_stress_tests, DEFAULT_STRESS_COUNT
+from app.services.rate_limit import limit
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.question_pool import add_to_pool, pick_from_pool
+from app.config import settings
 
 router = APIRouter()
 
-@router.get("/generate-question")
+def _regenerate_duplicates(q: dict, qtype: str, topic: str, difficulty: str) -> dict:
+    """Ask again while q near-duplicates a stored question; keeps the last one if retries run out or fail."""
+    from app.services.question_dedup import QUESTION_DUPLICATES, find_duplicate
+    avoid = []
+    for _ in range(settings.question_dedup_regenerate):
+        if find_duplicate(q) is None:
+            break
+        QUESTION_DUPLICATES.inc(action="regenerated")
+        avoid.append(q.get("title") or q.get("question_text") or "")
+        try:
+            q = generate_question(question_type=qtype, topic=topic, difficulty=difficulty, avoid=avoid)
+        except Exception:
+            break
+    return q
+
+@router.get("/generate-question", dependencies=[Depends(limit("generate"))])
 def get_question(
+    background_tasks: BackgroundTasks,
     topic: str = Query(..., description="topic, e.g. arrays or percentages"),
     difficulty: str = Query("medium", regex="^(easy|medium|hard)$"),
     type: str = Query("coding", regex="^(coding|aptitude)$")
 ):
     try:
         q = generate_question(question_type=type, topic=topic, difficulty=difficulty)
-        return {"ok": True, "question": q}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        # OpenRouter down or its output unusable: serve a previously generated question instead
+        pooled = pick_from_pool(type, topic, difficulty)
+        if pooled is not None:
+            return {"ok": True, "question": pooled, "source": "pool"}
+        if isinstance(e, CircuitOpenError):
+            raise HTTPException(status_code=503, detail=str(e),
+                                headers={"Retry-After": str(max(1, int(e.retry_after)))})
+        raise HTTPException(status_code=500, detail=str(e))
+    q = _regenerate_duplicates(q, type, topic, difficulty)
+    background_tasks.add_task(add_to_pool, q, difficulty)
+    return {"ok": True, "question": q, "source": "generated"}
+
+@router.post("/{question_id}/stress-tests", dependencies=[Depends(limit("stress"))])
+def build_question_stress_tests(
+    question_id: str,
+    count: int = Query(DEFAULT_STRESS_COUNT, ge=1, le=10),
+    refresh: bool = False
+):
+    try:
+        tests = ensure_stress_tests(question_id, count=count, refresh=refresh)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"ok": True, "question_id": question_id, "count": len(tests),
+            "input_sizes": [len(t["input"]) for t in tests]}
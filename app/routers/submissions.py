@@ -1,11 +1,22 @@
 # app/routers/submissions.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 from app.services.evaluator import run_tests_for_submission
-from app.services.feedback_client import request_feedback
+from app.services.feedback_client import request_feedback, feedback_payload
+from app.services.comparator import CHECKERS
+from app.services.analytics import compute_runtime_percentile
+from app.services.stress_tests import load_stress_tests
+from app.services.metrics import STAGE_SECONDS
+from app.services.rate_limit import ADMISSION_RETRY_AFTER_S, GATES, REJECTIONS, limit
+from app.services.circuit_breaker import CircuitOpenError, is_open
+from app.services.evaluation_queue import enqueue, evaluate_job, save_test_rows
+from app.services.response_cache import invalidate_users
+from app.config import settings
 from app.db.db import SessionLocal
-from app.db.models import Submission, SubmissionTest, Question
+from app.db.models import Submission, SubmissionTest, Question, EvaluationJob
+from sqlalchemy.exc import IntegrityError
 import time, json, os, uuid
 from datetime import datetime
 
@@ -22,77 +33,147 @@ class SubmissionRequest(BaseModel):
     source_code: str
     language_id: int
     run_hidden: bool = True
+    stream: bool = False                         # queue it and follow GET /submissions/{id}/stream
 
 class SubmissionResponse(BaseModel):
     ok: bool
     score_percent: float
     passed: int
     total: int
+    verdict: str = "AC"
+    runtime_s: Optional[float] = None
+    peak_memory_kb: Optional[int] = None
+    runtime_percentile: Optional[float] = None
     tests: List[Dict[str, Any]]
     feedback: Optional[str] = None
     submission_id: str
 
 # Ensure the submissions log file exists
-LOG_PATH = os.getenv("SUBMISSIONS_LOG", "app/data/submissions.jsonl")
+LOG_PATH = settings.submissions_log
 os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
 
-@router.post("/submit", response_model=SubmissionResponse)
+def _ensure_question(db, q: dict):
+    """Store the question in the questions table if it is not there yet."""
+    if db.get(Question, q["id"]):
+        return
+    db.add(Question(
+        id=q["id"],
+        title=q.get("title", "")[:255],
+        difficulty=q.get("difficulty", "unknown"),
+        topics=q.get("topics", []),
+        raw=q
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent submission stored the same question first
+        db.rollback()
+
+def _defer_submission(req: "SubmissionRequest", q: dict, testcases: list,
+                      stress_from_question: bool = False) -> JSONResponse:
+    """
+    Record the submission with its score pending and queue the evaluation (Judge0 down or a
+    streamed submit). With stress_from_question, the question's stored stress tests are not
+    copied into the job payload; the job loads them by question id when it runs.
+    """
+    db = SessionLocal()
+    try:
+        _ensure_question(db, q)
+        sub = Submission(
+            user_id=req.user_id,
+            question_id=q["id"],
+            language_id=req.language_id,
+            source_code=req.source_code,
+            run_hidden=req.run_hidden,
+            score_percent=None,
+            passed=0,
+            total=0,
+            created_at=datetime.utcnow()
+        )
+        db.add(sub)
+        db.flush()
+        sub_id = sub.id
+        enqueue(db, sub_id, {
+            "source_code": req.source_code,
+            "language_id": req.language_id,
+            "testcases": testcases,
+            "stress_question_id": q["id"] if stress_from_question else None,
+            "checker": q.get("checker"),
+            "time_limit_s": q.get("time_limit_s"),
+            "memory_limit_kb": q.get("memory_limit_kb"),
+            "question_title": q.get("title"),
+        })
+        db.commit()
+    finally:
+        db.close()
+    return JSONResponse(status_code=202, content={"ok": True, "queued": True, "status": "queued", "submission_id": str(sub_id),
+                                                  "stream_url": f"/submissions/{sub_id}/stream"})
+
+@router.post("/submit", response_model=SubmissionResponse, dependencies=[Depends(limit("submit"))])
 def submit_solution(req: SubmissionRequest):
     q = req.question
     # Minimal validation
     if not q.get("sample_testcases"):
         raise HTTPException(status_code=400, detail="question must include sample_testcases")
+    if q.get("checker") and q["checker"] not in CHECKERS:
+        raise HTTPException(status_code=400, detail=f"unknown checker {q['checker']!r}")
 
     # Ensure question has an id; generate if missing
     if not q.get("id"):
         q["id"] = str(uuid.uuid4())
 
     hidden = q.get("hidden_testcases", [])
-    testcases = q["sample_testcases"] + (hidden if req.run_hidden else [])
+    base = q["sample_testcases"] + (hidden if req.run_hidden else [])
+    stored_stress = load_stress_tests(q["id"]) if req.run_hidden else []
+    # Prefer the stress tests cached with the stored question over any sent by the client
+    stress = (stored_stress or q.get("stress_testcases", [])) if req.run_hidden else []
+    testcases = base + stress
+
+    # Judge0 known to be down: accept the submission now and grade it when it is back.
+    # Streamed submits take the same path; the stream request runs the evaluation.
+    if req.stream or is_open("judge0"):
+        if stored_stress:
+            return _defer_submission(req, q, base, stress_from_question=True)
+        return _defer_submission(req, q, testcases)
 
     # Run tests via evaluator
-    eval_out = run_tests_for_submission(req.source_code, req.language_id, testcases)
+    with STAGE_SECONDS.time(handler="submit", stage="evaluate"):
+        try:
+            eval_out = run_tests_for_submission(
+                req.source_code, req.language_id, testcases,
+                checker=q.get("checker"),
+                time_limit_s=q.get("time_limit_s"),
+                memory_limit_kb=q.get("memory_limit_kb")
+            )
+        except CircuitOpenError:
+            return _defer_submission(req, q, testcases)
 
     # Decide if feedback is needed (if not all tests passed)
     need_feedback = eval_out["passed"] < eval_out["total"]
-    failed_tests = [t for t in eval_out["tests"] if not t["passed"]]
     feedback_text = None
     if need_feedback:
-        feedback_payload = {
-            "question_title": q.get("title"),
-            "failed_tests": [
-                {"index": t["index"], "stdin": t["stdin"], "stdout": t["stdout"], "stderr": t["stderr"]} for t in failed_tests
-            ],
-            "language_id": req.language_id,
-            "source_code": req.source_code
-        }
         try:
-            feedback_text = request_feedback(feedback_payload)
+            with STAGE_SECONDS.time(handler="submit", stage="feedback"):
+                feedback_text = request_feedback(
+                    feedback_payload(q.get("title"), eval_out["tests"], req.language_id, req.source_code))
         except Exception as e:
             feedback_text = f"Feedback generation failed: {e}"
 
     # Persist submission to DB (and ensure question exists in questions table)
+    persist_start = time.perf_counter()
     db = SessionLocal()
     try:
         # Ensure question stored in questions table
         qid = q.get("id")
-        existing_q = db.get(Question, qid)
-        if not existing_q:
-            question_row = Question(
-                id=qid,
-                title=q.get("title", "")[:255],
-                difficulty=q.get("difficulty", "unknown"),
-                topics=q.get("topics", []),
-                raw=q
-            )
-            db.add(question_row)
-            db.commit()
+        _ensure_question(db, q)
 
         # Create submission record
         sub = Submission(
             user_id=req.user_id,
             question_id=qid,
             language_id=req.language_id,
+            source_code=req.source_code,
+            run_hidden=req.run_hidden,
             score_percent=eval_out["score_percent"],
             passed=eval_out["passed"],
             total=eval_out["total"],
@@ -101,22 +182,12 @@ def submit_solution(req: SubmissionRequest):
         db.add(sub)
         db.commit()
         db.refresh(sub)
+        sub_id = sub.id
 
         # Create per-test records
-        for t in eval_out["tests"]:
-            st = SubmissionTest(
-                submission_id=sub.id,
-                test_index=t.get("index"),
-                stdin=t.get("stdin"),
-                expected=t.get("expected"),
-                stdout=t.get("stdout"),
-                stderr=t.get("stderr"),
-                passed=bool(t.get("passed")),
-                time=t.get("time"),
-                memory=t.get("memory")
-            )
-            db.add(st)
+        save_test_rows(db, sub_id, eval_out["tests"])
         db.commit()
+        invalidate_users(req.user_id)
     except Exception as e:
         db.rollback()
         # still persist to JSONL log for audit
@@ -136,11 +207,13 @@ def submit_solution(req: SubmissionRequest):
         raise HTTPException(status_code=500, detail=f"Database error saving submission: {e}")
     finally:
         db.close()
+        STAGE_SECONDS.observe(time.perf_counter() - persist_start, handler="submit", stage="persist")
 
     # Also append to JSONL log (audit)
+    log_start = time.perf_counter()
     submission_record = {
         "timestamp": time.time(),
-        "submission_id": sub.id,
+        "submission_id": sub_id,
         "user_id": req.user_id,
         "question_id": q.get("id"),
         "language_id": req.language_id,
@@ -152,15 +225,25 @@ def submit_solution(req: SubmissionRequest):
     }
     with open(LOG_PATH, "a") as f:
         f.write(json.dumps(submission_record) + "\n")
+    STAGE_SECONDS.observe(time.perf_counter() - log_start, handler="submit", stage="log")
+
+    runtime_percentile = None
+    if eval_out["verdict"] == "AC":
+        with STAGE_SECONDS.time(handler="submit", stage="percentile"):
+            runtime_percentile = compute_runtime_percentile(qid, eval_out["runtime_s"], exclude_submission_id=sub_id)
 
     return {
         "ok": True,
         "score_percent": eval_out["score_percent"],
         "passed": eval_out["passed"],
         "total": eval_out["total"],
+        "verdict": eval_out["verdict"],
+        "runtime_s": eval_out["runtime_s"],
+        "peak_memory_kb": eval_out["peak_memory_kb"],
+        "runtime_percentile": runtime_percentile,
         "tests": eval_out["tests"],
         "feedback": feedback_text,
-        "submission_id": str(sub.id)
+        "submission_id": str(sub_id)
     }
 
 
@@ -189,6 +272,7 @@ def create_simple_submission(payload: SimpleSubmissionIn):
         )
         db.add(sub)
         db.commit()
+        invalidate_users(payload.user_id)
         db.refresh(sub)
 
         record = {
@@ -231,3 +315,146 @@ def list_submissions_by_user(user_id: int):
         ]
     finally:
         db.close()
+
+
+@router.get("/{submission_id}")
+def get_submission(submission_id: int):
+    """Submission with its per-test rows; status is queued/running/failed while a deferred evaluation is pending."""
+    db = SessionLocal()
+    try:
+        s = db.get(Submission, submission_id)
+        if s is None:
+            raise HTTPException(status_code=404, detail="submission not found")
+        job = db.query(EvaluationJob).filter(EvaluationJob.submission_id == submission_id).first()
+        tests = (
+            db.query(SubmissionTest)
+            .filter(SubmissionTest.submission_id == submission_id)
+            .order_by(SubmissionTest.test_index)
+            .all()
+        )
+        return {
+            "id": s.id,
+            "user_id": s.user_id,
+            "question_id": s.question_id,
+            "language_id": s.language_id,
+            "status": job.status if job else "done",
+            "score_percent": s.score_percent,
+            "passed": s.passed,
+            "total": s.total,
+            "result": job.result if job else None,
+            "tests": [
+                {"index": t.test_index, "verdict": t.verdict, "passed": t.passed, "time": t.time,
+                 "memory": t.memory, "stdout": t.stdout, "stderr": t.stderr}
+                for t in tests
+            ],
+            "created_at": s.created_at.isoformat() if s.created_at else None,
+        }
+    finally:
+        db.close()
+
+
+# Server-sent events for GET /{submission_id}/stream
+_STREAM_POLL_S = 0.5
+_STREAM_KEEPALIVE_S = 15
+_STREAM_TIMEOUT_S = 600
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stored_tests(db, submission_id: int, after: int) -> list:
+    rows = (
+        db.query(SubmissionTest)
+        .filter(SubmissionTest.submission_id == submission_id, SubmissionTest.test_index > after)
+        .order_by(SubmissionTest.test_index)
+        .all()
+    )
+    return [{"index": t.test_index, "verdict": t.verdict, "passed": t.passed, "time": t.time,
+             "memory": t.memory, "stdout": t.stdout, "stderr": t.stderr} for t in rows]
+
+def _stream_events(submission_id: int):
+    """
+    Replay stored test rows, then either run the queued evaluation in this request (emitting
+    each test as it finishes) or follow one running elsewhere by polling its rows. Running it
+    takes a sandbox gate slot, like /submit does.
+    """
+    gate = GATES["sandbox"] if settings.rate_limit_enabled else None
+    sent = -1
+    last_status = None
+    deadline = time.monotonic() + _STREAM_TIMEOUT_S
+    last_event = time.monotonic()
+    while True:
+        db = SessionLocal()
+        try:
+            s = db.get(Submission, submission_id)
+            job = db.query(EvaluationJob).filter(EvaluationJob.submission_id == submission_id).first()
+            status = job.status if job else "done"
+            for t in _stored_tests(db, submission_id, sent):
+                sent = t["index"]
+                yield _sse("test", t)
+                last_event = time.monotonic()
+            if status == "done":
+                yield _sse("result", {"status": "done", "score_percent": s.score_percent, "passed": s.passed,
+                                      "total": s.total, **((job.result or {}) if job else {})})
+                return
+            if status == "failed":
+                yield _sse("status", {"status": "failed", **(job.result or {})})
+                return
+            job_id = job.id
+        finally:
+            db.close()
+
+        if status != last_status:
+            yield _sse("status", {"status": status})
+            last_status = status
+            last_event = time.monotonic()
+        # With the sandbox at capacity, keep following and leave the job to the worker
+        if status == "queued" and not is_open("judge0") and (gate is None or gate.try_enter()):
+            sent = -1
+            try:
+                for kind, data in evaluate_job(job_id):
+                    yield _sse(kind, data)
+                    last_event = time.monotonic()
+                    if kind == "test":
+                        sent = data["index"]
+                    elif kind == "result" or data["status"] == "failed":
+                        return
+                    elif "error" in data:
+                        # Requeued after an ordinary error; the worker retries it with its own pacing
+                        return
+                    else:
+                        last_status = data["status"]
+            finally:
+                if gate is not None:
+                    gate.leave()
+            continue
+        if time.monotonic() > deadline:
+            yield _sse("status", {"status": status, "timeout": True})
+            return
+        if time.monotonic() - last_event > _STREAM_KEEPALIVE_S:
+            yield ": keep-alive\n\n"
+            last_event = time.monotonic()
+        time.sleep(_STREAM_POLL_S)
+
+
+@router.get("/{submission_id}/stream")
+def stream_submission(submission_id: int):
+    """
+    Server-sent events for one submission: a `test` event per finished test, `status` events
+    while it waits (queued/running, or failed), and a final `result` with score, verdict and feedback.
+    """
+    db = SessionLocal()
+    try:
+        if db.get(Submission, submission_id) is None:
+            raise HTTPException(status_code=404, detail="submission not found")
+        job = db.query(EvaluationJob).filter(EvaluationJob.submission_id == submission_id).first()
+        runs_here = job is not None and job.status == "queued" and not is_open("judge0")
+    finally:
+        db.close()
+    # The evaluation would run in this request; shed it like /submit when the sandbox is at capacity
+    gate = GATES["sandbox"]
+    if runs_here and settings.rate_limit_enabled and gate.in_flight >= gate.capacity:
+        REJECTIONS.inc(route_class="submit", reason="capacity")
+        raise HTTPException(status_code=503, detail="server busy, retry later",
+                            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_S)})
+    return StreamingResponse(_stream_events(submission_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
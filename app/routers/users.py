@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from app.db.db import get_db
 from app.db import models
+from app.services.response_cache import cached_response, invalidate_users
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -28,9 +29,9 @@ def list_user_submissions(user_id: int, db: Session = Depends(get_db)):
     ]
 
 @router.get("/{user_id}/weak-topics")
-def get_weak_topics(user_id: int):
+def get_weak_topics(user_id: int, request: Request):
     from app.services.analytics import compute_weak_topics
-    return compute_weak_topics(user_id)
+    return cached_response(request, "weak_topics", user_id, f"user:{user_id}", lambda: compute_weak_topics(user_id))
 
 class UserCreate(BaseModel):
     email: str
@@ -43,8 +44,11 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     db.add(user)
     db.commit()
     db.refresh(user)
+    # A lookup of this id before it existed may have cached null
+    invalidate_users(user.id)
     return {"id": user.id, "email": user.email, "name": user.name}
 
 @router.get("/{user_id}")
-def get_user(user_id: int, db: Session = Depends(get_db)):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+def get_user(user_id: int, request: Request, db: Session = Depends(get_db)):
+    return cached_response(request, "user", user_id, f"user:{user_id}",
+                           lambda: db.query(models.User).filter(models.User.id == user_id).first())
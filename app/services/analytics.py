@@ -1,3 +1,5 @@
+import json, os, threading
+from app.config import settings
 from app.db.db import SessionLocal
 from sqlalchemy import func
 from app.db.models import Submission, SubmissionTest, Question
@@ -18,18 +20,63 @@ def compute_weak_topics(user_id: int, min_attempts: int = 3, threshold: float =
                 topics_stats[topic]["attempts"] += total
                 topics_stats[topic]["passed"] += passed
 
-            ret = []
+        ret = []
 
-            for topics, v in topics_stats.items():
-                attempts = v["attempts"]
-                passed = v["passed"]
-                if attempts >= min_attempts:
-                    acc = passed/attempts if attempts > 0 else 0.0
-                    if acc < threshold:
-                        ret.append({"topic": topic, "attempts": attempts, "accuracy": acc})
+        for topic, v in topics_stats.items():
+            attempts = v["attempts"]
+            passed = v["passed"]
+            if attempts >= min_attempts:
+                acc = passed/attempts if attempts > 0 else 0.0
+                if acc < threshold:
+                    ret.append({"topic": topic, "attempts": attempts, "accuracy": acc})
 
-            ret.sort(key = lambda x: x["accuracy"])
-            return ret
-    
+        ret.sort(key = lambda x: x["accuracy"])
+        return ret
+
+    finally:
+        db.close()
+
+
+def compute_runtime_percentile(question_id: str, runtime_s: float, exclude_submission_id: int = None):
+    """
+    Percentage of other fully-passing submissions for the same question that were slower
+    than runtime_s (slowest test per submission). Returns None when there is nothing to compare.
+    """
+    if runtime_s is None:
+        return None
+    db = SessionLocal()
+    try:
+        q = (
+            db.query(func.max(SubmissionTest.time))
+            .join(Submission, Submission.id == SubmissionTest.submission_id)
+            .filter(Submission.question_id == question_id, Submission.passed == Submission.total)
+        )
+        if exclude_submission_id is not None:
+            q = q.filter(Submission.id != exclude_submission_id)
+        runtimes = [r[0] for r in q.group_by(SubmissionTest.submission_id).all() if r[0] is not None]
+        if not runtimes:
+            return None
+        slower = sum(1 for r in runtimes if r > runtime_s)
+        ties = sum(1 for r in runtimes if r == runtime_s)
+        return round(100.0 * (slower + 0.5 * ties) / len(runtimes), 1)
     finally:
         db.close()
+
+
+_summary = {"mtime": None, "data": None}
+_summary_lock = threading.Lock()
+
+
+def load_summary():
+    """Cohort summary written by app.services.analytics_export, reloaded when the file changes; None if absent."""
+    path = os.path.join(settings.analytics_dir, "summary.json")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _summary_lock:
+        if _summary["mtime"] != mtime:
+            with open(path) as f:
+                _summary["data"] = json.load(f)
+            _summary["mtime"] = mtime
+        return _summary["data"]
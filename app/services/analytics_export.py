@@ -0,0 +1,406 @@
+# app/services/analytics_export.py
+"""
+Columnar export of submissions, submission tests, questions and users for cohort reporting,
+and the vectorized aggregations that turn it into the summaries served under /analytics.
+
+    python -m app.services.analytics_export            # export new submissions, rebuild summary.json
+    python -m app.services.analytics_export --full     # start over, e.g. after a bulk re-grade
+
+The store is a directory (ANALYTICS_DIR) of .npz files in an Arrow-like layout: one array
+per column, strings dictionary-encoded as integer codes, and missing values stored as NaN or -1.
+
+Each run appends a segment with the submissions added since the last export, together with
+their test rows. Submissions that were still waiting for a queued evaluation last time are
+picked up once graded. Users and questions are small and rewritten whole; question codes
+stay stable across runs. The database is only scanned in id order. Every aggregation runs on
+the arrays: topic accuracy and weekly pass-rate trends per signup-month cohort, plus
+per-question difficulty calibration. Results are written to summary.json.
+"""
+import argparse, json, logging, os, threading, time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import or_, select
+from app.config import settings
+from app.db.db import engine
+from app.db.models import Question, Submission, SubmissionTest, User
+
+log = logging.getLogger("analytics_export")
+
+_MAX_SEGMENTS = 32
+_LOCK_STALE_S = 3600
+_DAY_S = 86400
+# Questions with fewer submissions than this are not calibrated
+MIN_CALIBRATION_SUBMISSIONS = 20
+
+
+def _save_npz(path: str, **arrays):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _load_npz(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+
+def _save_json(path: str, data: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch(dt: Optional[datetime]) -> int:
+    return int((dt - _EPOCH).total_seconds()) if dt else 0
+
+
+def _export_users(conn) -> Dict[str, np.ndarray]:
+    rows = conn.execute(select(User.id, User.created_at).order_by(User.id)).all()
+    months = [r.created_at.strftime("%Y-%m") if r.created_at else "unknown" for r in rows]
+    cohorts, codes = np.unique(np.array(months, dtype=str), return_inverse=True) if rows else (np.array([], dtype=str), [])
+    return {"id": np.array([r.id for r in rows], dtype=np.int64),
+            "cohort": np.asarray(codes, dtype=np.int32), "cohorts": cohorts}
+
+
+def _export_questions(conn, previous: Optional[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    rows = {r.id: r for r in conn.execute(select(Question.id, Question.difficulty, Question.topics))}
+    # Earlier segments store question codes, so known ids keep their position
+    ids = [str(i) for i in previous["id"]] if previous is not None else []
+    known = set(ids)
+    ids += sorted(i for i in rows if i not in known)
+    vocab: Dict[str, int] = {}
+    ptr, codes, difficulty = [0], [], []
+    for qid in ids:
+        r = rows.get(qid)
+        topics = [t for t in ((r.topics if r is not None else None) or []) if t]
+        for t in dict.fromkeys(topics):
+            codes.append(vocab.setdefault(t, len(vocab)))
+        ptr.append(len(codes))
+        difficulty.append((r.difficulty if r is not None else None) or "unknown")
+    return {"id": np.array(ids, dtype=str), "difficulty": np.array(difficulty, dtype=str),
+            "topic_ptr": np.array(ptr, dtype=np.int64), "topic_code": np.array(codes, dtype=np.int32),
+            "topics": np.array(list(vocab), dtype=str)}
+
+
+def _fetch_blocks(conn, stmt) -> list:
+    # Each fetched block is transposed into columns rather than appended row by row
+    return [list(zip(*part)) for part in conn.execution_options(yield_per=50000).execute(stmt).partitions()]
+
+
+def _column(blocks: list, i: int, dtype) -> np.ndarray:
+    if not blocks:
+        return np.array([], dtype=dtype)
+    return np.concatenate([np.array(b[i], dtype=dtype) for b in blocks])  # None -> NaN / NaT
+
+
+def _export_segment(conn, code_of: Dict[str, int], since_id: int, pending: List[int]):
+    """Columns for submissions after since_id (plus previously pending ones); returns (segment, last_id, pending)."""
+    cond = Submission.id > since_id
+    if pending:
+        cond = or_(cond, Submission.id.in_(pending))
+    stmt = (select(Submission.id, Submission.user_id, Submission.question_id, Submission.language_id,
+                   Submission.score_percent, Submission.passed, Submission.total, Submission.created_at)
+            .where(cond).order_by(Submission.id))
+    blocks = _fetch_blocks(conn, stmt)
+    sub_id = _column(blocks, 0, np.int64)
+    score = _column(blocks, 4, np.float64)
+    graded = ~np.isnan(score)  # ungraded rows are waiting on a queued evaluation; export them later
+    created = _column(blocks, 7, "datetime64[s]")
+    seg = {
+        "sub_id": sub_id[graded],
+        "user_id": np.nan_to_num(_column(blocks, 1, np.float64), nan=-1).astype(np.int64)[graded],
+        "question": np.array([code_of.get(q, -1) for b in blocks for q in b[2]], dtype=np.int32)[graded],
+        "language_id": np.nan_to_num(_column(blocks, 3, np.float64)).astype(np.int32)[graded],
+        "score": score[graded],
+        "passed": np.nan_to_num(_column(blocks, 5, np.float64)).astype(np.int32)[graded],
+        "total": np.nan_to_num(_column(blocks, 6, np.float64)).astype(np.int32)[graded],
+        "created_at": np.where(np.isnat(created), 0, created.astype(np.int64))[graded],
+    }
+    last_id = max(since_id, int(sub_id.max()) if len(sub_id) else 0)
+    still_pending = sub_id[~graded].tolist()
+
+    tcond = SubmissionTest.submission_id > since_id
+    if pending:
+        tcond = or_(tcond, SubmissionTest.submission_id.in_(pending))
+    tstmt = select(SubmissionTest.submission_id, SubmissionTest.test_index, SubmissionTest.passed,
+                   SubmissionTest.time, SubmissionTest.memory).where(tcond)
+    blocks = _fetch_blocks(conn, tstmt)
+    t_sub, t_index, t_passed = (_column(blocks, 0, np.int64), _column(blocks, 1, np.float64),
+                                _column(blocks, 2, np.float64))
+    t_time, t_memory = _column(blocks, 3, np.float64), _column(blocks, 4, np.float64)
+    keep = np.isin(t_sub, seg["sub_id"])
+    seg.update({
+        "test_sub": t_sub[keep], "test_index": np.nan_to_num(t_index[keep], nan=-1).astype(np.int32),
+        "test_passed": np.nan_to_num(t_passed[keep]).astype(bool),
+        "test_time": t_time[keep], "test_memory": t_memory[keep],
+    })
+    return seg, last_id, still_pending
+
+
+def load_store(directory: Optional[str] = None, segments: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """Exported segments (default: all in the manifest) concatenated column by column."""
+    directory = directory or settings.analytics_dir
+    if segments is None:
+        with open(os.path.join(directory, "manifest.json")) as f:
+            segments = json.load(f)["segments"]
+    segs = [_load_npz(os.path.join(directory, name)) for name in segments]
+    if not segs:
+        return {}
+    return {k: np.concatenate([s[k] for s in segs]) for k in segs[0]}
+
+
+def _pair_counts(group: np.ndarray, member: np.ndarray, n_groups: int) -> np.ndarray:
+    # Distinct members per group
+    if not len(group):
+        return np.zeros(n_groups, dtype=np.int64)
+    pairs = np.unique(group.astype(np.int64) * (int(member.max()) + 2) + (member + 1))
+    return np.bincount(pairs // (int(member.max()) + 2), minlength=n_groups)
+
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / np.maximum(den, 1), np.nan)
+
+
+def _clean(x):
+    x = float(x)
+    return None if np.isnan(x) else round(x, 4)
+
+
+def build_summary(store: Dict[str, np.ndarray], users: Dict[str, np.ndarray],
+                  questions: Dict[str, np.ndarray]) -> dict:
+    n = len(store.get("sub_id", ()))
+    cohort_names = [str(c) for c in users["cohorts"]]
+    C = len(cohort_names)
+    if n == 0:
+        empty = {"users": 0, "submissions": 0, "topics": [], "trends": []}
+        return {"submissions": 0, "cohorts": {"all": empty}, "questions": []}
+
+    uid, q = store["user_id"], store["question"]
+    score, passed, total = store["score"], store["passed"], store["total"]
+    solved = (passed == total) & (total > 0)
+
+    # Signup-month cohort of each submission's user; -1 for anonymous or unknown users
+    cohort = np.full(n, -1, dtype=np.int64)
+    if len(users["id"]):
+        pos = np.clip(np.searchsorted(users["id"], uid), 0, len(users["id"]) - 1)
+        hit = (uid >= 0) & (users["id"][pos] == uid)
+        cohort[hit] = users["cohort"][pos[hit]]
+    # Group 0 is everyone, 1..C the cohorts
+    groups = [(np.arange(n), np.zeros(n, dtype=np.int64))]
+    in_cohort = np.nonzero(cohort >= 0)[0]
+    groups.append((in_cohort, cohort[in_cohort] + 1))
+    rows = np.concatenate([g[0] for g in groups])
+    gid = np.concatenate([g[1] for g in groups])
+    G = C + 1
+
+    # Topics: one row per (submission, topic of its question)
+    valid = rows[q[rows] >= 0]
+    vgid = gid[q[rows] >= 0]
+    ptr, tcode = questions["topic_ptr"], questions["topic_code"]
+    T = len(questions["topics"])
+    counts = ptr[q[valid] + 1] - ptr[q[valid]]
+    rep = np.repeat(np.arange(len(valid)), counts)
+    within = np.arange(len(rep)) - np.repeat(np.cumsum(counts) - counts, counts)
+    topic = tcode[np.repeat(ptr[q[valid]], counts) + within]
+    sub = valid[rep]
+    key = vgid[rep] * T + topic
+    t_attempts = np.bincount(key, weights=total[sub], minlength=G * T).reshape(G, T)
+    t_passed = np.bincount(key, weights=passed[sub], minlength=G * T).reshape(G, T)
+    t_subs = np.bincount(key, minlength=G * T).reshape(G, T)
+    has_user = uid[sub] >= 0
+    t_users = _pair_counts(key[has_user], uid[sub][has_user], G * T).reshape(G, T)
+    t_acc = _ratio(t_passed, t_attempts)
+
+    # Weekly trends, weeks starting on Monday (1970-01-01 was a Thursday)
+    created = store["created_at"]
+    dated = rows[created[rows] > 0]
+    dgid = gid[created[rows] > 0]
+    week = (created[dated] // _DAY_S + 3) // 7
+    weeks, widx = np.unique(week, return_inverse=True)
+    W = len(weeks)
+    wkey = dgid * W + widx
+    w_subs = np.bincount(wkey, minlength=G * W).reshape(G, W)
+    w_solved = np.bincount(wkey, weights=solved[dated], minlength=G * W).reshape(G, W)
+    w_score = np.bincount(wkey, weights=np.nan_to_num(score[dated]), minlength=G * W).reshape(G, W)
+    week_start = [(_EPOCH + timedelta(days=int(w) * 7 - 3)).date().isoformat() for w in weeks]
+
+    g_subs = np.bincount(gid, minlength=G)
+    g_users = _pair_counts(gid[uid[rows] >= 0], uid[rows][uid[rows] >= 0], G)
+
+    out = {}
+    for g, name in enumerate(["all"] + cohort_names):
+        if g > 0 and g_subs[g] == 0:
+            continue
+        order = np.argsort(np.nan_to_num(t_acc[g], nan=2.0))
+        out[name] = {
+            "users": int(g_users[g]),
+            "submissions": int(g_subs[g]),
+            "topics": [
+                {"topic": str(questions["topics"][t]), "submissions": int(t_subs[g, t]),
+                 "users": int(t_users[g, t]), "attempts": int(t_attempts[g, t]),
+                 "passed": int(t_passed[g, t]), "accuracy": _clean(t_acc[g, t])}
+                for t in order if t_subs[g, t] > 0
+            ],
+            "trends": [
+                {"week": week_start[w], "submissions": int(w_subs[g, w]), "solved": int(w_solved[g, w]),
+                 "solve_rate": _clean(w_solved[g, w] / w_subs[g, w]),
+                 "mean_score": _clean(w_score[g, w] / w_subs[g, w])}
+                for w in range(W) if w_subs[g, w] > 0
+            ],
+        }
+    return {"submissions": n, "cohorts": out, "questions": _calibration(store, questions, solved)}
+
+
+def _calibration(store: Dict[str, np.ndarray], questions: Dict[str, np.ndarray], solved: np.ndarray) -> list:
+    q, uid, score = store["question"], store["user_id"], store["score"]
+    Q = len(questions["id"])
+    known = q >= 0
+    qs = q[known]
+    subs = np.bincount(qs, minlength=Q)
+    solves = np.bincount(qs, weights=solved[known], minlength=Q)
+    score_sum = np.bincount(qs, weights=np.nan_to_num(score[known]), minlength=Q)
+    with_user = known & (uid >= 0)
+    users = _pair_counts(q[with_user], uid[with_user], Q)
+    solve_rate = _ratio(solves, subs)
+
+    # Slowest test per submission, then the median of that over each question's solved submissions
+    runtime = np.full(len(q), np.nan)
+    if len(store["test_sub"]):
+        order = np.argsort(store["sub_id"])
+        pos = np.searchsorted(store["sub_id"], store["test_sub"], sorter=order)
+        pos = np.clip(pos, 0, len(order) - 1)
+        hit = store["sub_id"][order[pos]] == store["test_sub"]
+        np.fmax.at(runtime, order[pos[hit]], store["test_time"][hit])
+    sel = known & solved & ~np.isnan(runtime)
+    median = np.full(Q, np.nan)
+    if sel.any():
+        srt = np.lexsort((runtime[sel], q[sel]))
+        rq, rt = q[sel][srt], runtime[sel][srt]
+        uq, start, cnt = np.unique(rq, return_index=True, return_counts=True)
+        median[uq] = (rt[start + (cnt - 1) // 2] + rt[start + cnt // 2]) / 2
+
+    # Difficulty from observed solve rate: bottom third hard, top third easy
+    eligible = subs >= MIN_CALIBRATION_SUBMISSIONS
+    calibrated = np.full(Q, None, dtype=object)
+    if eligible.any():
+        lo, hi = np.quantile(solve_rate[eligible], [1 / 3, 2 / 3])
+        calibrated[eligible] = np.where(solve_rate[eligible] < lo, "hard",
+                                        np.where(solve_rate[eligible] >= hi, "easy", "medium"))
+    return [
+        {"question_id": str(questions["id"][i]), "difficulty": str(questions["difficulty"][i]),
+         "calibrated": calibrated[i], "submissions": int(subs[i]), "users": int(users[i]),
+         "solve_rate": _clean(solve_rate[i]), "mean_score": _clean(score_sum[i] / subs[i]),
+         "median_runtime_s": _clean(median[i])}
+        for i in np.argsort(-subs, kind="stable") if subs[i] > 0
+    ]
+
+
+def _acquire(lock: str) -> bool:
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        if time.time() - os.path.getmtime(lock) < _LOCK_STALE_S:
+            return False
+        os.remove(lock)  # left by an export that died
+        return _acquire(lock)
+
+
+def export(full: bool = False, directory: Optional[str] = None) -> dict:
+    """Export new submissions to the columnar store and rebuild summary.json; returns run stats."""
+    directory = directory or settings.analytics_dir
+    os.makedirs(directory, exist_ok=True)
+    lock = os.path.join(directory, ".export.lock")
+    if not _acquire(lock):
+        return {"skipped": "another export is running"}
+    try:
+        return _export(full, directory)
+    finally:
+        os.remove(lock)
+
+
+def _export(full: bool, directory: str) -> dict:
+    started = time.perf_counter()
+    if full:
+        for name in os.listdir(directory):
+            if name.endswith((".npz", ".json")):
+                os.remove(os.path.join(directory, name))
+    manifest_path = os.path.join(directory, "manifest.json")
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {"last_submission_id": 0, "pending": [], "segments": [], "next_segment": 1}
+    questions_path = os.path.join(directory, "questions.npz")
+    previous = _load_npz(questions_path) if os.path.exists(questions_path) else None
+
+    with engine.connect() as conn:
+        users = _export_users(conn)
+        questions = _export_questions(conn, previous)
+        code_of = {str(qid): i for i, qid in enumerate(questions["id"])}
+        seg, last_id, pending = _export_segment(conn, code_of, manifest["last_submission_id"], manifest["pending"])
+    exported_s = time.perf_counter() - started
+
+    _save_npz(os.path.join(directory, "users.npz"), **users)
+    _save_npz(questions_path, **questions)
+    if len(seg["sub_id"]):
+        name = f"segment-{manifest['next_segment']:06d}.npz"
+        _save_npz(os.path.join(directory, name), **seg)
+        manifest["segments"].append(name)
+        manifest["next_segment"] += 1
+    old = []
+    if len(manifest["segments"]) > _MAX_SEGMENTS:
+        # Compact: one segment is cheaper to load than many small ones
+        old = manifest["segments"]
+        merged = load_store(directory, old)
+        name = f"segment-{manifest['next_segment']:06d}.npz"
+        _save_npz(os.path.join(directory, name), **merged)
+        manifest["segments"] = [name]
+        manifest["next_segment"] += 1
+    manifest.update(last_submission_id=last_id, pending=pending, exported_at=datetime.utcnow().isoformat())
+    _save_json(manifest_path, manifest)
+    for name in old:
+        os.remove(os.path.join(directory, name))
+
+    t = time.perf_counter()
+    summary = build_summary(load_store(directory), users, questions)
+    summary["exported_at"] = manifest["exported_at"]
+    _save_json(os.path.join(directory, "summary.json"), summary)
+    return {"new_submissions": int(len(seg["sub_id"])), "submissions": summary["submissions"],
+            "segments": len(manifest["segments"]), "pending": len(pending),
+            "export_s": round(exported_s, 2), "aggregate_s": round(time.perf_counter() - t, 2)}
+
+
+def start_exporter(interval_s: float) -> threading.Event:
+    """Run export() from a daemon thread every interval_s seconds; set the returned event to stop."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_s):
+            try:
+                log.info("analytics export: %s", export())
+            except Exception:
+                log.exception("analytics export failed")
+
+    threading.Thread(target=loop, name="analytics-export", daemon=True).start()
+    return stop
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--full", action="store_true", help="discard the store and export everything again")
+    ap.add_argument("--dir", help="store directory (default: ANALYTICS_DIR)")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(json.dumps(export(full=args.full, directory=args.dir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,152 @@
-import os, json, time
-import httpx
-from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_fixed
+import json, time
+from typing import List, Optional
+from app.config import settings
 from app.models.questions_model import CodingQuestion, AptitudeQuestion
+from app.services.http_client import get_client
+from app.services.json_repair import repair_json
+from app.services.circuit_breaker import call_with_retry
+from app.services.metrics import external_call
+from app.services.tracing import traced
 from pydantic import ValidationError
 from uuid import uuid4
 
-load_dotenv()
-
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OR_MODEL = os.getenv("OR_MODEL")
-OR_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_API_KEY = settings.openrouter_api_key
+OR_MODEL = settings.or_model
+OR_URL = settings.openrouter_url
 HEADERS = {
     "Authorization": f"Bearer {OPENROUTER_API_KEY}",
     "Content-Type":"application/json",
     "HTTP-Referer":"http://localhost"
 }
+PROMPT_CACHE = settings.prompt_cache
+
+# Prompt templates are built once at import time. They are sent as the leading, byte-identical
+# part of every request so providers can serve them from their prompt cache.
+_CODING_SYSTEM = (
+    "You are a strict placement coding question generator.\n"
+    "Always respond with VALID JSON ONLY, no text outside JSON.\n"
+    "The JSON MUST strictly follow this schema:\n"
+    "{\n"
+    "  'id': string (UUID),\n"
+    "  'title': string,\n"
+    "  'description': string,\n"
+    "  'topics': [string, string],\n"
+    "  'input_format': string,\n"
+    "  'output_format': string,\n"
+    "  'constraints': string,\n"
+    "  'sample_testcases': [ { 'input': string, 'output': string } ],\n"
+    "  'hidden_testcases': [ { 'input': string, 'output': string } ],\n"
+    "  'estimated_time_min': integer,\n"
+    "  'hints': [string, string],\n"
+    "  'canonical_solution': string (complete Python 3 program reading stdin and writing stdout),\n"
+    "  'input_generator': string (Python 3 program that reads an integer seed from stdin and prints ONE valid input at the maximum constraints),\n"
+    "  'time_limit_s': number (CPU seconds per test),\n"
+    "  'memory_limit_kb': integer (memory per test in KB)\n"
+    "}\n\n"
+    "Rules:\n"
+    "- Always generate exactly 2 sample_testcases.\n"
+    "- For easy: 4 hidden_testcases, medium/hard: 6 hidden_testcases.\n"
+    "- Always include at least 2 relevant 'topics' (e.g., arrays, sorting).\n"
+    "- estimated_time_min: easy=10–15, medium=20–30, hard=40–60.\n"
+    "- Always include exactly 2 helpful hints.\n"
+    "- canonical_solution: should be short, correct and efficient enough for the maximum constraints.\n"
+    "- input_generator: use random.seed(seed); output must follow input_format exactly.\n"
+    "- Use realistic constraints like array size, time limits.\n"
+    "- time_limit_s/memory_limit_kb: typically 1–2 seconds and 262144 KB, matching the constraints.\n"
+    "- DO NOT include explanations, markdown, or text outside JSON."
+)
+
+_APTITUDE_SYSTEM = (
+    "You are a strict aptitude question generator for placement preparation.\n"
+    "Always respond with VALID JSON ONLY, no text outside JSON.\n"
+    "The JSON MUST strictly follow this schema:\n"
+    "{\n"
+    "  'id': string (UUID),\n"
+    "  'question_type': string ('mcq' or 'short_answer'),\n"
+    "  'topic': string,\n"
+    "  'difficulty': string ('easy', 'medium', 'hard'),\n"
+    "  'question_text': string,\n"
+    "  'options': [string, string, string, string] (required if question_type='mcq'),\n"
+    "  'correct_option_index': integer 0–3 (required if question_type='mcq'),\n"
+    "  'short_answer': string (required if question_type='short_answer'),\n"
+    "  'step_by_step_solution': [string, string, ...],\n"
+    "  'final_answer_explanation': string,\n"
+    "  'hints': [string, string],\n"
+    "  'estimated_time_sec': integer\n"
+    "}\n\n"
+    "Rules:\n"
+    "- If MCQ, always generate exactly 4 options.\n"
+    "- correct_option_index must match the index of the right option (0-based).\n"
+    "- step_by_step_solution: explain each step clearly.\n"
+    "- final_answer_explanation: short but clear.\n"
+    "- hints: always 2.\n"
+    "- estimated_time_sec: easy=60–90, medium=120–180, hard=240–300.\n"
+    "- Do NOT include commentary, markdown, or text outside JSON."
+)
+
+_SYSTEM_PROMPTS = {"coding": _CODING_SYSTEM, "aptitude": _APTITUDE_SYSTEM}
+
+_USER_TEMPLATE = "Topic: {topic}\nDifficulty: {difficulty}\nGenerate one {qtype} question now."
+
+_REPAIR_SYSTEM = (
+    "Repair the user's text into ONE valid JSON object for a {schema} question. "
+    "Keep all fields and values, fix only the syntax. Output JSON only."
+)
+
+
+def _system_message(text: str) -> dict:
+    # cache_control marks the prefix as cacheable for providers that need an explicit
+    # breakpoint (Anthropic, Gemini); others cache identical prefixes automatically.
+    if not PROMPT_CACHE:
+        return {"role": "system", "content": text}
+    return {"role": "system", "content": [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]}
+
+
+_SYSTEM_MESSAGES = {qtype: _system_message(text) for qtype, text in _SYSTEM_PROMPTS.items()}
+
 
 def _make_system_prompt(qtype: str) -> str:
-    if qtype == "coding":
-        return (
-            "You are a strict placement coding question generator.\n"
-            "Always respond with VALID JSON ONLY, no text outside JSON.\n"
-            "The JSON MUST strictly follow this schema:\n"
-            "{\n"
-            "  'id': string (UUID),\n"
-            "  'title': string,\n"
-            "  'description': string,\n"
-            "  'topics': [string, string],\n"
-            "  'input_format': string,\n"
-            "  'output_format': string,\n"
-            "  'constraints': string,\n"
-            "  'sample_testcases': [ { 'input': string, 'output': string } ],\n"
-            "  'hidden_testcases': [ { 'input': string, 'output': string } ],\n"
-            "  'estimated_time_min': integer,\n"
-            "  'hints': [string, string],\n"
-            "  'canonical_solution': string (clear pseudocode or Python code)\n"
-            "}\n\n"
-            "Rules:\n"
-            "- Always generate exactly 2 sample_testcases.\n"
-            "- For easy: 4 hidden_testcases, medium/hard: 6 hidden_testcases.\n"
-            "- Always include at least 2 relevant 'topics' (e.g., arrays, sorting).\n"
-            "- estimated_time_min: easy=10–15, medium=20–30, hard=40–60.\n"
-            "- Always include exactly 2 helpful hints.\n"
-            "- canonical_solution: should be short and correct, not verbose.\n"
-            "- Use realistic constraints like array size, time limits.\n"
-            "- DO NOT include explanations, markdown, or text outside JSON."
-        )
-    else:  # aptitude
-        return (
-            "You are a strict aptitude question generator for placement preparation.\n"
-            "Always respond with VALID JSON ONLY, no text outside JSON.\n"
-            "The JSON MUST strictly follow this schema:\n"
-            "{\n"
-            "  'id': string (UUID),\n"
-            "  'question_type': string ('mcq' or 'short_answer'),\n"
-            "  'topic': string,\n"
-            "  'difficulty': string ('easy', 'medium', 'hard'),\n"
-            "  'question_text': string,\n"
-            "  'options': [string, string, string, string] (required if question_type='mcq'),\n"
-            "  'correct_option_index': integer 0–3 (required if question_type='mcq'),\n"
-            "  'short_answer': string (required if question_type='short_answer'),\n"
-            "  'step_by_step_solution': [string, string, ...],\n"
-            "  'final_answer_explanation': string,\n"
-            "  'hints': [string, string],\n"
-            "  'estimated_time_sec': integer\n"
-            "}\n\n"
-            "Rules:\n"
-            "- If MCQ, always generate exactly 4 options.\n"
-            "- correct_option_index must match the index of the right option (0-based).\n"
-            "- step_by_step_solution: explain each step clearly.\n"
-            "- final_answer_explanation: short but clear.\n"
-            "- hints: always 2.\n"
-            "- estimated_time_sec: easy=60–90, medium=120–180, hard=240–300.\n"
-            "- Do NOT include commentary, markdown, or text outside JSON."
-        )
-
-
-
-    
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def _call_openrouter(messages: list, response_format: bool = False) -> str:
+    return _SYSTEM_PROMPTS["coding" if qtype == "coding" else "aptitude"]
+
+
+_REPAIR_MESSAGES = {qtype: _system_message(_REPAIR_SYSTEM.format(schema=qtype)) for qtype in _SYSTEM_PROMPTS}
+
+# Models that rejected response_format, so later calls to them do not pay for a failing
+# request first. openrouter/auto picks a model per call, so it is never remembered.
+_NO_JSON_MODE: set = set()
+
+
+def _rejects_json_mode(r) -> bool:
+    # Only a 400 that names response_format; context-length and message errors must not count
+    return r.status_code == 400 and "response_format" in r.text.lower()
+
+
+@traced("openrouter.question")
+def _post_chat(body: dict):
+    with external_call("openrouter", "question"):
+        client = get_client("openrouter")
+        r = client.post(OR_URL, headers=HEADERS, json=body, timeout=30.0)
+        if "response_format" in body and _rejects_json_mode(r):
+            # model does not support JSON mode: resend without it
+            if body["model"] != "openrouter/auto":
+                _NO_JSON_MODE.add(body["model"])
+            body.pop("response_format")
+            r = client.post(OR_URL, headers=HEADERS, json=body, timeout=30.0)
+        r.raise_for_status()
+    return r
+
+
+def _call_openrouter(messages: list, response_format: bool = True) -> str:
     body = {
         "model": OR_MODEL,
         "messages": messages,
         "temperature": 0.2,
-        "max_tokens": 1200
+        "max_tokens": 2000
     }
-    if response_format:
+    if response_format and OR_MODEL not in _NO_JSON_MODE:
         body["response_format"] = {"type": "json_object"}
 
-    r = httpx.post(OR_URL, headers=HEADERS, json=body, timeout=30.0)
-    if r.status_code == 400 and response_format:
-        # retry without response_format
-        return _call_openrouter(messages, response_format=False)
-    r.raise_for_status()
+    r = call_with_retry("openrouter", "question", lambda: _post_chat(body), attempts=3)
     j = r.json()
     content = j["choices"][0]["message"]["content"].strip()
 
@@ -107,54 +159,53 @@ def _call_openrouter(messages: list, response_format: bool = False) -> str:
 
     return content
 
-def _safe_json_loads(raw: str):
+def _safe_json_loads(raw: str, schema_name: str = "question"):
+    """
+    Parse model output, trying the local repair before a single LLM repair round trip.
+    """
     try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        # Try repair
-        raw2 = _attempt_repair(raw, schema_name="question")
-        return json.loads(raw2)
+        return repair_json(raw)
+    except ValueError:
+        pass
+    raw2 = _attempt_repair(raw, schema_name=schema_name)
+    try:
+        return repair_json(raw2)
+    except ValueError as e:
+        raise ValueError(f"Failed to parse JSON from LLM. Raw1: {raw!r}, Raw2: {raw2!r}") from e
 
 
 def _attempt_repair(raw: str, schema_name: str) -> str:
     """
     Ask the model to convert the raw text into valid JSON that follows the schema.
-    Only one repair attempt allowed.
+    Only one repair attempt allowed. Only the JSON-looking span of the output is sent.
     """
-    repair_prompt = (
-        "Previous response was not valid JSON. Re-emit ONLY the JSON object conforming to the required schema. "
-        "Do NOT add commentary.\n\nPrevious output:\n" + raw
-    )
-    messages = [{"role": "system", "content": f"Repair output to conform to {schema_name} schema."},
-                {"role": "user", "content": repair_prompt}]
-    return _call_openrouter(messages, response_format=False)
-
-def generate_question(question_type: str, topic: str, difficulty: str = "medium") -> dict:
+    start = raw.find("{")
+    end = raw.rfind("}")
+    if start != -1 and end > start:
+        raw = raw[start:end + 1]
+    system = _REPAIR_MESSAGES.get(schema_name) or _system_message(_REPAIR_SYSTEM.format(schema=schema_name))
+    messages = [system, {"role": "user", "content": raw}]
+    return _call_openrouter(messages, response_format=True)
+
+def generate_question(question_type: str, topic: str, difficulty: str = "medium",
+                      avoid: Optional[List[str]] = None) -> dict:
     """
     question_type: 'coding' or 'aptitude'
+    avoid: titles of existing questions the new one must differ from
     returns a dict conforming to appropriate pydantic model
     """
-    system = _make_system_prompt(question_type)
-    user_message = f"Topic: {topic}\nDifficulty: {difficulty}\nGenerate one {question_type} question now."
-
+    qtype = "coding" if question_type == "coding" else "aptitude"
+    user = _USER_TEMPLATE.format(topic=topic, difficulty=difficulty, qtype=question_type)
+    if avoid:
+        # Appended to the user turn so the cached system prompt stays byte-identical
+        user += "\nIt must be clearly different from these existing questions:\n" + "\n".join(f"- {t}" for t in avoid)
     messages = [
-        {"role": "system", "content": system},
-        {"role": "user", "content": user_message}
+        _SYSTEM_MESSAGES[qtype],
+        {"role": "user", "content": user}
     ]
 
-    raw = _call_openrouter(messages=messages, response_format=False)
-
-    # Try to parse JSON
-    try:
-        parsed = parsed = _safe_json_loads(raw)
-    except json.JSONDecodeError:
-        # attempt repair once
-        raw2 = _attempt_repair(raw, schema_name=question_type)
-        try:
-            parsed = json.loads(raw2)
-            raw = raw2
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse JSON from LLM. Raw1: {raw!r}, Raw2: {raw2!r}") from e
+    raw = _call_openrouter(messages=messages)
+    parsed = _safe_json_loads(raw, schema_name=qtype)
 
     # Validate with pydantic
     try:
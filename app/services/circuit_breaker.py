@@ -0,0 +1,177 @@
+# app/services/circuit_breaker.py
+"""
+Circuit breakers and retry policy for calls to Judge0 and OpenRouter.
+
+A breaker tracks the outcome of the last BREAKER_WINDOW calls to one upstream. Once at least
+BREAKER_MIN_CALLS have been seen and the failure rate reaches BREAKER_FAILURE_RATE it opens:
+calls fail immediately with CircuitOpenError so callers can take their fast path (queued
+evaluation, pooled questions, local plans) instead of waiting on a dead upstream. After the
+open period one trial call is let through (half-open); success closes the breaker, failure
+reopens it for twice as long, up to BREAKER_MAX_OPEN_S.
+
+call_with_retry() retries transport errors, 429 and 5xx with full-jitter exponential backoff,
+waits for the upstream's Retry-After when it sends one, and never retries other 4xx.
+"""
+import logging, random, threading, time
+from collections import deque
+from typing import Callable, Dict, Optional, TypeVar
+from app.config import settings
+from app.services.metrics import Counter, EXTERNAL_CALL_RETRIES
+
+log = logging.getLogger("circuit_breaker")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+CIRCUIT_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("service", "state"))
+CIRCUIT_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total", "Calls refused because the breaker was open", ("service",))
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, service: str, retry_after: float):
+        super().__init__(f"{service} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20, min_calls: int = 5,
+                 open_s: float = 15.0, max_open_s: float = 300.0):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_s = open_s
+        self.max_open_s = max_open_s
+        self._outcomes = deque(maxlen=window)  # True = failure
+        self._state = CLOSED
+        self._opened_until = 0.0
+        self._reopen_count = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._opened_until:
+                return HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_until - time.monotonic())
+
+    def _transition(self, state: str):
+        if state != self._state:
+            self._state = state
+            CIRCUIT_TRANSITIONS.inc(service=self.name, state=state)
+            log.warning("circuit %s -> %s", self.name, state)
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() < self._opened_until:
+                    CIRCUIT_REJECTIONS.inc(service=self.name)
+                    raise CircuitOpenError(self.name, self._opened_until - time.monotonic())
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._trial_in_flight:
+                    CIRCUIT_REJECTIONS.inc(service=self.name)
+                    raise CircuitOpenError(self.name, 1.0)
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trial_in_flight = False
+                self._reopen_count = 0
+                self._outcomes.clear()
+                self._transition(CLOSED)
+            self._outcomes.append(False)
+
+    def record_failure(self, retry_after: Optional[float] = None):
+        with self._lock:
+            self._outcomes.append(True)
+            if self._state == HALF_OPEN:
+                self._trial_in_flight = False
+                self._reopen_count += 1
+                self._open(retry_after)
+            elif self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+                if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                    self._open(retry_after)
+
+    def _open(self, retry_after: Optional[float]):
+        duration = min(self.max_open_s, self.open_s * (2 ** self._reopen_count))
+        # Jitter so breakers in different workers don't all probe the upstream at once
+        duration *= random.uniform(0.8, 1.2)
+        self._opened_until = time.monotonic() + max(duration, retry_after or 0.0)
+        self._transition(OPEN)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _registry_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(
+                name, failure_rate=settings.breaker_failure_rate, window=settings.breaker_window,
+                min_calls=settings.breaker_min_calls, open_s=settings.breaker_open_s,
+                max_open_s=settings.breaker_max_open_s))
+    return breaker
+
+
+def is_open(name: str) -> bool:
+    """True while calls to the upstream would be refused (half-open still admits a trial call)."""
+    return get_breaker(name).state == OPEN
+
+
+def _response(exc: BaseException):
+    return getattr(exc, "response", None)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    resp = _response(exc)
+    value = resp.headers.get("retry-after") if resp is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to our own backoff
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Transport errors, 429 and 5xx count against the upstream; other 4xx are the caller's fault."""
+    resp = _response(exc)
+    if resp is not None and hasattr(resp, "status_code"):
+        return resp.status_code == 429 or resp.status_code >= 500
+    return not isinstance(exc, (ValueError, TypeError, KeyError))
+
+
+def call_with_retry(service: str, operation: str, fn: Callable[[], T], attempts: int = 3,
+                    base_s: float = 0.5, cap_s: float = 8.0) -> T:
+    """Run fn through the service's breaker, retrying upstream failures with jittered backoff."""
+    breaker = get_breaker(service)
+    for attempt in range(attempts):
+        breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_upstream_failure(e):
+                breaker.record_success()  # the upstream answered; the request was bad
+                raise
+            retry_after = _retry_after(e)
+            breaker.record_failure(retry_after)
+            if attempt + 1 >= attempts:
+                raise
+            delay = retry_after if retry_after is not None else random.uniform(0, min(cap_s, base_s * 2 ** attempt))
+            if delay > cap_s:
+                raise  # the upstream asked for longer than a request can wait
+            EXTERNAL_CALL_RETRIES.inc(service=service, operation=operation)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,158 @@
+# app/services/comparator.py
+import math, re
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Questions without a checker keep the original line-by-line comparison
+DEFAULT_CHECKER = "default"
+# Absolute tolerance for numeric tokens written with a decimal point or exponent
+DEFAULT_TOLERANCE = 1e-6
+
+# Outputs are consumed in windows of roughly this many characters so that
+# memory stays bounded and a mismatch stops the scan early.
+CHUNK_CHARS = 1 << 16
+
+_WS_RE = re.compile(r"\s")
+_DECIMAL_RE = re.compile(r"[.eE]")
+# Outputs up to this long may be a lone number, compared with the tolerance by the default checker
+_NUMBER_CHARS = 64
+
+
+def _content_bounds(s: str):
+    # [start, end) of s with leading blank lines and trailing whitespace removed
+    m = re.search(r"\S", s)
+    if m is None:
+        return 0, 0
+    start = s.rfind("\n", 0, m.start()) + 1
+    end = len(s)
+    while end > start and s[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _iter_token_chunks(s: str) -> Iterator[List[str]]:
+    n = len(s)
+    pos = 0
+    while pos < n:
+        end = pos + CHUNK_CHARS
+        if end < n:
+            m = _WS_RE.search(s, end)
+            end = m.start() if m else n
+        tokens = s[pos:end].split()
+        if tokens:
+            yield tokens
+        pos = end
+
+
+def _iter_line_chunks(s: str) -> Iterator[List[str]]:
+    pos, n = _content_bounds(s)
+    while pos < n:
+        end = s.find("\n", pos + CHUNK_CHARS, n)
+        if end == -1:
+            end = n
+        yield list(map(str.rstrip, s[pos:end].split("\n")))
+        pos = end + 1
+
+
+def _compare_chunks(exp_chunks: Iterator[List[str]], act_chunks: Iterator[List[str]],
+                    equal: Callable[[List[str], List[str]], bool]) -> bool:
+    # Walk two chunked streams in lockstep, comparing aligned slices
+    be = ba = None
+    ie = ia = 0
+    while True:
+        if be is None or ie >= len(be):
+            be, ie = next(exp_chunks, None), 0
+        if ba is None or ia >= len(ba):
+            ba, ia = next(act_chunks, None), 0
+        if be is None or ba is None:
+            return be is None and ba is None
+        k = min(len(be) - ie, len(ba) - ia)
+        if not equal(be[ie:ie + k], ba[ia:ia + k]):
+            return False
+        ie += k
+        ia += k
+
+
+def _tokens_equal(a: str, b: str, tolerance: float) -> bool:
+    if a == b:
+        return True
+    # Integers must match exactly; only decimal or exponent notation gets the tolerance
+    if not (_DECIMAL_RE.search(a) or _DECIMAL_RE.search(b)):
+        return False
+    try:
+        fa = float(a)
+        fb = float(b)
+    except ValueError:
+        return False
+    if not (math.isfinite(fa) and math.isfinite(fb)):
+        return False
+    return abs(fa - fb) <= tolerance
+
+
+def _check_exact(expected: str, actual: str, tolerance: float) -> bool:
+    # Line-by-line equality ignoring trailing whitespace and surrounding blank lines
+    return _compare_chunks(_iter_line_chunks(expected), _iter_line_chunks(actual),
+                           lambda e, a: e == a)
+
+
+def _check_default(expected: str, actual: str, tolerance: float) -> bool:
+    # Surrounding whitespace and trailing spaces ignored, lines compared exactly, except that
+    # an output consisting of a single number is compared with the tolerance
+    if len(expected) <= _NUMBER_CHARS and len(actual) <= _NUMBER_CHARS:
+        e, a = expected.strip(), actual.strip()
+        if e and a and not _WS_RE.search(e) and not _WS_RE.search(a) and _tokens_equal(e, a, tolerance):
+            return True
+    return _check_exact(expected.lstrip(), actual.lstrip(), tolerance)
+
+
+def _check_whitespace(expected: str, actual: str, tolerance: float) -> bool:
+    return _compare_chunks(_iter_token_chunks(expected), _iter_token_chunks(actual),
+                           lambda e, a: e == a)
+
+
+def _check_float(expected: str, actual: str, tolerance: float) -> bool:
+    def equal(e, a):
+        # Exact list comparison first; per-token tolerance only on the slow path
+        return e == a or all(_tokens_equal(x, y, tolerance) for x, y in zip(e, a))
+    return _compare_chunks(_iter_token_chunks(expected), _iter_token_chunks(actual), equal)
+
+
+def _check_unordered(expected: str, actual: str, tolerance: float) -> bool:
+    # Lines may appear in any order; blank lines are ignored
+    wanted = Counter()
+    limit = 0
+    for chunk in _iter_line_chunks(expected):
+        lines = list(filter(None, chunk))
+        wanted.update(lines)
+        limit += len(lines)
+    seen = Counter()
+    count = 0
+    for chunk in _iter_line_chunks(actual):
+        lines = list(filter(None, chunk))
+        count += len(lines)
+        if count > limit:
+            return False
+        seen.update(lines)
+    return seen == wanted
+
+
+CHECKERS: Dict[str, Callable[[str, str, float], bool]] = {
+    "default": _check_default,
+    "exact": _check_exact,
+    "whitespace": _check_whitespace,
+    "float": _check_float,
+    "unordered": _check_unordered,
+}
+
+
+def compare_outputs(expected: Optional[str], actual: Optional[str],
+                    checker: Optional[str] = None,
+                    tolerance: float = DEFAULT_TOLERANCE) -> bool:
+    """
+    Compare program output against the expected output using the named checker.
+    Outputs are compared chunk by chunk and the scan stops at the first mismatch.
+    """
+    fn = CHECKERS.get(checker or DEFAULT_CHECKER)
+    if fn is None:
+        raise ValueError(f"Unknown checker {checker!r}; expected one of {sorted(CHECKERS)}")
+    return fn(expected or "", actual or "", tolerance)
@@ -0,0 +1,229 @@
+# app/services/evaluation_queue.py
+"""
+Deferred evaluation for submissions that arrive while the Judge0 breaker is open. The
+submission row is stored right away (score pending) together with an evaluation_jobs row
+holding everything needed to grade it; a background thread drains the queue once Judge0 is
+reachable again. Jobs are claimed with a conditional UPDATE, so several workers can drain
+the same queue.
+
+Streamed submits (stream=true) are queued the same way; GET /submissions/{id}/stream claims
+the job itself and relays evaluate_job()'s events as server-sent events.
+"""
+import json, logging, threading, time
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+from sqlalchemy import delete, insert, or_, update
+from app.config import settings
+from app.db.db import SessionLocal
+from app.db.models import EvaluationJob, Submission, SubmissionTest
+from app.services.circuit_breaker import CircuitOpenError, is_open
+from app.services.analytics import compute_runtime_percentile
+from app.services.evaluator import iter_test_results, summarize_results
+from app.services.feedback_client import feedback_payload, request_feedback
+from app.services.stress_tests import load_stress_tests
+from app.services.response_cache import invalidate_users
+
+log = logging.getLogger("evaluation_queue")
+
+MAX_ATTEMPTS = 5
+# A job left "running" this long belongs to a worker that died mid-evaluation
+_STALE_AFTER = timedelta(minutes=10)
+# Freshly queued jobs are left alone briefly so a client about to open the stream can run them
+_FRESH_FOR = timedelta(seconds=10)
+
+
+def save_test_rows(db, submission_id: int, tests: list):
+    if not tests:
+        return
+    db.execute(insert(SubmissionTest), [
+        {
+            "submission_id": submission_id,
+            "test_index": t.get("index"),
+            "stdin": t.get("stdin"),
+            "expected": t.get("expected"),
+            "stdout": t.get("stdout"),
+            "stderr": t.get("stderr"),
+            "passed": bool(t.get("passed")),
+            "time": t.get("time"),
+            "memory": t.get("memory"),
+            "verdict": t.get("verdict"),
+        }
+        for t in tests
+    ])
+
+
+def enqueue(db, submission_id: int, payload: dict) -> int:
+    job = EvaluationJob(submission_id=submission_id, status="queued", payload=payload)
+    db.add(job)
+    db.flush()
+    return job.id
+
+
+def _claim(db, job_id: int) -> bool:
+    now = datetime.utcnow()
+    res = db.execute(
+        update(EvaluationJob)
+        .where(EvaluationJob.id == job_id)
+        .where(or_(EvaluationJob.status == "queued",
+                   (EvaluationJob.status == "running") & (EvaluationJob.updated_at < now - _STALE_AFTER)))
+        .values(status="running", attempts=EvaluationJob.attempts + 1, updated_at=now)
+    )
+    db.commit()
+    return res.rowcount == 1
+
+
+def _feedback(p: dict, eval_out: dict) -> Optional[str]:
+    if eval_out["passed"] >= eval_out["total"] or is_open("openrouter"):
+        return None
+    try:
+        return request_feedback(feedback_payload(p.get("question_title"), eval_out["tests"],
+                                                 p["language_id"], p["source_code"]))
+    except Exception as e:
+        log.warning("feedback for queued submission failed: %s", e)
+        return None
+
+
+def _public_test(t: dict) -> dict:
+    return {k: t.get(k) for k in ("index", "verdict", "passed", "time", "memory", "stdout", "stderr")}
+
+
+def evaluate_job(job_id: int) -> Iterator[Tuple[str, dict]]:
+    """
+    Claim and evaluate one job, yielding ("test", result) as each test finishes and a final
+    ("result", ...) once the submission is graded, or ("status", ...) if it went back to the
+    queue or failed. Yields nothing if another worker holds the job. Test rows are committed
+    one by one so other readers can follow the evaluation.
+    """
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            return
+        job = db.get(EvaluationJob, job_id)
+        p = job.payload
+        # Rows left behind by an evaluation that died half way
+        db.execute(delete(SubmissionTest).where(SubmissionTest.submission_id == job.submission_id))
+        db.commit()
+        testcases = p["testcases"]
+        if p.get("stress_question_id"):
+            testcases = testcases + load_stress_tests(p["stress_question_id"])
+        results = []
+        start = time.time()
+        try:
+            for t in iter_test_results(
+                    p["source_code"], p["language_id"], testcases, checker=p.get("checker"),
+                    time_limit_s=p.get("time_limit_s"), memory_limit_kb=p.get("memory_limit_kb")):
+                results.append(t)
+                save_test_rows(db, job.submission_id, [t])
+                db.commit()
+                yield "test", _public_test(t)
+        except CircuitOpenError as e:
+            # Judge0 went down again; put the job back without spending an attempt
+            job.status, job.attempts, job.updated_at = "queued", job.attempts - 1, datetime.utcnow()
+            db.commit()
+            yield "status", {"status": job.status, "retry_after": round(e.retry_after, 1)}
+            return
+        except GeneratorExit:
+            # The streaming client went away; leave the job for the worker
+            job.status, job.attempts, job.updated_at = "queued", job.attempts - 1, datetime.utcnow()
+            db.commit()
+            raise
+        except Exception as e:
+            log.exception("queued evaluation %s failed", job_id)
+            job.status = "failed" if job.attempts >= MAX_ATTEMPTS else "queued"
+            job.result = {"error": str(e)}
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            yield "status", {"status": job.status, "error": str(e)}
+            return
+
+        eval_out = summarize_results(results, time.time() - start)
+        feedback = _feedback(p, eval_out)
+        sub = db.get(Submission, job.submission_id)
+        sub.score_percent = eval_out["score_percent"]
+        sub.passed = eval_out["passed"]
+        sub.total = eval_out["total"]
+        runtime_percentile = None
+        if eval_out["verdict"] == "AC":
+            runtime_percentile = compute_runtime_percentile(sub.question_id, eval_out["runtime_s"],
+                                                            exclude_submission_id=sub.id)
+        job.status = "done"
+        job.result = {
+            "verdict": eval_out["verdict"],
+            "runtime_s": eval_out["runtime_s"],
+            "peak_memory_kb": eval_out["peak_memory_kb"],
+            "runtime_percentile": runtime_percentile,
+            "feedback": feedback,
+        }
+        job.updated_at = datetime.utcnow()
+        db.commit()
+        invalidate_users(sub.user_id)
+
+        with open(settings.submissions_log, "a") as f:
+            f.write(json.dumps({
+                "timestamp": time.time(),
+                "submission_id": sub.id,
+                "user_id": sub.user_id,
+                "question_id": sub.question_id,
+                "language_id": sub.language_id,
+                "score": eval_out["score_percent"],
+                "passed": eval_out["passed"],
+                "total": eval_out["total"],
+                "eval": eval_out,
+                "feedback": feedback,
+                "queued": True,
+            }) + "\n")
+        yield "result", {"status": "done", "score_percent": sub.score_percent, "passed": sub.passed,
+                         "total": sub.total, **job.result}
+    finally:
+        db.close()
+
+
+def run_job(job_id: int) -> Optional[str]:
+    """Evaluate one queued job; returns its new status, or None if another worker has it."""
+    status = None
+    for kind, data in evaluate_job(job_id):
+        if kind != "test":
+            status = data["status"]
+    return status
+
+
+def process_pending(limit: int = 20) -> int:
+    """Evaluate up to limit queued jobs, oldest first; stops early if Judge0 goes down."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        stale = now - _STALE_AFTER
+        ids = [r[0] for r in (
+            db.query(EvaluationJob.id)
+            .filter(or_((EvaluationJob.status == "queued") & (EvaluationJob.created_at < now - _FRESH_FOR),
+                        (EvaluationJob.status == "running") & (EvaluationJob.updated_at < stale)))
+            .order_by(EvaluationJob.id)
+            .limit(limit)
+            .all()
+        )]
+    finally:
+        db.close()
+    done = 0
+    for job_id in ids:
+        if is_open("judge0"):
+            break
+        if run_job(job_id) == "done":
+            done += 1
+    return done
+
+
+def start_worker(poll_s: float) -> threading.Event:
+    """Drain the queue from a daemon thread every poll_s seconds; set the returned event to stop."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(poll_s):
+            if is_open("judge0"):
+                continue
+            try:
+                process_pending()
+            except Exception:
+                log.exception("evaluation queue pass failed")
+
+    threading.Thread(target=loop, name="evaluation-queue", daemon=True).start()
+    return stop
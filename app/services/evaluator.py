@@ -1,72 +1,116 @@
-import time, logging, json
+import time, logging, json, hashlib
 from app.services.judge0_client import execute_code
-from typing import List, Dict, Any
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.comparator import compare_outputs, DEFAULT_TOLERANCE
+from app.services.tracing import span, traced
+from typing import Iterator, List, Dict, Any, Optional
 
 log = logging.getLogger("evaluator")
 
-def _normalize_output(s: str)-> str:
-    if s is None:
-        return ""
-    
-    return "\n".join([line.rstrip() for line in s.strip().splitlines()]).strip()
+def _compare_outputs(expected_output: str, actual_output: str, checker: Optional[str] = None,
+                     numeric_tolerance: float = DEFAULT_TOLERANCE) -> bool:
+    return compare_outputs(expected_output, actual_output, checker=checker, tolerance=numeric_tolerance)
 
+# Judge0 status ids: 3 Accepted, 4 Wrong Answer, 5 Time Limit Exceeded, 6 Compilation Error,
+# 7-12 runtime errors, 13 Internal Error, 14 Exec Format Error
+_TLE_STATUS = 5
+_CE_STATUS = 6
+_RE_STATUSES = range(7, 13)
 
-def _compare_outputs(expected_output: str, actual_output: str, numeric_tolerance: float = 1e-6) -> bool:
-    exp = _normalize_output(expected_output)
-    act = _normalize_output(actual_output)
+# Test I/O kept in results, test rows, the submissions log and responses; stress inputs and
+# their outputs can run to megabytes, so longer text keeps a prefix plus its length and hash
+MAX_IO_CHARS = 2048
 
-    try:
-        if exp != "" and act != "":
-            fe = float(exp)
-            fa = float(act)
+def clip_io(text: Optional[str]) -> Optional[str]:
+    if text is None or len(text) <= MAX_IO_CHARS:
+        return text
+    digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+    return f"{text[:MAX_IO_CHARS]}\n... [truncated: {len(text)} chars, sha256 {digest}]"
 
-            return abs(fe - fa) <= numeric_tolerance
-    except Exception:
-        pass
-    return exp == act
+def _to_float(v) -> Optional[float]:
+    try:
+        return float(v) if v is not None else None
+    except (TypeError, ValueError):
+        return None
 
-def run_tests_for_submission(src_code: str, language_id: int, testcases: List[Dict[str, str]]) -> Dict[str, Any]:
+def _verdict(res: dict, output_ok: bool, time_limit_s: Optional[float], memory_limit_kb: Optional[int]) -> str:
+    status_id = (res.get("status") or {}).get("id")
+    run_time = _to_float(res.get("time"))
+    memory = _to_float(res.get("memory"))
+    if status_id == _TLE_STATUS or (time_limit_s and run_time is not None and run_time > time_limit_s):
+        return "TLE"
+    if memory_limit_kb and memory is not None and memory >= memory_limit_kb:
+        return "MLE"
+    if status_id == _CE_STATUS:
+        return "CE"
+    if status_id in _RE_STATUSES:
+        return "RE"
+    if status_id is not None and status_id not in (3, 4):
+        return "IE"
+    return "AC" if output_ok else "WA"
 
-    results = []
-    start = time.time()
-    passed = 0
+def iter_test_results(src_code: str, language_id: int, testcases: List[Dict[str, str]],
+                      checker: Optional[str] = None, time_limit_s: Optional[float] = None,
+                      memory_limit_kb: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Run the testcases one by one, yielding each result as soon as its execution finishes."""
     for idx, tc in enumerate(testcases):
         stdin = tc.get("input", "")
         expected = tc.get("output", "")
 
         try:
-            res = execute_code(src_code, language_id, stdin, expected)
+            res = execute_code(src_code, language_id, stdin, expected,
+                               cpu_time_limit=time_limit_s, memory_limit=memory_limit_kb)
+        except CircuitOpenError:
+            # Judge0 is down: grading the rest as IE would record a bogus score, so let the caller defer
+            raise
         except Exception as e:
             log.exception("Judge0 failed for testcase %s", idx)
             res = {"stdout": None, "stderr": str(e), "status": {"id": -1, "description": "ExecutionError"}, "time": None, "memory": None}
 
-        ok = False
         stdout = res.get("stdout")
-        ok = _compare_outputs(expected, stdout)
-        results.append({
+        with span("compare", test=idx):
+            output_ok = _compare_outputs(expected, stdout, checker=checker)
+        verdict = _verdict(res, output_ok, time_limit_s, memory_limit_kb)
+        yield {
             "index": idx,
-            "stdin": stdin,
-            "expected": expected,
-            "stdout": stdout,
+            "stdin": clip_io(stdin),
+            "expected": clip_io(expected),
+            "stdout": clip_io(stdout),
             "stderr": res.get("stderr"),
             "status": res.get("status"),
             "time": res.get("time"),
             "memory": res.get("memory"),
-            "passed": ok
-        })
-        if ok:
-            passed += 1
-    
-    total = len(testcases)
+            "verdict": verdict,
+            "passed": verdict == "AC"
+        }
+
+def summarize_results(results: List[Dict[str, Any]], duration: float) -> Dict[str, Any]:
+    total = len(results)
+    passed = sum(1 for r in results if r["passed"])
     score = (passed / total) * 100 if total > 0 else 0.0
-    duration = time.time() - start
+    times = [t for t in (_to_float(r["time"]) for r in results) if t is not None]
+    memories = [m for m in (_to_float(r["memory"]) for r in results) if m is not None]
+    # Overall verdict is the first non-accepted test verdict, as on most judges
+    verdict = next((r["verdict"] for r in results if r["verdict"] != "AC"), "AC")
     return {
         "total": total,
         "passed": passed,
         "score_percent": score,
+        "verdict": verdict,
+        "runtime_s": max(times) if times else None,
+        "peak_memory_kb": int(max(memories)) if memories else None,
         "duration_s": duration,
         "tests": results
     }
 
+@traced("evaluate")
+def run_tests_for_submission(src_code: str, language_id: int, testcases: List[Dict[str, str]],
+                             checker: Optional[str] = None, time_limit_s: Optional[float] = None,
+                             memory_limit_kb: Optional[int] = None) -> Dict[str, Any]:
+    start = time.time()
+    results = list(iter_test_results(src_code, language_id, testcases, checker=checker,
+                                     time_limit_s=time_limit_s, memory_limit_kb=memory_limit_kb))
+    return summarize_results(results, time.time() - start)
+
 # Backward-compatible alias
 run_test_for_submission = run_tests_for_submission
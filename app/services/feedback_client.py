@@ -1,10 +1,12 @@
 # app/services/feedback_client.py
-import os, httpx, json
-from dotenv import load_dotenv
-load_dotenv()
+from app.config import settings
+from app.services.circuit_breaker import call_with_retry
+from app.services.http_client import get_client
+from app.services.metrics import external_call
+from app.services.tracing import traced
 
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OR_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_API_KEY = settings.openrouter_api_key
+OR_URL = settings.openrouter_url
 HEADERS = {"Authorization": f"Bearer {OPENROUTER_API_KEY}", "Content-Type": "application/json"}
 
 FEEDBACK_SYSTEM = (
@@ -13,9 +15,24 @@ FEEDBACK_SYSTEM = (
     "Output plain text only (no JSON)."
 )
 
+_MAX_TEST_CHARS = 300
+
+def _clip(v, limit: int = _MAX_TEST_CHARS):
+    # Stress-test inputs can be megabytes; only a prefix is useful to the tutor
+    if isinstance(v, str) and len(v) > limit:
+        return v[:limit] + f"... [{len(v) - limit} more chars]"
+    return v
+
+@traced("openrouter.feedback")
+def _post_chat(body: dict):
+    with external_call("openrouter", "feedback"):
+        r = get_client("openrouter").post(OR_URL, headers=HEADERS, json=body, timeout=15.0)
+        r.raise_for_status()
+    return r
+
 def request_feedback(payload: dict) -> str:
     """
-    payload contains: question_title, failed_tests (list with index, stdin, stdout, stderr), language_id, source_code
+    payload contains: question_title, failed_tests (list with index, verdict, stdin, stdout, stderr), language_id, source_code
     """
     user_text = (
         f"Question: {payload.get('question_title')}\n"
@@ -23,14 +40,14 @@ def request_feedback(payload: dict) -> str:
         f"Failed tests (do not reveal expected hidden outputs):\n"
     )
     for ft in payload.get("failed_tests", []):
-        user_text += f"- Test #{ft['index']} | input: {ft['stdin']!r} | stdout: {ft['stdout']!r} | stderr: {ft['stderr']!r}\n"
+        user_text += f"- Test #{ft['index']} ({ft.get('verdict', 'WA')}) | input: {_clip(ft['stdin'])!r} | stdout: {_clip(ft['stdout'])!r} | stderr: {_clip(ft['stderr'])!r}\n"
     user_text += (
         "\nGive 2 short hints (1-2 sentences each) explaining likely causes and a final short suggestion on what to check next. "
         "Do NOT give full code or exact solution. Keep answer under 150 words."
     )
 
     body = {
-        "model": os.getenv("OR_MODEL", "openrouter/auto"),
+        "model": settings.or_model,
         "messages": [
             {"role": "system", "content": FEEDBACK_SYSTEM},
             {"role": "user", "content": user_text}
@@ -38,7 +55,19 @@ def request_feedback(payload: dict) -> str:
         "temperature": 0.2,
         "max_tokens": 300
     }
-    r = httpx.post(OR_URL, headers=HEADERS, json=body, timeout=15.0)
-    r.raise_for_status()
+    # Feedback is optional, so a single attempt; the breaker still short-circuits during outages
+    r = call_with_retry("openrouter", "feedback", lambda: _post_chat(body), attempts=1)
     j = r.json()
     return j["choices"][0]["message"]["content"].strip()
+
+def feedback_payload(question_title, tests: list, language_id: int, source_code: str) -> dict:
+    """Build the request_feedback payload from evaluator test results."""
+    return {
+        "question_title": question_title,
+        "failed_tests": [
+            {"index": t["index"], "verdict": t["verdict"], "stdin": t["stdin"], "stdout": t["stdout"], "stderr": t["stderr"]}
+            for t in tests if not t["passed"]
+        ],
+        "language_id": language_id,
+        "source_code": source_code
+    }
@@ -0,0 +1,33 @@
+# app/services/http_client.py
+"""
+Shared, lazily constructed HTTP clients. httpx is only imported and a connection pool only
+built the first time an upstream is called, so importing the app stays cheap; afterwards
+every call to that upstream reuses the same keep-alive connections.
+"""
+import threading
+from app.config import settings
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(name: str):
+    """Return the process-wide httpx.Client for an upstream ("judge0", "openrouter", ...)."""
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                import httpx
+                limits = httpx.Limits(max_connections=settings.http_max_connections,
+                                      max_keepalive_connections=settings.http_max_connections)
+                client = _clients[name] = httpx.Client(limits=limits, timeout=30.0)
+    return client
+
+
+def close_clients():
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for c in clients:
+        c.close()
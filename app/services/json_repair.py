@@ -0,0 +1,194 @@
+# app/services/json_repair.py
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+# How many times a truncated object is cut back to an earlier comma before giving up
+_MAX_TRUNCATION_CUTS = 8
+_MAX_CANDIDATES = 16
+
+
+def _next_non_ws(text: str, i: int) -> str:
+    n = len(text)
+    while i < n and text[i].isspace():
+        i += 1
+    return text[i] if i < n else ""
+
+
+def _normalize(text: str, start: int) -> Tuple[str, int, bool]:
+    """
+    Rewrite the JSON-ish value starting at text[start] into strict JSON syntax:
+    single-quoted strings and unquoted keys become double-quoted, Python literals are
+    mapped, raw control characters in strings are escaped and trailing commas dropped.
+    Returns (json_text, end_index, complete); incomplete values are closed off, except
+    that a member cut off inside a string is dropped rather than kept with a partial value.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    # len(out) where the current object member or array element starts
+    member_start = 0
+    quote: Optional[str] = None
+    i, n = start, len(text)
+    while i < n:
+        c = text[i]
+        if quote:
+            if c == "\\" and i + 1 < n:
+                nxt = text[i + 1]
+                out.append("'" if nxt == "'" else c + nxt)
+                i += 2
+                continue
+            if c == quote:
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')
+            elif c in _ESCAPES:
+                out.append(_ESCAPES[c])
+            elif c < " ":
+                out.append("\\u%04x" % ord(c))
+            else:
+                out.append(c)
+            i += 1
+            continue
+
+        if c in "\"'":
+            quote = c
+            out.append('"')
+        elif c in "{[":
+            stack.append(c)
+            out.append(c)
+            member_start = len(out)
+        elif c in "}]":
+            if not stack:
+                break
+            stack.pop()
+            out.append(c)
+            if not stack:
+                return "".join(out), i + 1, True
+        elif c == ",":
+            if _next_non_ws(text, i + 1) not in ("}", "]", ""):
+                out.append(c)
+            member_start = len(out)
+        elif c.isalpha() or c == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if _next_non_ws(text, j) == ":":
+                out.append(json.dumps(word))
+            else:
+                out.append(_PY_LITERALS.get(word, word))
+            i = j
+            continue
+        elif c == "`":
+            # stray markdown fence inside the object
+            pass
+        else:
+            out.append(c)
+        i += 1
+
+    # Ran off the end: drop a member whose string was cut, then close the containers
+    if quote:
+        del out[member_start:]
+    tail = "".join(out).rstrip()
+    while tail.endswith(","):
+        tail = tail[:-1].rstrip()
+    if tail.endswith(":"):
+        tail += " null"
+    return tail + "".join(_CLOSERS[b] for b in reversed(stack)), i, False
+
+
+def _balance(text: str) -> str:
+    # Re-close a cut-down prefix of normalized JSON
+    stack: List[str] = []
+    in_str = False
+    member_start = 0
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if in_str:
+            if c == "\\":
+                i += 1
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c in "{[":
+            stack.append(c)
+            member_start = i + 1
+        elif c in "}]" and stack:
+            stack.pop()
+        elif c == ",":
+            member_start = i + 1
+        i += 1
+    if in_str:
+        # The cut fell inside a string; never keep part of its value
+        text = text[:member_start]
+    text = text.rstrip().rstrip(",").rstrip()
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(_CLOSERS[b] for b in reversed(stack))
+
+
+def _parse_truncated(candidate: str) -> Optional[Any]:
+    # For outputs cut off mid-value, drop the trailing partial member and retry
+    text = candidate
+    for _ in range(_MAX_TRUNCATION_CUTS):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        # strip the auto-appended closers before cutting
+        body = text.rstrip("}] \n")
+        cut = body.rfind(",")
+        if cut <= 0:
+            return None
+        text = _balance(body[:cut])
+    return None
+
+
+def _candidates(raw: str) -> List[Tuple[str, bool]]:
+    found = []
+    i = raw.find("{")
+    while i != -1 and len(found) < _MAX_CANDIDATES:
+        text, end, complete = _normalize(raw, i)
+        found.append((text, complete))
+        if not complete:
+            break
+        i = raw.find("{", end)
+    return found
+
+
+def repair_json(raw: str) -> Dict[str, Any]:
+    """
+    Deterministically recover a JSON object from LLM output: strips prose and markdown
+    fences, fixes quoting, trailing commas and Python literals, balances brackets of
+    truncated output and returns the largest object that parses.
+    Raises ValueError when nothing can be recovered.
+    """
+    if raw is None:
+        raise ValueError("no JSON object found in empty output")
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        value = None
+    # Valid JSON that is not an object (a list, a string) may still wrap one; look inside it
+    if isinstance(value, dict):
+        return value
+
+    best, best_len = None, -1
+    for text, complete in _candidates(raw):
+        if len(text) <= best_len:
+            continue
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            value = None if complete else _parse_truncated(text)
+        # A truncated object with nothing left after dropping cut members is not a recovery
+        if isinstance(value, dict) and (value or complete):
+            best, best_len = value, len(text)
+    if best is None:
+        raise ValueError("no JSON object could be recovered from output")
+    return best
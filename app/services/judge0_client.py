@@ -1,36 +1,52 @@
-import requests
-import os, time, logging
-from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_fixed
-
-load_dotenv()
+import logging
+from typing import Optional
+from app.config import settings
+from app.services.http_client import get_client
+from app.services.circuit_breaker import call_with_retry
+from app.services.metrics import external_call
+from app.services.tracing import traced
 
 log = logging.getLogger("judge0")
-JUDGE0_URL = "https://judge0-ce.p.rapidapi.com"
-RAPIDAPI_KEY = os.getenv("x-rapidapi-key")
+JUDGE0_URL = settings.judge0_url
+RAPIDAPI_KEY = settings.rapidapi_key
 
 
 HEADERS = {
     "content-type": "application/json",
     "X-RapidAPI-Host": "judge0-ce.p.rapidapi.com",
-    "X-RapidAPI-Key": RAPIDAPI_KEY
 }
+if RAPIDAPI_KEY:  # self-hosted Judge0 needs no key, and httpx rejects None header values
+    HEADERS["X-RapidAPI-Key"] = RAPIDAPI_KEY
 
 SUBMIT_URL = JUDGE0_URL.rstrip("/") + "/submissions?base64_encoded=false&wait=true"
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def execute_code(src_code: str, language_id: int, stdin: str = "", expected_output: str = "") -> dict:
+@traced("judge0.execute")
+def _submit(payload: dict):
+    # One attempt; call_with_retry decides whether another one is worth making
+    with external_call("judge0", "execute"):
+        res = get_client("judge0").post(SUBMIT_URL, json=payload, headers=HEADERS, timeout=settings.judge0_timeout_s)
+        res.raise_for_status()
+    return res
+
+
+def execute_code(src_code: str, language_id: int, stdin: str = "", expected_output: str = "",
+                 cpu_time_limit: Optional[float] = None, memory_limit: Optional[int] = None) -> dict:
     """
     Submits code to Judge0 and fetches the result.
+    cpu_time_limit is in seconds and memory_limit in KB; Judge0 defaults apply when omitted.
+    Raises CircuitOpenError without calling out while the Judge0 breaker is open.
     """
     payload = {
         "source_code": src_code,
         "language_id": language_id,
         "stdin": stdin
     }
+    if cpu_time_limit is not None:
+        payload["cpu_time_limit"] = cpu_time_limit
+    if memory_limit is not None:
+        payload["memory_limit"] = memory_limit
 
-    res = requests.post(SUBMIT_URL, json=payload, headers=HEADERS)
-    res.raise_for_status()
+    res = call_with_retry("judge0", "execute", lambda: _submit(payload), attempts=3)
 
     try:
         result = res.json()
@@ -0,0 +1,175 @@
+# app/services/metrics.py
+"""
+Minimal in-process metrics registry rendered in the Prometheus text format at /metrics.
+Each uvicorn worker keeps its own registry; scrape workers individually or aggregate upstream.
+"""
+import bisect, threading, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_registry: List["_Metric"] = []
+_lock = threading.Lock()
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[idx] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        out = []
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = 'le="%s"' % _fmt_value(bound)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(self._sums[key])}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {cumulative}")
+        return out
+
+
+def render() -> str:
+    lines: List[str] = []
+    with _lock:
+        for m in _registry:
+            lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+HTTP_REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database statements executed per HTTP request", ("method", "route"), buckets=COUNT_BUCKETS)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Latency of named stages inside request handlers", ("handler", "stage"))
+EXTERNAL_CALL_SECONDS = Histogram(
+    "external_call_duration_seconds", "Latency of calls to Judge0 / OpenRouter (per attempt)", ("service", "operation", "outcome"))
+EXTERNAL_CALL_RETRIES = Counter(
+    "external_call_retries_total", "Retries of calls to external services", ("service", "operation"))
+EXTERNAL_CALL_ERRORS = Counter(
+    "external_call_errors_total", "Failed attempts of calls to external services", ("service", "operation", "error"))
+DB_QUERIES = Counter("db_queries_total", "Database statements executed")
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+
+# Per-request mutable query counter; set by the HTTP middleware
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_db_queries", default=None)
+
+
+@contextmanager
+def external_call(service: str, operation: str):
+    """Time one attempt of an external call and count failures by exception type."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        EXTERNAL_CALL_ERRORS.inc(service=service, operation=operation, error=type(e).__name__)
+        EXTERNAL_CALL_SECONDS.observe(time.perf_counter() - start, service=service, operation=operation, outcome="error")
+        raise
+    EXTERNAL_CALL_SECONDS.observe(time.perf_counter() - start, service=service, operation=operation, outcome="ok")
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def start_request_query_count() -> list:
+    counter = [0]
+    _request_queries.set(counter)
+    return counter
+
+
+def _on_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    DB_QUERIES.inc()
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+    if not event.contains(engine, "before_cursor_execute", _on_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _on_cursor_execute)
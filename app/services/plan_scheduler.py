@@ -0,0 +1,160 @@
+# app/services/plan_scheduler.py
+import copy, hashlib, json, math, threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+from app.models.plan_model import StudyPlanSchema
+from app.services.metrics import record_cache
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DEFAULT_DAYS = WEEKDAYS[:5]
+DEFAULT_WEEKS = 4
+MAX_WEEKS = 26
+# Practised alongside weak topics so the plan keeps some breadth
+CORE_TOPICS = ["arrays", "strings", "hashing", "two pointers", "recursion", "dynamic programming", "graphs", "aptitude"]
+_CORE_WEIGHT = 0.25
+_CACHE_SIZE = 256
+
+# key -> plan (without id); key -> enriched activity texts
+_plan_cache: "OrderedDict[str, dict]" = OrderedDict()
+_enriched: Dict[str, List[str]] = {}
+_lock = threading.Lock()
+
+
+def plan_cache_key(profile: dict, weak_topics: list, today: Optional[date] = None) -> str:
+    # The day is part of the key because the number of weeks depends on it
+    today = today or date.today()
+    blob = json.dumps({"profile": profile, "weak": weak_topics, "today": today.isoformat()}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _normalize_days(days: List[str]) -> List[str]:
+    out = []
+    for d in days or []:
+        key = str(d).strip()[:3].title()
+        if key in WEEKDAYS and key not in out:
+            out.append(key)
+    out.sort(key=WEEKDAYS.index)
+    return out or list(DEFAULT_DAYS)
+
+
+def _weeks_until(target_date: str, today: date) -> int:
+    try:
+        target = datetime.strptime(target_date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return DEFAULT_WEEKS
+    days = (target - today).days
+    if days <= 0:
+        return 1
+    return max(1, min(MAX_WEEKS, math.ceil(days / 7)))
+
+
+def _topic_weights(weak_topics: list) -> List[Tuple[str, float, Optional[float]]]:
+    # (topic, weight, accuracy); lower accuracy gets proportionally more sessions
+    weights = []
+    seen = set()
+    for w in weak_topics or []:
+        topic = w.get("topic")
+        if not topic or topic in seen:
+            continue
+        acc = float(w.get("accuracy") or 0.0)
+        weights.append((topic, 1.0 - acc + 0.1, acc))
+        seen.add(topic)
+    core = [t for t in CORE_TOPICS if t not in seen]
+    core_weight = _CORE_WEIGHT if weights else 1.0
+    weights.extend((t, core_weight, None) for t in core)
+    return weights
+
+
+def _activity(topic: str, accuracy: Optional[float], minutes: int) -> str:
+    problems = max(1, minutes // 25)
+    if accuracy is None:
+        return f"Practice {topic}: solve {problems} problem(s) and review patterns"
+    if accuracy < 0.4:
+        return f"Relearn {topic} fundamentals, then solve {max(1, problems - 1)} easy problem(s)"
+    return f"Revise {topic} mistakes and solve {problems} medium problem(s)"
+
+
+def _build(profile: dict, weak_topics: list, today: date) -> dict:
+    days = _normalize_days(profile.get("preferred_days"))
+    hours = max(1, int(profile.get("hours_per_week") or 1))
+    weeks = _weeks_until(profile.get("target_date"), today)
+
+    # Spread the weekly minutes over the preferred days, remainder on the first days
+    per_day, extra = divmod(hours * 60, len(days))
+    day_minutes = [per_day + (1 if i < extra else 0) for i in range(len(days))]
+
+    weights = _topic_weights(weak_topics)
+    total_weight = sum(w for _, w, _ in weights)
+    current = [0.0] * len(weights)
+    items = []
+    for week in range(1, weeks + 1):
+        for d, minutes in zip(days, day_minutes):
+            if minutes <= 0:
+                continue
+            if week == weeks and weeks > 1 and d == days[-1]:
+                items.append({"day": f"Week {week} {d}", "topic": "mock test",
+                              "activity": "Timed mixed mock test, then review every mistake",
+                              "duration_min": minutes, "notes": None})
+                continue
+            # Smooth weighted round-robin: deterministic and proportional to weight
+            for i, (_, w, _) in enumerate(weights):
+                current[i] += w
+            best = max(range(len(weights)), key=current.__getitem__)
+            current[best] -= total_weight
+            topic, _, acc = weights[best]
+            notes = f"Weak topic (accuracy {acc:.0%})" if acc is not None else None
+            items.append({"day": f"Week {week} {d}", "topic": topic,
+                          "activity": _activity(topic, acc, minutes),
+                          "duration_min": minutes, "notes": notes})
+
+    plan = StudyPlanSchema(
+        title=profile.get("goal") or "Study Plan",
+        weeks=weeks,
+        total_hours_per_week=hours,
+        items=items,
+    )
+    return plan.model_dump()
+
+
+def build_local_plan(profile: dict, weak_topics: list, today: Optional[date] = None) -> Tuple[dict, str]:
+    """
+    Schedule hours_per_week across preferred_days until target_date, weighting topics by
+    weak-topic accuracy. Returns (plan, cache_key); plans are cached by profile and weak topics
+    and carry any LLM-enriched activity text already computed for the same key.
+    """
+    today = today or date.today()
+    key = plan_cache_key(profile, weak_topics, today)
+    with _lock:
+        cached = _plan_cache.get(key)
+        if cached is not None:
+            _plan_cache.move_to_end(key)
+    record_cache("study_plan", cached is not None)
+    if cached is None:
+        cached = _build(profile, weak_topics, today)
+        with _lock:
+            _plan_cache[key] = cached
+            while len(_plan_cache) > _CACHE_SIZE:
+                _plan_cache.popitem(last=False)
+
+    plan = copy.deepcopy(cached)
+    activities = _enriched.get(key)
+    if activities and len(activities) == len(plan["items"]):
+        for item, text in zip(plan["items"], activities):
+            item["activity"] = text
+    plan["id"] = str(uuid4())
+    return plan, key
+
+
+def is_enriched(key: str) -> bool:
+    hit = key in _enriched
+    record_cache("plan_enrichment", hit)
+    return hit
+
+
+def store_enrichment(key: str, activities: List[str]) -> None:
+    with _lock:
+        _enriched[key] = list(activities)
+        while len(_enriched) > _CACHE_SIZE:
+            _enriched.pop(next(iter(_enriched)))
@@ -0,0 +1,268 @@
+# app/services/question_dedup.py
+"""
+Near-duplicate index for stored questions. Each question's title and description (or
+question_text) is normalized, cut into character 5-gram shingles and reduced to a 64-value
+MinHash signature. The share of equal values between two signatures estimates the Jaccard
+similarity of their shingle sets.
+
+Candidates are found with LSH: the signature is split into 16 bands of 4 values, and two
+questions whose band values match in any band are compared. Band keys live in one sorted
+numpy array (recent inserts sit in a small dict until merged), so a lookup is a single
+searchsorted call plus a handful of signature comparisons. With the default threshold of 0.7,
+pairs that similar are caught about 99% of the time.
+
+Signatures are stored in questions.minhash, so building the index at startup only reads
+blobs; rows without one are hashed and backfilled. Each worker process holds its own index
+and picks up questions stored by other workers every _SYNC_EVERY_S.
+
+    python -m app.services.question_dedup rebuild   # re-hash every question
+"""
+import argparse, logging, re, threading, time, zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import update
+from app.config import settings
+from app.db.db import SessionLocal
+from app.db.models import Question
+from app.services.metrics import Counter
+
+log = logging.getLogger("question_dedup")
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+# Band keys buffered unsorted before they are merged into the sorted array
+_MERGE_AT = 4096
+_SYNC_EVERY_S = 30
+
+QUESTION_DUPLICATES = Counter(
+    "question_duplicates_total", "Generated questions found to near-duplicate a stored one", ("action",))
+
+_rng = np.random.default_rng(20240611)
+# Multiply-shift hashing: h(x) = (a*x + b) mod 2^64 >> 32, with a odd
+_A = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(0, 2**63, ROWS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_BAND_SALT = _rng.integers(0, 2**63, BANDS, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    text = re.sub(r"\d+", "0", text.lower())  # "n <= 10^5" and "n <= 10^6" read the same
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def question_text(q: dict) -> str:
+    return " ".join(str(q.get(k) or "") for k in ("title", "description", "question_text"))
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (NUM_PERM uint32 values) of the text, or None if it is empty."""
+    text = normalize(text)
+    if not text:
+        return None
+    grams = {text[i:i + SHINGLE] for i in range(max(1, len(text) - SHINGLE + 1))}
+    x = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+    with np.errstate(over="ignore"):
+        h = (np.outer(x, _A) + _B) >> np.uint64(32)
+    return h.min(axis=0).astype(np.uint32)
+
+
+def _band_keys(sig: np.ndarray) -> np.ndarray:
+    with np.errstate(over="ignore"):
+        return (sig.reshape(BANDS, ROWS).astype(np.uint64) * _BAND_MIX).sum(axis=1, dtype=np.uint64) ^ _BAND_SALT
+
+
+class MinHashIndex:
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._sigs = np.empty((1024, NUM_PERM), dtype=np.uint32)
+        self._keys = np.empty(0, dtype=np.uint64)   # sorted band keys
+        self._rows = np.empty(0, dtype=np.int32)    # row of each key
+        self._tail: Dict[int, List[int]] = {}
+        self._tail_size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, question_id: str) -> bool:
+        return question_id in self._row_of
+
+    def add(self, question_id: str, sig: np.ndarray):
+        with self._lock:
+            if question_id in self._row_of:
+                return
+            row = len(self._ids)
+            if row == len(self._sigs):
+                self._sigs = np.concatenate([self._sigs, np.empty_like(self._sigs)])
+            self._sigs[row] = sig
+            self._ids.append(question_id)
+            self._row_of[question_id] = row
+            for k in _band_keys(sig).tolist():
+                self._tail.setdefault(k, []).append(row)
+            self._tail_size += BANDS
+            if self._tail_size >= _MERGE_AT:
+                self._merge()
+
+    def add_many(self, ids: List[str], sigs: np.ndarray):
+        """Bulk load; much faster than add() per question."""
+        with self._lock:
+            fresh = [i for i, qid in enumerate(ids) if qid not in self._row_of]
+            if not fresh:
+                return
+            start = len(self._ids)
+            need = start + len(fresh)
+            if need > len(self._sigs):
+                grown = np.empty((max(need, 2 * len(self._sigs)), NUM_PERM), dtype=np.uint32)
+                grown[:start] = self._sigs[:start]
+                self._sigs = grown
+            self._sigs[start:need] = sigs[fresh]
+            for n, i in enumerate(fresh):
+                self._ids.append(ids[i])
+                self._row_of[ids[i]] = start + n
+            new = self._sigs[start:need].reshape(-1, BANDS, ROWS).astype(np.uint64)
+            with np.errstate(over="ignore"):
+                keys = (new * _BAND_MIX).sum(axis=2, dtype=np.uint64) ^ _BAND_SALT
+            self._merge(keys.ravel(), np.repeat(np.arange(start, need, dtype=np.int32), BANDS))
+
+    def _merge(self, keys: Optional[np.ndarray] = None, rows: Optional[np.ndarray] = None):
+        parts_k, parts_r = [self._keys], [self._rows]
+        if self._tail:
+            tk = [k for k, rs in self._tail.items() for _ in rs]
+            tr = [r for rs in self._tail.values() for r in rs]
+            parts_k.append(np.array(tk, dtype=np.uint64))
+            parts_r.append(np.array(tr, dtype=np.int32))
+        if keys is not None:
+            parts_k.append(keys)
+            parts_r.append(rows)
+        all_k, all_r = np.concatenate(parts_k), np.concatenate(parts_r)
+        order = np.argsort(all_k, kind="stable")
+        self._keys, self._rows = all_k[order], all_r[order]
+        self._tail, self._tail_size = {}, 0
+
+    def query(self, sig: np.ndarray, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Most similar stored question at or above the threshold, as (id, similarity)."""
+        keys = _band_keys(sig)
+        with self._lock:
+            lo = np.searchsorted(self._keys, keys, side="left")
+            hi = np.searchsorted(self._keys, keys, side="right")
+            cand = [self._rows[a:b] for a, b in zip(lo.tolist(), hi.tolist()) if b > a]
+            for k in keys.tolist():
+                if k in self._tail:
+                    cand.append(np.array(self._tail[k], dtype=np.int32))
+            if not cand:
+                return None
+            rows = np.unique(np.concatenate(cand))
+            sims = (self._sigs[rows] == sig).mean(axis=1)
+            best = int(np.argmax(sims))
+            if exclude is not None and self._ids[rows[best]] == exclude:
+                sims[best] = -1.0
+                best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+            return self._ids[rows[best]], float(sims[best])
+
+
+_index: Optional[MinHashIndex] = None
+_index_lock = threading.Lock()
+_synced_at: Optional[datetime] = None
+_next_sync = 0.0
+
+
+def _load(index: MinHashIndex, since: Optional[datetime] = None) -> int:
+    """Add stored questions (created at or after since) to the index, backfilling missing signatures."""
+    db = SessionLocal()
+    try:
+        q = db.query(Question.id, Question.minhash)
+        if since is not None:
+            q = q.filter(Question.created_at >= since)
+        rows = q.all()
+        ids, blobs, missing = [], [], []
+        for qid, blob in rows:
+            if qid in index:
+                continue
+            if blob:
+                ids.append(qid)
+                blobs.append(blob)
+            else:
+                missing.append(qid)
+        if ids:
+            index.add_many(ids, np.frombuffer(b"".join(blobs), dtype=np.uint32).reshape(-1, NUM_PERM))
+        backfilled = 0
+        # Batched to stay under the database's bound-parameter limit
+        for i in range(0, len(missing), 500):
+            batch = []
+            for qid, title, raw in (db.query(Question.id, Question.title, Question.raw)
+                                    .filter(Question.id.in_(missing[i:i + 500]))):
+                sig = signature(question_text(raw or {}) or title or "")
+                if sig is not None:
+                    index.add(qid, sig)
+                    batch.append({"id": qid, "minhash": sig.tobytes()})
+            if batch:
+                db.execute(update(Question), batch)
+                db.commit()
+                backfilled += len(batch)
+        return len(ids) + backfilled
+    finally:
+        db.close()
+
+
+def get_index() -> MinHashIndex:
+    """The process's index, built from the questions table on first use and synced periodically."""
+    global _index, _synced_at, _next_sync
+    with _index_lock:
+        now = time.monotonic()
+        if _index is None:
+            _index = MinHashIndex(settings.question_dedup_threshold)
+            _synced_at = datetime.utcnow()
+            _load(_index)
+            _next_sync = now + _SYNC_EVERY_S
+        elif now >= _next_sync:
+            # Questions other workers stored since the last sync; the overlap covers clock skew
+            since, _synced_at = _synced_at - timedelta(seconds=5), datetime.utcnow()
+            _load(_index, since)
+            _next_sync = now + _SYNC_EVERY_S
+        return _index
+
+
+def rebuild() -> int:
+    """Recompute every stored signature and swap in a fresh index; returns its size."""
+    global _index, _synced_at, _next_sync
+    db = SessionLocal()
+    try:
+        db.execute(update(Question).values(minhash=None))
+        db.commit()
+    finally:
+        db.close()
+    index = MinHashIndex(settings.question_dedup_threshold)
+    synced_at = datetime.utcnow()
+    _load(index)
+    with _index_lock:
+        _index, _synced_at, _next_sync = index, synced_at, time.monotonic() + _SYNC_EVERY_S
+    return len(index)
+
+
+def find_duplicate(question: dict) -> Optional[Tuple[str, float]]:
+    """(id, similarity) of a stored question this one near-duplicates, if any."""
+    sig = signature(question_text(question))
+    if sig is None:
+        return None
+    return get_index().query(sig, exclude=question.get("id"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("command", choices=["rebuild"])
+    ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    t = time.perf_counter()
+    n = rebuild()
+    print(f"indexed {n} questions in {time.perf_counter() - t:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
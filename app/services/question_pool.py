@@ -0,0 +1,88 @@
+# app/services/question_pool.py
+"""
+Previously generated questions kept in the questions table, served by /questions/generate-question
+when OpenRouter is unavailable. Near-duplicates of stored questions are not added. Only rows
+written here (origin "generated") are served; questions stored from client submissions are not.
+"""
+import logging, random
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from app.db.db import SessionLocal
+from app.db.models import Question
+
+log = logging.getLogger("question_pool")
+
+# Questions.origin of rows written here; only those are served from the pool
+POOL_ORIGIN = "generated"
+# How many recent questions of a difficulty are considered when picking one
+_CANDIDATES = 200
+
+
+def _kind(raw: dict) -> str:
+    return "coding" if "sample_testcases" in raw else "aptitude"
+
+
+def _topic_key(raw: dict) -> str:
+    topics = [t.lower().replace("|", " ") for t in (raw.get("topics") or [raw.get("topic")]) if t]
+    return "|" + "|".join(topics) + "|"
+
+
+def add_to_pool(question: dict, difficulty: str):
+    # Imported here so numpy stays off the startup path
+    from app.services.question_dedup import QUESTION_DUPLICATES, get_index, question_text, signature
+    sig = signature(question_text(question))
+    index = get_index()
+    if sig is not None:
+        dup = index.query(sig, exclude=question["id"])
+        if dup is not None:
+            QUESTION_DUPLICATES.inc(action="rejected")
+            log.info("not pooling question %s: %.2f similar to %s", question["id"], dup[1], dup[0])
+            return
+    db = SessionLocal()
+    try:
+        if db.get(Question, question["id"]) is not None:
+            return
+        db.add(Question(
+            id=question["id"],
+            title=(question.get("title") or question.get("question_text") or "")[:255],
+            difficulty=question.get("difficulty") or difficulty,
+            topics=question.get("topics") or [question.get("topic")],
+            raw=question,
+            minhash=sig.tobytes() if sig is not None else None,
+            origin=POOL_ORIGIN,
+            kind=_kind(question),
+            topic_key=_topic_key(question)
+        ))
+        db.commit()
+        if sig is not None:
+            index.add(question["id"], sig)
+    except IntegrityError:
+        db.rollback()
+    except Exception:
+        log.exception("could not add question %s to the pool", question.get("id"))
+    finally:
+        db.close()
+
+
+def pick_from_pool(question_type: str, topic: str, difficulty: str) -> Optional[dict]:
+    """A random generated question of the type and topic, preferring the requested difficulty."""
+    pattern = "%|" + topic.lower().replace("|", " ").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "|%"
+    db = SessionLocal()
+    try:
+        for level in (difficulty, None):
+            where = [Question.origin == POOL_ORIGIN, Question.kind == question_type,
+                     Question.topic_key.like(pattern, escape="\\")]
+            if level is not None:
+                where.append(Question.difficulty == level)
+            count = db.execute(select(func.count()).select_from(Question).where(*where)).scalar()
+            if not count:
+                continue
+            # Only the chosen row's JSON is loaded
+            return db.execute(
+                select(Question.raw).where(*where).order_by(Question.created_at.desc())
+                .offset(random.randrange(min(count, _CANDIDATES))).limit(1)
+            ).scalar()
+        return None
+    finally:
+        db.close()
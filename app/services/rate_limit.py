@@ -0,0 +1,194 @@
+# app/services/rate_limit.py
+"""
+Per-identity token buckets and global admission control for the endpoints that fan out to
+Judge0 and OpenRouter.
+
+Each route class has a bucket per client IP, narrowed to IP plus user when an auth layer
+has set a verified request.state.user_id; an empty bucket answers 429 with Retry-After.
+Independently, each upstream resource ("sandbox", "llm") has an in-flight cap per worker;
+at capacity requests are shed immediately with 503 + Retry-After instead of queueing, which
+keeps tail latency of admitted requests bounded under overload.
+
+Buckets live in process memory unless RATE_LIMIT_REDIS_URL points at a shared Redis
+(optional `redis` package), or another backend is installed with set_backend().
+"""
+import math, threading, time
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.services.metrics import Counter
+
+# route class -> (requests per minute, burst)
+DEFAULT_POLICIES: Dict[str, Tuple[float, int]] = {
+    "execute": (30, 10),
+    "submit": (20, 5),
+    "generate": (10, 3),
+    "plan": (6, 3),
+    "stress": (2, 2),
+}
+# route class -> upstream resource whose in-flight count is capped
+RESOURCES = {"execute": "sandbox", "submit": "sandbox", "generate": "llm", "stress": "sandbox"}
+ADMISSION_RETRY_AFTER_S = 2
+
+REJECTIONS = Counter(
+    "admission_rejections_total", "Requests rejected by rate limiting or admission control", ("route_class", "reason"))
+
+
+def _parse_policies(spec: str) -> Dict[str, Tuple[float, int]]:
+    # "execute=30/10,submit=20/5" -> requests per minute / burst
+    policies = dict(DEFAULT_POLICIES)
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        rate, _, burst = value.partition("/")
+        policies[name.strip()] = (float(rate), int(burst or max(1, int(float(rate)))))
+    return policies
+
+
+class MemoryBackend:
+    """Token buckets in a dict; per worker process."""
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate_per_s: float, burst: int, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._evict(now)
+                b = self._buckets[key] = [float(burst), now]
+            tokens = min(burst, b[0] + (now - b[1]) * rate_per_s)
+            b[1] = now
+            if tokens >= cost:
+                b[0] = tokens - cost
+                return True, 0.0
+            b[0] = tokens
+            return False, (cost - tokens) / rate_per_s
+
+    def _evict(self, now: float):
+        # Drop the oldest half; an idle bucket is full again, so forgetting it changes nothing
+        for key, _ in sorted(self._buckets.items(), key=lambda kv: kv[1][1])[: len(self._buckets) // 2]:
+            del self._buckets[key]
+
+
+_REDIS_TAKE = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisBackend:
+    """Token buckets shared by all workers, updated atomically by a Lua script on the Redis clock."""
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = "placemon:rl:"):
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_REDIS_TAKE)
+
+    def take(self, key: str, rate_per_s: float, burst: int, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, wait = self._take(keys=[self.prefix + key], args=[rate_per_s, burst, cost])
+        return bool(int(allowed)), float(wait)
+
+
+class Gate:
+    """Non-blocking in-flight counter for one upstream resource."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_enter(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+POLICIES = _parse_policies(settings.rate_limits)
+GATES = {"sandbox": Gate(settings.sandbox_max_inflight), "llm": Gate(settings.llm_max_inflight)}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = settings.rate_limit_redis_url
+                _backend = RedisBackend(url) if url else MemoryBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """Install a bucket backend: any object with take(key, rate_per_s, burst) -> (allowed, retry_after_s)."""
+    global _backend
+    _backend = backend
+
+
+def _identity(request: Request) -> str:
+    # User ids in headers or bodies are the client's claim and can change per request, so they
+    # never pick the bucket. A user verified by an auth layer (request.state.user_id) narrows it.
+    ip = request.client.host if request.client else "unknown"
+    user = getattr(request.state, "user_id", None)
+    return f"ip:{ip}:user:{user}" if user is not None else f"ip:{ip}"
+
+
+def _reject(route_class: str, reason: str, status: int, retry_after: float, detail: str):
+    REJECTIONS.inc(route_class=route_class, reason=reason)
+    raise HTTPException(status_code=status, detail=detail,
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+def limit(route_class: str):
+    """FastAPI dependency enforcing the route class's rate limit and its resource's admission cap."""
+    async def dependency(request: Request):
+        if not settings.rate_limit_enabled:
+            yield
+            return
+        gate: Optional[Gate] = GATES.get(RESOURCES.get(route_class))
+        if gate is not None and not gate.try_enter():
+            _reject(route_class, "capacity", 503, ADMISSION_RETRY_AFTER_S, "server busy, retry later")
+        try:
+            per_minute, burst = POLICIES[route_class]
+            key = f"{route_class}:{_identity(request)}"
+            backend = get_backend()
+            if backend.blocking:
+                allowed, retry_after = await run_in_threadpool(backend.take, key, per_minute / 60.0, burst)
+            else:
+                allowed, retry_after = backend.take(key, per_minute / 60.0, burst)
+            if not allowed:
+                _reject(route_class, "rate", 429, retry_after, "rate limit exceeded")
+            yield
+        finally:
+            if gate is not None:
+                gate.leave()
+    return dependency
@@ -0,0 +1,222 @@
+# app/services/regrade.py
+"""
+Offline re-grading of every stored submission for a question, for when its tests change.
+
+    python -m app.services.regrade QUESTION_ID [--workers 16] [--chunk-size 500] [--restart]
+
+Submissions are read in id order, chunk by chunk. Identical sources (same test set, language
+and code) are executed once. Distinct sources run through Judge0 on a bounded thread pool. Each
+chunk's score_percent/passed/total and test rows are written in one transaction, and then a
+checkpoint file records the last id done. A rerun resumes from the checkpoint (picking up
+submissions made since) unless the question's tests changed again since it was written.
+Each submission is re-graded against the test set it was submitted with: samples only for
+run_hidden=False, otherwise samples, hidden and stress tests. Rows from before run_hidden was
+stored (NULL) get the full set, the API default.
+The run stops without writing the current chunk when Judge0 is unavailable or any execution
+in the chunk errored (graded IE), so transient failures never overwrite historical scores.
+
+Weak-topic statistics are computed from the submission rows, so they follow the new scores
+without a separate pass. Cached responses are invalidated per user, but that reaches the API
+workers only through the shared response cache tier (RESPONSE_CACHE_REDIS_URL). Submissions stored without source code (before it was kept, or from
+POST /submissions/) and those still waiting in the evaluation queue are skipped.
+"""
+import argparse, hashlib, json, logging, os, time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import delete, update
+from app.config import settings
+from app.db.db import SessionLocal
+from app.db.models import Question, Submission, SubmissionTest
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.evaluation_queue import save_test_rows
+from app.services.evaluator import run_tests_for_submission
+from app.services.response_cache import invalidate_users
+
+log = logging.getLogger("regrade")
+
+
+def _suite(raw: dict, run_hidden: bool) -> dict:
+    # The same tests /submissions/submit runs with this run_hidden
+    extra = (raw.get("hidden_testcases") or []) + (raw.get("stress_testcases") or []) if run_hidden else []
+    return {
+        "testcases": (raw.get("sample_testcases") or []) + extra,
+        "checker": raw.get("checker"),
+        "time_limit_s": raw.get("time_limit_s"),
+        "memory_limit_kb": raw.get("memory_limit_kb"),
+    }
+
+
+def _fingerprint(suites: dict) -> str:
+    return hashlib.sha256(json.dumps({str(k): v for k, v in suites.items()}, sort_keys=True).encode()).hexdigest()
+
+
+def default_checkpoint(question_id: str) -> str:
+    return os.path.join(os.path.dirname(settings.submissions_log) or ".", f"regrade-{question_id}.json")
+
+
+def _load_checkpoint(path: str, question_id: str, fingerprint: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("question_id") != question_id or state.get("suite") != fingerprint:
+        return None
+    return state
+
+
+def _save_checkpoint(path: str, state: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def regrade_question(question_id: str, workers: int = 16, chunk_size: int = 500,
+                     checkpoint: Optional[str] = None, restart: bool = False,
+                     progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Re-grade all submissions for question_id; returns the run's counters."""
+    db = SessionLocal()
+    try:
+        q = db.get(Question, question_id)
+        if q is None or not q.raw:
+            raise ValueError(f"question {question_id!r} not found")
+        suites = {True: _suite(q.raw, True), False: _suite(q.raw, False)}
+    finally:
+        db.close()
+    if not suites[True]["testcases"]:
+        raise ValueError(f"question {question_id!r} has no testcases")
+
+    fingerprint = _fingerprint(suites)
+    checkpoint = checkpoint or default_checkpoint(question_id)
+    state = None if restart else _load_checkpoint(checkpoint, question_id, fingerprint)
+    if state is None:
+        state = {"question_id": question_id, "suite": fingerprint, "last_id": 0,
+                 "counts": {"submissions": 0, "executed": 0, "deduplicated": 0, "changed": 0,
+                            "skipped_no_source": 0, "skipped_pending": 0}}
+    counts = state["counts"]
+
+    def evaluate(run_hidden: bool, language_id: int, source: str) -> dict:
+        suite = suites[run_hidden]
+        return run_tests_for_submission(
+            source, language_id, suite["testcases"], checker=suite["checker"],
+            time_limit_s=suite["time_limit_s"], memory_limit_kb=suite["memory_limit_kb"])
+
+    # (run_hidden, language_id, sha256 of source) -> score/passed/total and the submission whose test rows
+    # hold the results; shared by every chunk of this run. Test lists are not kept past their chunk.
+    graded: Dict[Tuple[bool, int, str], dict] = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="regrade") as pool:
+        while True:
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(Submission.id, Submission.user_id, Submission.language_id, Submission.source_code,
+                             Submission.score_percent, Submission.passed, Submission.run_hidden)
+                    .filter(Submission.question_id == question_id, Submission.id > state["last_id"])
+                    .order_by(Submission.id)
+                    .limit(chunk_size)
+                    .all()
+                )
+                if not rows:
+                    state["finished_at"] = time.time()
+                    _save_checkpoint(checkpoint, state)
+                    break
+
+                todo = []
+                for r in rows:
+                    if not r.source_code:
+                        counts["skipped_no_source"] += 1
+                    elif r.score_percent is None:
+                        counts["skipped_pending"] += 1
+                    else:
+                        todo.append((r, (r.run_hidden is not False, r.language_id,
+                                         hashlib.sha256(r.source_code.encode()).hexdigest())))
+
+                pending = {}
+                for r, key in todo:
+                    if key not in graded and key not in pending:
+                        pending[key] = pool.submit(evaluate, *key[:2], r.source_code)
+                finished, _ = wait(pending.values(), return_when=FIRST_EXCEPTION)
+                failed = next((f for f in finished if f.exception() is not None), None)
+                if failed is not None:
+                    for f in pending.values():
+                        f.cancel()
+                    # This chunk is not written; the checkpoint still points before it
+                    if isinstance(failed.exception(), CircuitOpenError):
+                        log.warning("Judge0 unavailable, stopping at submission %s", state["last_id"])
+                        return {**counts, "done": False, "interrupted": str(failed.exception()),
+                                "elapsed_s": round(time.perf_counter() - start, 2)}
+                    raise failed.exception()
+                fresh = {key: f.result() for key, f in pending.items()}
+                # A Judge0 error is graded IE (status -1) rather than raised; writing those would
+                # overwrite real historical scores, so the chunk is dropped and the checkpoint stays
+                if any((t.get("status") or {}).get("id") == -1 for out in fresh.values() for t in out["tests"]):
+                    log.warning("Judge0 execution errors, stopping at submission %s", state["last_id"])
+                    return {**counts, "done": False, "interrupted": "Judge0 execution errors",
+                            "elapsed_s": round(time.perf_counter() - start, 2)}
+                counts["executed"] += len(pending)
+                counts["deduplicated"] += len(todo) - len(pending)
+
+                ids = [r.id for r, _ in todo]
+                if ids:
+                    # Sources graded in an earlier chunk reuse that submission's stored test rows
+                    sources = {graded[key]["source_id"] for _, key in todo if key not in fresh}
+                    copied: Dict[int, list] = {}
+                    if sources:
+                        for t in (db.query(SubmissionTest).filter(SubmissionTest.submission_id.in_(sources))
+                                  .order_by(SubmissionTest.test_index)):
+                            copied.setdefault(t.submission_id, []).append({
+                                "index": t.test_index, "stdin": t.stdin, "expected": t.expected, "stdout": t.stdout,
+                                "stderr": t.stderr, "passed": t.passed, "time": t.time, "memory": t.memory,
+                                "verdict": t.verdict})
+                    for r, key in todo:
+                        if key in fresh and key not in graded:
+                            out = fresh[key]
+                            graded[key] = {"score_percent": out["score_percent"], "passed": out["passed"],
+                                           "total": out["total"], "source_id": r.id}
+                    db.execute(update(Submission), [
+                        {"id": r.id, "score_percent": graded[key]["score_percent"],
+                         "passed": graded[key]["passed"], "total": graded[key]["total"]}
+                        for r, key in todo
+                    ])
+                    db.execute(delete(SubmissionTest).where(SubmissionTest.submission_id.in_(ids)))
+                    for r, key in todo:
+                        save_test_rows(db, r.id, fresh[key]["tests"] if key in fresh
+                                       else copied.get(graded[key]["source_id"], []))
+                    db.commit()
+                    invalidate_users(*(r.user_id for r, _ in todo))
+                counts["submissions"] += len(todo)
+                counts["changed"] += sum(1 for r, key in todo
+                                         if r.score_percent != graded[key]["score_percent"]
+                                         or r.passed != graded[key]["passed"])
+                state["last_id"] = rows[-1].id
+                _save_checkpoint(checkpoint, state)
+                if progress:
+                    progress(dict(counts, last_id=state["last_id"]))
+            finally:
+                db.close()
+    return {**counts, "done": True, "elapsed_s": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-grade stored submissions for a question")
+    ap.add_argument("question_id")
+    ap.add_argument("--workers", type=int, default=16, help="submissions executed in parallel")
+    ap.add_argument("--chunk-size", type=int, default=500)
+    ap.add_argument("--checkpoint", help="progress file (default: next to SUBMISSIONS_LOG)")
+    ap.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not settings.response_cache_redis_url:
+        # This process's invalidations cannot reach the API workers' in-process caches
+        log.warning("RESPONSE_CACHE_REDIS_URL is not set: API workers may serve cached weak topics "
+                    "for up to %ss after this re-grade", int(settings.response_cache_ttl_s))
+    out = regrade_question(args.question_id, workers=args.workers, chunk_size=args.chunk_size,
+                           checkpoint=args.checkpoint, restart=args.restart,
+                           progress=lambda c: log.info("regraded through submission %s: %s", c["last_id"], c))
+    print(json.dumps(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# app/services/response_cache.py
+"""
+Cache for per-user read endpoints whose data only changes on a submission or plan write.
+
+Entries hold the encoded JSON body and its ETag. Each entry belongs to a scope ("user:<id>"
+or "plan:<id>") with a version number, and writes invalidate by bumping that version
+instead of finding keys to delete. A reader takes the version before it queries the
+database, so a result computed while a write commits lands under an outdated version and
+is never served.
+
+Two tiers:
+  * in-process: an LRU dict per worker, always on
+  * shared (RESPONSE_CACHE_REDIS_URL, optional `redis` package): versions and bodies live in
+    Redis, so an invalidation in one worker is seen by all. A lookup is one round trip
+    (a Lua script returns the version, plus the body unless the local copy is current).
+Without the shared tier, each worker only sees its own invalidations, and entries from
+other workers' writes stay stale for up to RESPONSE_CACHE_TTL_S.
+
+Lookups are counted in cache_requests_total{cache="response_<name>"}; 304 answers in
+http_not_modified_total.
+"""
+import hashlib, json, logging, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.config import settings
+from app.services.metrics import Counter, record_cache
+
+log = logging.getLogger("response_cache")
+
+NOT_MODIFIED = Counter("http_not_modified_total", "Conditional GETs answered 304 Not Modified", ("cache",))
+
+
+def _encode(value: Any) -> bytes:
+    # Same bytes FastAPI's JSONResponse would produce
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=10).hexdigest() + '"'
+
+
+class LocalTier:
+    """LRU of (name, key) -> (scope, version, etag, body, expires) plus per-scope versions; per worker."""
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def version(self, scope: str) -> int:
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def bump(self, scopes: Iterable[str]):
+        with self._lock:
+            for scope in scopes:
+                # A process-wide clock rather than +1, so a version is never reused
+                self._clock += 1
+                self._versions[scope] = self._clock
+
+    def get(self, name: str, key: str) -> Optional[tuple]:
+        with self._lock:
+            entry = self._entries.get((name, key))
+            if entry is None:
+                return None
+            if entry[4] <= time.monotonic():
+                del self._entries[(name, key)]
+                return None
+            self._entries.move_to_end((name, key))
+            return entry
+
+    def put(self, name: str, key: str, scope: str, version, etag: str, body: bytes):
+        with self._lock:
+            self._entries[(name, key)] = (scope, version, etag, body, time.monotonic() + self.ttl_s)
+            self._entries.move_to_end((name, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_REDIS_LOOKUP = """
+local v = redis.call('GET', KEYS[1]) or '0'
+if v == ARGV[2] then
+  return {v, ''}
+end
+return {v, redis.call('GET', ARGV[1] .. v) or ''}
+"""
+
+
+class RedisTier:
+    """Versions and bodies shared by all workers."""
+
+    def __init__(self, url: str, ttl_s: float, prefix: str = "placemon:rc:"):
+        import redis
+        self.prefix = prefix
+        self.ttl_s = ttl_s
+        self._client = redis.Redis.from_url(url)
+        self._lookup = self._client.register_script(_REDIS_LOOKUP)
+
+    def lookup(self, name: str, key: str, scope: str, local_version: Optional[str]) -> Tuple[str, Optional[tuple]]:
+        """(current version, (etag, body) or None); the body is skipped when local_version is current."""
+        version, raw = self._lookup(keys=[f"{self.prefix}v:{scope}"],
+                                    args=[f"{self.prefix}e:{name}:{key}:", local_version or ""])
+        version = version.decode()
+        if not raw:
+            return version, None
+        etag, _, body = raw.partition(b"\n")
+        return version, (etag.decode(), body)
+
+    def put(self, name: str, key: str, version: str, etag: str, body: bytes):
+        self._client.set(f"{self.prefix}e:{name}:{key}:{version}", etag.encode() + b"\n" + body,
+                         ex=max(1, int(self.ttl_s)))
+
+    def bump(self, scopes: Iterable[str]):
+        pipe = self._client.pipeline(transaction=False)
+        for scope in scopes:
+            pipe.incr(f"{self.prefix}v:{scope}")
+            # Outlive every entry stored under an older version, so a reset to 0 cannot revive one
+            pipe.expire(f"{self.prefix}v:{scope}", max(1, int(self.ttl_s * 2)))
+        pipe.execute()
+
+
+_local = LocalTier(settings.response_cache_max_entries, settings.response_cache_ttl_s)
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared() -> Optional[RedisTier]:
+    global _shared
+    if _shared is None and settings.response_cache_redis_url:
+        with _shared_lock:
+            if _shared is None:
+                _shared = RedisTier(settings.response_cache_redis_url, settings.response_cache_ttl_s)
+    return _shared
+
+
+def set_shared(tier):
+    """Install a shared tier: any object with lookup(name, key, scope, local_version), put() and bump()."""
+    global _shared
+    _shared = tier
+    _local.clear()
+
+
+def cached(name: str, key: str, scope: str, compute: Callable[[], Any]) -> Tuple[str, bytes]:
+    """(etag, JSON body) for name/key, calling compute() on a miss."""
+    if not settings.response_cache:
+        body = _encode(compute())
+        return _etag(body), body
+    local = _local.get(name, key)
+    shared = get_shared()
+    if shared is None:
+        version = _local.version(scope)
+        if local is not None and local[0] == scope and local[1] == version:
+            record_cache(f"response_{name}", True)
+            return local[2], local[3]
+    else:
+        try:
+            version, remote = shared.lookup(name, key, scope, local[1] if local is not None else None)
+        except Exception:
+            log.warning("shared response cache unavailable; serving %s from the database", name, exc_info=True)
+            body = _encode(compute())
+            return _etag(body), body
+        if local is not None and local[0] == scope and local[1] == version:
+            record_cache(f"response_{name}", True)
+            return local[2], local[3]
+        if remote is not None:
+            record_cache(f"response_{name}", True)
+            _local.put(name, key, scope, version, *remote)
+            return remote
+    record_cache(f"response_{name}", False)
+    body = _encode(compute())
+    etag = _etag(body)
+    _local.put(name, key, scope, version, etag, body)
+    if shared is not None:
+        try:
+            shared.put(name, key, version, etag, body)
+        except Exception:
+            log.warning("could not store %s in the shared response cache", name, exc_info=True)
+    return etag, body
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def cached_response(request: Request, name: str, key, scope: str, compute: Callable[[], Any]) -> Response:
+    """JSON response with an ETag, or 304 when the client's If-None-Match already has it."""
+    etag, body = cached(name, str(key), scope, compute)
+    # Clients may store the body but must revalidate; a 304 costs no database work
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        NOT_MODIFIED.inc(cache=name)
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _invalidate(scopes: list):
+    if not scopes:
+        return
+    _local.bump(scopes)
+    shared = get_shared()
+    if shared is not None:
+        try:
+            shared.bump(scopes)
+        except Exception:
+            # Other workers keep serving their copies until RESPONSE_CACHE_TTL_S runs out
+            log.warning("could not invalidate %s in the shared response cache", scopes, exc_info=True)
+
+
+def invalidate_users(*user_ids: Optional[int]):
+    """Call after committing a write that changes what the users' cached endpoints return."""
+    _invalidate([f"user:{u}" for u in set(user_ids) if u is not None])
+
+
+def invalidate_plan(plan_id: int, user_id: Optional[int]):
+    """Call after committing a change to a study plan or its items."""
+    _invalidate([f"plan:{plan_id}"] + ([f"user:{user_id}"] if user_id is not None else []))
@@ -0,0 +1,89 @@
+# app/services/stress_tests.py
+import logging
+from typing import Any, Dict, List, Optional
+from app.db.db import SessionLocal
+from app.db.models import Question
+from app.services.judge0_client import execute_code
+
+log = logging.getLogger("stress_tests")
+
+PYTHON3_LANGUAGE_ID = 71
+DEFAULT_STRESS_COUNT = 3
+_ACCEPTED = 3
+# The canonical solution gets extra headroom over the question limit when producing expected outputs
+_CANONICAL_TIME_FACTOR = 3
+
+
+def _run(src: str, language_id: int, stdin: str, what: str, cpu_time_limit: Optional[float] = None) -> str:
+    res = execute_code(src, language_id, stdin, cpu_time_limit=cpu_time_limit)
+    status = (res.get("status") or {})
+    if status.get("id") != _ACCEPTED:
+        raise ValueError(f"{what} failed: {status.get('description') or res.get('error')} {res.get('stderr') or ''}".strip())
+    return res.get("stdout") or ""
+
+
+def build_stress_tests(question: Dict[str, Any], count: int = DEFAULT_STRESS_COUNT) -> List[Dict[str, str]]:
+    """
+    Produce max-constraint testcases for a question by running its input_generator
+    (with seeds 0..count-1 on stdin) and then the canonical_solution on each input,
+    both through the executor.
+    """
+    generator = question.get("input_generator")
+    canonical = question.get("canonical_solution")
+    if not generator:
+        raise ValueError("question has no input_generator")
+    if not canonical:
+        raise ValueError("question has no canonical_solution")
+
+    gen_lang = question.get("generator_language_id") or PYTHON3_LANGUAGE_ID
+    sol_lang = question.get("canonical_language_id") or PYTHON3_LANGUAGE_ID
+    time_limit = question.get("time_limit_s")
+    sol_limit = time_limit * _CANONICAL_TIME_FACTOR if time_limit else None
+
+    tests = []
+    for seed in range(count):
+        stdin = _run(generator, gen_lang, str(seed), f"input_generator (seed {seed})")
+        if not stdin.strip():
+            raise ValueError(f"input_generator produced empty input for seed {seed}")
+        expected = _run(canonical, sol_lang, stdin, f"canonical_solution (seed {seed})", cpu_time_limit=sol_limit)
+        tests.append({"input": stdin, "output": expected})
+    return tests
+
+
+def ensure_stress_tests(question_id: str, count: int = DEFAULT_STRESS_COUNT, refresh: bool = False) -> List[Dict[str, str]]:
+    """
+    Return the cached stress testcases of a stored question, generating and caching
+    them in the question's raw JSON if missing (or if refresh is set).
+    """
+    db = SessionLocal()
+    try:
+        q = db.get(Question, question_id)
+        if not q:
+            raise LookupError(f"question {question_id} not found")
+        raw = dict(q.raw or {})
+    finally:
+        db.close()
+    if raw.get("stress_testcases") and not refresh:
+        return raw["stress_testcases"]
+    # Up to 2 * count Judge0 round trips; no session is held open across them
+    tests = build_stress_tests(raw, count=count)
+    db = SessionLocal()
+    try:
+        q = db.get(Question, question_id)
+        if not q:
+            raise LookupError(f"question {question_id} not found")
+        q.raw = dict(q.raw or {}, stress_testcases=tests)  # reassign so the JSON column is flagged dirty
+        db.commit()
+    finally:
+        db.close()
+    log.info("Cached %d stress tests for question %s", len(tests), question_id)
+    return tests
+
+
+def load_stress_tests(question_id: str) -> List[Dict[str, str]]:
+    db = SessionLocal()
+    try:
+        q = db.get(Question, question_id)
+        return list((q.raw or {}).get("stress_testcases") or []) if q else []
+    finally:
+        db.close()
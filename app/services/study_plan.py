@@ -1,62 +1,197 @@
 # app/services/study_plan.py
-import os, json, httpx
-from app.models.plan_model import StudyPlanSchema
-from app.db.models import StudyPlan
+import json, logging
+from app.db.models import StudyPlan, StudyPlanItem
+from sqlalchemy import insert, delete
+from datetime import datetime
+from app.config import settings
 from app.db.db import SessionLocal
-from tenacity import retry, stop_after_attempt, wait_fixed
-from uuid import uuid4
-from dotenv import load_dotenv
-load_dotenv()
-
-OR_URL = "https://openrouter.ai/api/v1/chat/completions"
-HEADERS = {"Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}", "Content-Type":"application/json"}
-MODEL = os.getenv("OR_MODEL", "openrouter/auto")
-
-SYSTEM = (
-    "You are a study planner. Produce exactly one JSON object that conforms to the StudyPlanSchema. "
-    "Do not include any other text or markdown. The schema is: {title, weeks, total_hours_per_week, items:[{day,topic,activity,duration_min,notes}]}."
-)
+from app.services.http_client import get_client
+from app.services.json_repair import repair_json
+from app.services.circuit_breaker import call_with_retry
+from app.services.metrics import external_call
+from app.services.response_cache import invalidate_plan
+from app.services.tracing import traced
+
+log = logging.getLogger("study_plan")
+
+OR_URL = settings.openrouter_url
+HEADERS = {"Authorization": f"Bearer {settings.openrouter_api_key}", "Content-Type":"application/json"}
+MODEL = settings.or_model
+
+@traced("openrouter.study_plan")
+def _post_chat(body: dict):
+    with external_call("openrouter", "study_plan"):
+        r = get_client("openrouter").post(OR_URL, headers=HEADERS, json=body, timeout=20.0)
+        r.raise_for_status()
+    return r
 
-@retry(stop=stop_after_attempt(2), wait=wait_fixed(1))
 def _call_or(messages):
     body = {"model": MODEL, "messages": messages, "temperature": 0.0, "max_tokens": 800}
-    r = httpx.post(OR_URL, headers=HEADERS, json=body, timeout=20.0)
-    r.raise_for_status()
+    r = call_with_retry("openrouter", "study_plan", lambda: _post_chat(body), attempts=2)
     return r.json()["choices"][0]["message"]["content"].strip()
 
-def generate_study_plan(user_profile: dict, weak_topics: list):
-    """
-    user_profile: {"hours_per_week":int, "target_date":"YYYY-MM-DD", "preferred_days":["Mon","Tue"], "goal":"Get into X"}
-    weak_topics: list of {"topic":"arrays","attempts":x,"accuracy":0.5}
-    """
-    prompt_body = f"User profile: {json.dumps(user_profile)}\nWeak topics: {json.dumps(weak_topics)}\n"
-    prompt_body += "Produce a StudyPlanSchema JSON object. Prioritize weak topics. Make the plan achievable given hours_per_week."
 
-    messages = [{"role":"system","content":SYSTEM}, {"role":"user","content":prompt_body}]
-    raw = _call_or(messages)
-    # attempt parse
-    try:
-        parsed = json.loads(raw)
-    except Exception:
-        # try repair once
-        repair_msgs = [{"role":"system","content":"Repair to valid JSON only."}, {"role":"user","content":raw}]
-        raw = _call_or(repair_msgs)
-        parsed = json.loads(raw)
-    # validate via pydantic
-    plan = StudyPlanSchema(**parsed)
-    # add plan id wrapper
-    plan_obj = plan.model_dump()
-    plan_obj["id"] = str(uuid4())
-    return plan_obj
+def _plan_meta(plan_obj: dict) -> dict:
+    # Plan-level fields stay in StudyPlan.raw; items live in study_plan_items
+    return {k: v for k, v in plan_obj.items() if k != "items"}
+
+
+def _item_raw(item: dict) -> dict:
+    # What an item row stores in raw; completed and item_id are columns
+    return {k: v for k, v in item.items() if k not in ("completed", "item_id")}
+
+
+def _insert_items(db, plan_id: int, items: list):
+    rows = [
+        {"plan_id": plan_id, "item_index": i, "raw": _item_raw(it), "completed": bool(it.get("completed", False))}
+        for i, it in enumerate(items or [])
+    ]
+    if rows:
+        db.execute(insert(StudyPlanItem), rows)
 
 
 def save_study_plan(user_id: int, plan_obj: dict):
     db = SessionLocal()
     try:
-        sp = StudyPlan(user_id=user_id, title=plan_obj.get("title","Study Plan"), raw=plan_obj)
+        sp = StudyPlan(user_id=user_id, title=plan_obj.get("title","Study Plan"), raw=_plan_meta(plan_obj))
         db.add(sp)
+        db.flush()
+        _insert_items(db, sp.id, plan_obj.get("items"))
         db.commit()
-        db.refresh(sp)
+        invalidate_plan(sp.id, user_id)
         return sp.id
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def replace_plan_items(db, plan: StudyPlan, plan_obj: dict):
+    """Replace a plan's metadata and items with plan_obj (caller commits)."""
+    db.execute(delete(StudyPlanItem).where(StudyPlanItem.plan_id == plan.id))
+    plan.raw = _plan_meta(plan_obj)
+    _insert_items(db, plan.id, plan_obj.get("items"))
+
+
+def _item_dict(item: StudyPlanItem) -> dict:
+    return dict(item.raw or {}, item_id=item.id, completed=bool(item.completed))
+
+
+def _backfill_items(db, plans: list) -> None:
+    # Plans saved before items were normalized keep them in raw; move them to rows once
+    for p in plans:
+        if p.raw and p.raw.get("items"):
+            _insert_items(db, p.id, p.raw["items"])
+            p.raw = _plan_meta(p.raw)
+    db.commit()
+
+
+def plans_to_dicts(db, plans: list) -> list:
+    """
+    Assemble API plan dicts from StudyPlan rows and their indexed item rows,
+    loading items for all plans in a single query.
+    """
+    if not plans:
+        return []
+    ids = [p.id for p in plans]
+    rows = (
+        db.query(StudyPlanItem)
+        .filter(StudyPlanItem.plan_id.in_(ids))
+        .order_by(StudyPlanItem.plan_id, StudyPlanItem.item_index)
+        .all()
+    )
+    by_plan = {}
+    for it in rows:
+        by_plan.setdefault(it.plan_id, []).append(_item_dict(it))
+    legacy = [p for p in plans if p.id not in by_plan and p.raw and p.raw.get("items")]
+    if legacy:
+        _backfill_items(db, legacy)
+        return plans_to_dicts(db, plans)
+    return [
+        {"id": p.id, "title": p.title, "raw": dict(p.raw or {}, items=by_plan.get(p.id, [])), "status": p.status}
+        for p in plans
+    ]
+
+
+def plan_to_dict(db, plan: StudyPlan) -> dict:
+    return plans_to_dicts(db, [plan])[0]
+
+
+def update_plan_item(db, plan_id: int, item_id: int, changes: dict, completed=None):
+    """Update one item row in place; returns the item dict or None if it does not belong to the plan."""
+    item = db.get(StudyPlanItem, item_id)
+    if not item or item.plan_id != plan_id:
+        return None
+    if changes:
+        item.raw = dict(item.raw or {}, **changes)
+    if completed is not None:
+        item.completed = completed
+    plan = db.get(StudyPlan, plan_id)
+    if plan:
+        plan.updated_at = datetime.utcnow()
+    db.commit()
+    invalidate_plan(plan_id, plan.user_id if plan else None)
+    return _item_dict(item)
+
+
+ENRICH_SYSTEM = (
+    "You write short, concrete study activities for placement preparation. "
+    "Given a JSON list of {topic, duration_min, activity} drafts, return JSON {\"activities\": [string, ...]} "
+    "with one improved activity per draft, in the same order, each under 25 words."
+)
+
+
+def llm_enrichment_enabled() -> bool:
+    return bool(settings.openrouter_api_key)
+
+
+def enrich_activities(items: list) -> list:
+    """
+    Ask the LLM to rewrite activity text. Identical drafts are sent once and mapped back,
+    so the prompt stays small for long plans.
+    """
+    drafts, index = [], {}
+    for it in items:
+        k = (it["topic"], it["duration_min"], it["activity"])
+        if k not in index:
+            index[k] = len(drafts)
+            drafts.append({"topic": k[0], "duration_min": k[1], "activity": k[2]})
+    messages = [{"role": "system", "content": ENRICH_SYSTEM}, {"role": "user", "content": json.dumps(drafts)}]
+    parsed = repair_json(_call_or(messages))
+    rewritten = parsed.get("activities") or []
+    if len(rewritten) != len(drafts) or not all(isinstance(a, str) and a.strip() for a in rewritten):
+        raise ValueError("enrichment returned an unexpected number of activities")
+    return [rewritten[index[(it["topic"], it["duration_min"], it["activity"])]].strip() for it in items]
+
+
+def enrich_saved_plan(plan_id: int, plan_obj: dict, cache_key: str):
+    """
+    Background task: enrich a locally scheduled plan's activities and update the stored plan.
+    Only items still exactly as drafted get the new activity, so edits made in the meantime
+    (an item update or a PUT replacing the items) are kept. Failures leave the local plan in place.
+    """
+    from app.services.plan_scheduler import store_enrichment
+    try:
+        activities = enrich_activities(plan_obj["items"])
+    except Exception:
+        log.exception("Study plan enrichment failed for plan %s", plan_id)
+        return
+    store_enrichment(cache_key, activities)
+    db = SessionLocal()
+    try:
+        items = (
+            db.query(StudyPlanItem)
+            .filter(StudyPlanItem.plan_id == plan_id)
+            .order_by(StudyPlanItem.item_index)
+            .all()
+        )
+        drafts = [_item_raw(d) for d in plan_obj["items"]]
+        for it in items:
+            i = it.item_index
+            if i is not None and 0 <= i < len(activities) and it.raw == drafts[i]:
+                it.raw = dict(it.raw, activity=activities[i])
+        sp = db.get(StudyPlan, plan_id)
+        if sp:
+            sp.raw = dict(sp.raw or {}, enriched=True)
+        db.commit()
+        invalidate_plan(plan_id, sp.user_id if sp else None)
+    finally:
+        db.close()
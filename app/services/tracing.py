@@ -0,0 +1,261 @@
+# app/services/tracing.py
+"""
+Lightweight in-process tracing. The HTTP middleware opens a root span per request;
+code paths open child spans with span()/traced(). Traces slower than TRACE_SLOW_MS are
+logged as compact JSON, and every trace can be shipped to an OTLP/HTTP collector
+(OTEL_EXPORTER_OTLP_ENDPOINT) in the background.
+"""
+import functools, json, logging, queue, secrets, threading, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.services.http_client import get_client
+
+log = logging.getLogger("tracing")
+
+SLOW_TRACE_MS = settings.trace_slow_ms
+MAX_SPANS_PER_TRACE = 2000
+_SQL_PREVIEW_CHARS = 120
+
+
+class Span:
+    __slots__ = ("name", "attrs", "trace", "span_id", "parent_id", "start_ns", "end_ns", "children")
+
+    def __init__(self, name: str, trace: "Trace", parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.children: List["Span"] = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def compact(self) -> dict:
+        out = {"n": self.name, "ms": round(self.duration_ms, 2)}
+        if self.attrs:
+            out["a"] = self.attrs
+        if self.children:
+            out["c"] = [c.compact() for c in self.children]
+        return out
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.span_count = 0
+        self.root: Optional[Span] = None
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(name: str, **attrs) -> Optional[Span]:
+    # Spans are only recorded inside a request trace; elsewhere this is a no-op
+    parent = _current.get()
+    if parent is None:
+        return None
+    trace = parent.trace
+    if trace.span_count >= MAX_SPANS_PER_TRACE:
+        return None
+    trace.span_count += 1
+    s = Span(name, trace, parent, attrs)
+    parent.children.append(s)
+    return s
+
+
+def end_span(s: Optional[Span], error: Optional[BaseException] = None):
+    if s is None:
+        return
+    if error is not None:
+        s.attrs["error"] = type(error).__name__
+    s.end_ns = time.time_ns()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    s = start_span(name, **attrs)
+    if s is None:
+        yield None
+        return
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        end_span(s, e)
+        raise
+    else:
+        end_span(s)
+    finally:
+        _current.reset(token)
+
+
+def traced(name: str):
+    """Decorator wrapping every call of the function in a span."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def start_trace(name: str, **attrs):
+    """Open a root span and a new trace for the duration of the block."""
+    trace = Trace()
+    root = Span(name, trace, None, attrs)
+    trace.root = root
+    trace.span_count = 1
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        end_span(root, e)
+        raise
+    else:
+        end_span(root)
+    finally:
+        _current.reset(token)
+        _finish(trace)
+
+
+def _finish(trace: Trace):
+    root = trace.root
+    if root.duration_ms >= SLOW_TRACE_MS:
+        log.warning("slow trace %s", json.dumps({"trace_id": trace.trace_id, **root.compact()},
+                                               separators=(",", ":"), default=str))
+    if _exporter is not None:
+        _exporter.submit(trace)
+
+
+# SQLAlchemy statement spans
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    s = start_span("db.query", statement=" ".join(statement.split())[:_SQL_PREVIEW_CHARS])
+    if s is not None:
+        context._trace_span = s
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    end_span(getattr(context, "_trace_span", None))
+
+
+def _handle_error(exception_context):
+    ctx = exception_context.execution_context
+    if ctx is not None:
+        end_span(getattr(ctx, "_trace_span", None), exception_context.original_exception)
+
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# OTLP/HTTP JSON exporter
+
+def _otlp_value(v) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_spans(trace: Trace) -> List[dict]:
+    out = []
+    stack = [trace.root]
+    while stack:
+        s = stack.pop()
+        item = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s.parent_id is None else 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attrs.items()],
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        if "error" in s.attrs:
+            item["status"] = {"code": 2}
+        out.append(item)
+        stack.extend(s.children)
+    return out
+
+
+class OTLPExporter:
+    """Batches finished traces and posts them to {endpoint}/v1/traces from a daemon thread."""
+
+    def __init__(self, endpoint: str, service_name: str = "placement-prep-api",
+                 batch_size: int = 64, flush_interval_s: float = 2.0, max_queue: int = 2048):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, trace: Trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            pass  # drop rather than slow down requests
+
+    def payload(self, traces: List[Trace]) -> dict:
+        spans = [s for t in traces for s in _otlp_spans(t)]
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": spans}],
+        }]}
+
+    def _post(self, traces: List[Trace]):
+        try:
+            get_client("otlp").post(self.url, json=self.payload(traces), timeout=5.0)
+        except Exception as e:
+            log.warning("OTLP export failed: %s", e)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._post(batch)
+
+
+_exporter: Optional[OTLPExporter] = None
+
+
+def configure_exporter(endpoint: Optional[str] = None) -> Optional[OTLPExporter]:
+    global _exporter
+    endpoint = endpoint or settings.otlp_endpoint
+    _exporter = OTLPExporter(endpoint) if endpoint else None
+    return _exporter
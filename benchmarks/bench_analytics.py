@@ -0,0 +1,62 @@
+# benchmarks/bench_analytics.py
+"""
+Cost of the columnar analytics export (app/services/analytics_export.py) against a seeded database.
+
+    python -m benchmarks.seed_data --database-url sqlite:///benchmarks/results/scale.db
+    python -m benchmarks.bench_analytics --database-url sqlite:///benchmarks/results/scale.db
+
+Reports the time for a full export, an incremental export with nothing new, and the
+aggregation alone over the loaded store. For comparison, it also times compute_weak_topics
+on --samples users and extrapolates that row-at-a-time approach to every user with submissions.
+"""
+import argparse, json, os, random, sys, tempfile, time
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--database-url", default="sqlite:///benchmarks/results/scale.db")
+    ap.add_argument("--dir", help="store directory (default: a temporary one)")
+    ap.add_argument("--samples", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    # The app binds its engine at import time, so point it at the benchmark database first
+    os.environ["DATABASE_URL"] = args.database_url
+    directory = args.dir or tempfile.mkdtemp(prefix="placemon-analytics-")
+    from sqlalchemy import select
+    from app.db.db import SessionLocal
+    from app.db.models import Submission
+    from app.services.analytics import compute_weak_topics
+    from app.services.analytics_export import _load_npz, build_summary, export, load_store
+
+    db = SessionLocal()
+    try:
+        user_ids = [r[0] for r in db.execute(select(Submission.user_id).distinct()) if r[0] is not None]
+    finally:
+        db.close()
+    if not user_ids:
+        sys.exit("database has no submissions; run benchmarks.seed_data first")
+
+    report = {"full": export(full=True, directory=directory), "incremental": export(directory=directory)}
+
+    t = time.perf_counter()
+    store = load_store(directory)
+    load_s = time.perf_counter() - t
+    users, questions = _load_npz(f"{directory}/users.npz"), _load_npz(f"{directory}/questions.npz")
+    t = time.perf_counter()
+    summary = build_summary(store, users, questions)
+    report["aggregate"] = {"load_store_s": round(load_s, 2), "build_summary_s": round(time.perf_counter() - t, 2),
+                           "cohorts": len(summary["cohorts"]), "questions": len(summary["questions"])}
+
+    sample = random.Random(args.seed).sample(user_ids, min(args.samples, len(user_ids)))
+    t = time.perf_counter()
+    for u in sample:
+        compute_weak_topics(u)
+    per_user = (time.perf_counter() - t) / len(sample)
+    report["per_user_weak_topics"] = {"users": len(user_ids), "ms_per_user": round(per_user * 1000, 2),
+                                      "extrapolated_all_users_s": round(per_user * len(user_ids), 1)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_comparator.py
+"""
+Micro-benchmark for the output comparators on multi-MB outputs.
+
+    python -m benchmarks.bench_comparator [--lines 200000] [--repeat 5]
+"""
+import argparse, random, time
+from app.services.comparator import CHECKERS, compare_outputs
+
+
+def _make_output(lines: int, per_line: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    return "\n".join(
+        " ".join(str(rnd.randint(-10**9, 10**9)) for _ in range(per_line)) for _ in range(lines)
+    ) + "\n"
+
+
+def _legacy_compare(expected: str, actual: str) -> bool:
+    # The previous evaluator behaviour, kept here as a baseline
+    def norm(s):
+        return "\n".join([line.rstrip() for line in s.strip().splitlines()]).strip()
+    return norm(expected) == norm(actual)
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=200_000)
+    ap.add_argument("--per-line", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    expected = _make_output(args.lines, args.per_line)
+    same = expected.replace("\n", " \n")
+    early = "x" + expected[1:]
+    late = expected[:-3] + "x\n"
+    print(f"output size: {len(expected) / 1e6:.1f} MB, {args.lines} lines")
+
+    cases = {"match": same, "mismatch@start": early, "mismatch@end": late}
+    print(f"{'checker':<12}" + "".join(f"{c:>18}" for c in cases))
+    print(f"{'legacy':<12}" + "".join(
+        f"{_time(lambda a=a: _legacy_compare(expected, a), args.repeat) * 1000:>16.1f}ms" for a in cases.values()))
+    for name in CHECKERS:
+        print(f"{name:<12}" + "".join(
+            f"{_time(lambda a=a: compare_outputs(expected, a, checker=name), args.repeat) * 1000:>16.1f}ms"
+            for a in cases.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_json_repair.py
+"""
+Measure how many malformed LLM outputs the local JSON repair recovers (each one is an
+LLM repair round trip saved) and how long it takes.
+
+    python -m benchmarks.bench_json_repair [--fixture benchmarks/fixtures/malformed_llm_outputs.jsonl]
+
+Exits non-zero if any fixture entry is not repaired to its expected value.
+"""
+import argparse, json, sys, time
+from pathlib import Path
+from app.services.json_repair import repair_json
+
+DEFAULT_FIXTURE = Path(__file__).parent / "fixtures" / "malformed_llm_outputs.jsonl"
+
+
+def _plain(raw):
+    return json.loads(raw)
+
+
+def _score(fn, cases):
+    ok = 0
+    for c in cases:
+        try:
+            got = fn(c["raw"])
+        except ValueError:
+            got = None
+        if got == c["expected"]:
+            ok += 1
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixture", default=str(DEFAULT_FIXTURE))
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    cases = [json.loads(line) for line in open(args.fixture) if line.strip()]
+    failures = []
+    for c in cases:
+        try:
+            got = repair_json(c["raw"])
+        except ValueError:
+            got = None
+        if got != c["expected"]:
+            failures.append((c["name"], got))
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for c in cases:
+            try:
+                repair_json(c["raw"])
+            except ValueError:
+                pass
+    per_call_us = (time.perf_counter() - t0) / (args.repeat * len(cases)) * 1e6
+
+    print(f"cases: {len(cases)}")
+    print(f"json.loads only: {_score(_plain, cases)}/{len(cases)}")
+    print(f"repair_json:     {len(cases) - len(failures)}/{len(cases)}  ({per_call_us:.1f} us/call)")
+    for name, got in failures:
+        print(f"  FAIL {name}: {got!r}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
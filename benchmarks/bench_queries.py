@@ -0,0 +1,93 @@
+# benchmarks/bench_queries.py
+"""
+Time the hot read paths of the routers and services against a (seeded) database.
+
+    python -m benchmarks.seed_data --database-url sqlite:///benchmarks/results/scale.db
+    python -m benchmarks.bench_queries --database-url sqlite:///benchmarks/results/scale.db --samples 200
+
+Queries go through the application's own code (SessionLocal, services), so the numbers
+reflect schema, index and ORM changes directly.
+"""
+import argparse, json, os, random, sys, time
+
+
+def _timeit(fn, args_list):
+    out = []
+    for a in args_list:
+        t0 = time.perf_counter()
+        fn(a)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def _pct(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * p / 100.0)))] if ordered else 0.0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--database-url", default="sqlite:///benchmarks/results/scale.db")
+    ap.add_argument("--samples", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    # The app binds its engine at import time, so point it at the benchmark database first
+    os.environ["DATABASE_URL"] = args.database_url
+    from sqlalchemy import func, select
+    from app.db.db import SessionLocal
+    from app.db.models import Submission, SubmissionTest, StudyPlan, LongTermMemory, Question
+    from app.services.analytics import compute_weak_topics, compute_runtime_percentile
+
+    rnd = random.Random(args.seed)
+    db = SessionLocal()
+    try:
+        user_ids = [r[0] for r in db.execute(select(Submission.user_id).distinct().limit(50000))]
+        question_ids = [r[0] for r in db.execute(select(Question.id).limit(50000))]
+        sub_max = db.execute(select(func.max(Submission.id))).scalar() or 0
+        counts = {t.__tablename__: db.execute(select(func.count()).select_from(t)).scalar()
+                  for t in (Submission, SubmissionTest, Question)}
+    finally:
+        db.close()
+    if not user_ids:
+        sys.exit("database has no submissions; run benchmarks.seed_data first")
+
+    users = [rnd.choice(user_ids) for _ in range(args.samples)]
+    questions = [rnd.choice(question_ids) for _ in range(args.samples)]
+    subs = [rnd.randint(1, sub_max) for _ in range(args.samples)]
+
+    def with_session(fn):
+        def run(arg):
+            db = SessionLocal()
+            try:
+                return fn(db, arg)
+            finally:
+                db.close()
+        return run
+
+    cases = {
+        "weak_topics(user)": (compute_weak_topics, users),
+        "submissions_by_user": (with_session(lambda db, u: db.query(Submission).filter(Submission.user_id == u).all()), users),
+        "tests_by_submission": (with_session(lambda db, s: db.query(SubmissionTest).filter(SubmissionTest.submission_id == s).all()), subs),
+        "plans_by_user": (with_session(lambda db, u: db.query(StudyPlan).filter(StudyPlan.user_id == u).all()), users),
+        "long_memory(user,key)": (with_session(lambda db, u: db.query(LongTermMemory).filter(
+            LongTermMemory.user_id == u, LongTermMemory.key == "goal").first()), users),
+        "runtime_percentile(question)": (lambda q: compute_runtime_percentile(q, 0.5), questions),
+    }
+
+    results = {"rows": counts, "samples": args.samples, "queries": {}}
+    for name, (fn, inputs) in cases.items():
+        ms = _timeit(fn, inputs)
+        results["queries"][name] = {"p50_ms": round(_pct(ms, 50), 3), "p95_ms": round(_pct(ms, 95), 3),
+                                    "max_ms": round(max(ms), 3)}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"rows: {counts}")
+    for name, r in results["queries"].items():
+        print(f"{name:<30} p50 {r['p50_ms']:>9.3f}ms  p95 {r['p95_ms']:>9.3f}ms  max {r['max_ms']:>9.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
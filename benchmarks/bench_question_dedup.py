@@ -0,0 +1,108 @@
+# benchmarks/bench_question_dedup.py
+"""
+Latency and accuracy of the near-duplicate question index (app/services/question_dedup.py).
+
+    python -m benchmarks.bench_question_dedup --questions 100000
+
+Builds synthetic questions (random sentences over a fixed vocabulary) and reports:
+  * signature and lookup latency percentiles
+  * recall on lightly edited copies of stored questions (a few words swapped or dropped)
+  * the false-positive rate on fresh questions
+  * the time to load the index from a throwaway SQLite questions table, as at startup
+"""
+import argparse, json, os, random, statistics, tempfile, time
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def _edit(text: str, rnd: random.Random, edits: int) -> str:
+    words = text.split()
+    for _ in range(edits):
+        i = rnd.randrange(len(words))
+        if rnd.random() < 0.5:
+            del words[i]
+        else:
+            words[i] = rnd.choice(words)
+    return " ".join(words)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=100000)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--words", type=int, default=40, help="words per synthetic description")
+    ap.add_argument("--edits", type=int, default=2, help="word edits in a near-duplicate")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    d = tempfile.mkdtemp(prefix="placemon-dedup-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{d}/dedup.db"
+    import numpy as np
+    from sqlalchemy import insert
+    from app.db.db import engine
+    from app.db.migrations import upgrade
+    from app.db.models import Question
+    from app.services import question_dedup
+    from app.services.question_dedup import MinHashIndex, signature
+    upgrade(engine)
+
+    rnd = random.Random(args.seed)
+    vocab = ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(3, 9))) for _ in range(5000)]
+    texts = [" ".join(rnd.choices(vocab, k=args.words)) for _ in range(args.questions)]
+
+    t = time.perf_counter()
+    sigs = np.stack([signature(x) for x in texts])
+    sign_s = time.perf_counter() - t
+    index = MinHashIndex(0.7)
+    t = time.perf_counter()
+    index.add_many([f"q{i}" for i in range(len(texts))], sigs)
+    bulk_s = time.perf_counter() - t
+
+    picks = [rnd.randrange(len(texts)) for _ in range(args.queries)]
+    near = [signature(_edit(texts[i], rnd, args.edits)) for i in picks]
+    fresh = [signature(" ".join(rnd.choices(vocab, k=args.words))) for _ in range(args.queries)]
+
+    sig_ms, lookup_ms = [], []
+    for i in picks[:500]:
+        t = time.perf_counter()
+        signature(texts[i])
+        sig_ms.append((time.perf_counter() - t) * 1000)
+    hits = 0
+    for i, s in zip(picks, near):
+        t = time.perf_counter()
+        r = index.query(s)
+        lookup_ms.append((time.perf_counter() - t) * 1000)
+        hits += r is not None and r[0] == f"q{i}"
+    false_pos = sum(index.query(s) is not None for s in fresh)
+
+    # Startup path: signatures already stored in questions.minhash
+    with engine.begin() as conn:
+        for start in range(0, len(texts), 5000):
+            conn.execute(insert(Question), [
+                {"id": f"q{i}", "title": texts[i][:40], "raw": {"description": texts[i]},
+                 "minhash": sigs[i].tobytes()}
+                for i in range(start, min(len(texts), start + 5000))
+            ])
+    t = time.perf_counter()
+    loaded = len(question_dedup.get_index())
+    load_s = time.perf_counter() - t
+
+    print(json.dumps({
+        "questions": len(texts),
+        "signature_ms": {"p50": round(statistics.median(sig_ms), 3), "p95": round(_pct(sig_ms, 95), 3)},
+        "lookup_ms": {"p50": round(statistics.median(lookup_ms), 3), "p95": round(_pct(lookup_ms, 95), 3),
+                      "p99": round(_pct(lookup_ms, 99), 3)},
+        "recall_near_duplicates": round(hits / len(picks), 4),
+        "false_positive_rate": round(false_pos / len(fresh), 4),
+        "bulk_build_s": round(bulk_s, 2),
+        "hash_all_s": round(sign_s, 2),
+        "load_from_table_s": round(load_s, 2),
+        "loaded": loaded,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
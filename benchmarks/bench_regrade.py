@@ -0,0 +1,87 @@
+# benchmarks/bench_regrade.py
+"""
+Throughput of app.services.regrade against the stub Judge0 (or a real local sandbox).
+
+    python -m benchmarks.bench_regrade --submissions 5000 --distinct 1000 --workers 32
+    python -m benchmarks.bench_regrade --judge0-url http://localhost:2358   # real sandbox
+
+Seeds one question with --tests testcases and --submissions stored submissions drawing their
+source from --distinct programs. It then re-grades them twice: once from scratch, and once
+interrupted after the first chunk and resumed from the checkpoint. Prints submissions per
+minute and the number of sandbox executions the dedupe saved.
+"""
+import argparse, json, os, random, tempfile, time
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--submissions", type=int, default=5000)
+    ap.add_argument("--distinct", type=int, default=1000, help="distinct source programs among the submissions")
+    ap.add_argument("--tests", type=int, default=6)
+    ap.add_argument("--workers", type=int, default=32)
+    ap.add_argument("--chunk-size", type=int, default=500)
+    ap.add_argument("--latency-ms", type=float, default=10.0, help="stub Judge0 latency per execution")
+    ap.add_argument("--judge0-url", help="use a real sandbox instead of the stub")
+    args = ap.parse_args()
+
+    d = tempfile.mkdtemp(prefix="placemon-regrade-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{d}/regrade.db"
+    os.environ["SUBMISSIONS_LOG"] = f"{d}/submissions.jsonl"
+    if args.judge0_url:
+        os.environ["JUDGE0_URL"] = args.judge0_url
+    else:
+        from benchmarks.stubs import StubConfig, start_stub
+        stub = start_stub("judge0", 0, StubConfig(args.latency_ms, 0, 0.0, seed=1))
+        os.environ["JUDGE0_URL"] = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    from sqlalchemy import insert
+    from app.db.db import SessionLocal, engine
+    from app.db.migrations import upgrade
+    from app.db.models import Question, Submission
+    from app.services.regrade import regrade_question
+    upgrade(engine)
+
+    rnd = random.Random(7)
+    tests = [{"input": str(i), "output": str(i)} for i in range(args.tests)]
+    db = SessionLocal()
+    try:
+        db.add(Question(id="bench-q", title="Echo", difficulty="easy", topics=["io"],
+                        raw={"id": "bench-q", "sample_testcases": tests[:2], "hidden_testcases": tests[2:]}))
+        db.execute(insert(Submission), [
+            {"question_id": "bench-q", "language_id": 71, "score_percent": 50.0, "passed": 1, "total": 2,
+             "source_code": f"print(input())  # variant {rnd.randrange(args.distinct)}",
+             "run_hidden": rnd.random() >= 0.2}
+            for _ in range(args.submissions)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    report = {}
+    t = time.perf_counter()
+    out = regrade_question("bench-q", workers=args.workers, chunk_size=args.chunk_size,
+                           checkpoint=f"{d}/full.json")
+    elapsed = time.perf_counter() - t
+    report["full"] = {**out, "submissions_per_min": round(out["submissions"] / elapsed * 60)}
+
+    # Resume: stop after the first chunk, then finish from the checkpoint
+    class Stop(Exception):
+        pass
+
+    def stop_after_first(_):
+        raise Stop()
+
+    try:
+        regrade_question("bench-q", workers=args.workers, chunk_size=args.chunk_size,
+                         checkpoint=f"{d}/resume.json", restart=True, progress=stop_after_first)
+    except Stop:
+        pass
+    with open(f"{d}/resume.json") as f:
+        report["checkpoint_after_interrupt"] = json.load(f)["last_id"]
+    report["resumed"] = regrade_question("bench-q", workers=args.workers, chunk_size=args.chunk_size,
+                                         checkpoint=f"{d}/resume.json")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
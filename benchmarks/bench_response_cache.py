@@ -0,0 +1,103 @@
+# benchmarks/bench_response_cache.py
+"""
+Database load and latency of the cached per-user GET endpoints (app/services/response_cache.py).
+
+    python -m benchmarks.bench_response_cache --users 2000 --reads 4000 --write-every 20
+
+Seeds a throwaway SQLite database with benchmarks.seed_data and a study plan per sampled
+user. It then replays the same request mix twice, with RESPONSE_CACHE off and on:
+GET /users/{id}, /users/{id}/weak-topics, /plans/user/{id} and /study-plans/{id}, plus a
+POST /submissions/ for a random user every --write-every reads. Reports database statements
+per read (db_queries_total), latency percentiles, the hit rate, and how many reads were
+answered 304 when the client revalidates with If-None-Match.
+"""
+import argparse, json, os, random, statistics, tempfile, time
+
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--questions", type=int, default=500)
+    ap.add_argument("--submissions-per-user", type=float, default=20.0)
+    ap.add_argument("--active-users", type=int, default=200, help="users the reads are spread over")
+    ap.add_argument("--reads", type=int, default=4000)
+    ap.add_argument("--write-every", type=int, default=20, help="one submission per this many reads")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    d = tempfile.mkdtemp(prefix="placemon-rcache-")
+    url = f"sqlite:///{d}/cache.db"
+    os.environ["DATABASE_URL"] = url
+    os.environ["SUBMISSIONS_LOG"] = f"{d}/submissions.jsonl"
+    os.environ["RATE_LIMIT_ENABLED"] = "0"
+    from benchmarks.seed_data import seed
+    seed(url, args.users, args.questions, args.submissions_per_user, 8, 1, 3, 32, 1.1, 5000, args.seed)
+
+    from fastapi.testclient import TestClient
+    from app.config import settings
+    from app.main import app
+    from app.services import response_cache
+    from app.services.metrics import CACHE_REQUESTS, DB_QUERIES
+    from app.services.study_plan import save_study_plan
+    from app.db.db import SessionLocal
+    from app.db.models import Question
+
+    rnd = random.Random(args.seed)
+    users = rnd.sample(range(1, args.users + 1), min(args.active_users, args.users))
+    plan_of = {u: save_study_plan(u, {"title": "Bench", "items": [{"day": "Mon", "topic": "arrays",
+                                                                   "activity": "practice", "duration_min": 30}]})
+               for u in users}
+    paths = [lambda u: f"/users/{u}", lambda u: f"/users/{u}/weak-topics",
+             lambda u: f"/plans/user/{u}", lambda u: f"/study-plans/{plan_of[u]}"]
+    db = SessionLocal()
+    try:
+        question_ids = [q for (q,) in db.query(Question.id).limit(100)]
+    finally:
+        db.close()
+    mix = [(rnd.choice(users), rnd.randrange(len(paths))) for _ in range(args.reads)]
+
+    def run(client, enabled: bool) -> dict:
+        settings.response_cache = enabled
+        response_cache._local.clear()
+        etags, ms, not_modified = {}, [], 0
+        before = DB_QUERIES.value()
+        write_queries = 0
+        for i, (u, p) in enumerate(mix):
+            if args.write_every and i % args.write_every == 0:
+                q0 = DB_QUERIES.value()
+                client.post("/submissions/", json={"user_id": rnd.choice(users), "question_id": rnd.choice(question_ids),
+                                                   "score": 50.0, "passed": 1, "total": 2})
+                write_queries += DB_QUERIES.value() - q0
+            path = paths[p](u)
+            headers = {"If-None-Match": etags[path]} if path in etags else {}
+            t = time.perf_counter()
+            r = client.get(path, headers=headers)
+            ms.append((time.perf_counter() - t) * 1000)
+            if r.status_code == 304:
+                not_modified += 1
+            elif "etag" in r.headers:
+                etags[path] = r.headers["etag"]
+        reads_queries = DB_QUERIES.value() - before - write_queries
+        return {"db_queries_per_read": round(reads_queries / len(mix), 3),
+                "p50_ms": round(statistics.median(ms), 3), "p95_ms": round(_pct(ms, 95), 3),
+                "p99_ms": round(_pct(ms, 99), 3), "not_modified": not_modified}
+
+    report = {"reads": len(mix), "writes": len(range(0, len(mix), args.write_every)) if args.write_every else 0}
+    with TestClient(app) as client:
+        report["uncached"] = run(client, False)
+        hits0 = sum(CACHE_REQUESTS.value(cache=f"response_{n}", result="hit")
+                    for n in ("user", "weak_topics", "plans_by_user", "plan"))
+        report["cached"] = run(client, True)
+        hits = sum(CACHE_REQUESTS.value(cache=f"response_{n}", result="hit")
+                   for n in ("user", "weak_topics", "plans_by_user", "plan")) - hits0
+        report["cached"]["hit_rate"] = round(hits / len(mix), 3)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
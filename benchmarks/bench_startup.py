@@ -0,0 +1,77 @@
+# benchmarks/bench_startup.py
+"""
+Measure cold-start cost of the API in fresh interpreters:
+
+  * import: wall time of `import app.main` (what every worker pays before serving)
+  * first request: spawn uvicorn and poll GET /metrics until it answers, both against an
+    empty database (migrations run on boot) and an already-migrated one (version check only)
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse, os, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+import httpx
+from benchmarks.load_test import _free_port
+
+ROOT = Path(__file__).resolve().parent.parent
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def measure_import(env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET], cwd=str(ROOT), env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(env: dict, timeout: float = 30.0) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(ROOT), env=env,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.005)
+        raise RuntimeError(f"no response within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _summary(values) -> str:
+    ms = [v * 1000 for v in values]
+    return f"median {statistics.median(ms):8.1f}ms  min {min(ms):8.1f}ms  max {max(ms):8.1f}ms"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="placemon-startup-")
+    base = dict(os.environ, SUBMISSIONS_LOG=f"{tmp}/submissions.jsonl", TRACE_SLOW_MS="1e9")
+    base.pop("OTEL_EXPORTER_OTLP_ENDPOINT", None)
+
+    imports = [measure_import(dict(base, DATABASE_URL=f"sqlite:///{tmp}/import.db")) for _ in range(args.runs)]
+    fresh = [measure_first_request(dict(base, DATABASE_URL=f"sqlite:///{tmp}/fresh{i}.db")) for i in range(args.runs)]
+    warm_env = dict(base, DATABASE_URL=f"sqlite:///{tmp}/warm.db")
+    subprocess.run([sys.executable, "-m", "app.db.migrations", "upgrade"], cwd=str(ROOT), env=warm_env,
+                   check=True, capture_output=True)
+    warm = [measure_first_request(warm_env) for _ in range(args.runs)]
+
+    print(f"{'import app.main':<30} {_summary(imports)}")
+    print(f"{'first request (empty db)':<30} {_summary(fresh)}")
+    print(f"{'first request (migrated db)':<30} {_summary(warm)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/check_query_plans.py
+"""
+Assert that every hot query in the routers and services is answered through an index.
+Each statement below mirrors a query in app/ (the source is noted next to it); the script
+migrates the target database, runs EXPLAIN on each and exits non-zero on a full table scan.
+
+    python -m benchmarks.check_query_plans                                  # throwaway SQLite
+    python -m benchmarks.check_query_plans --database-url postgresql://...  # Seq Scan check
+
+On SQLite any "SCAN <table>" step fails the check (index lookups show as "SEARCH").
+On Postgres sequential scans are disabled for the session, so a remaining Seq Scan means
+no usable index exists.
+"""
+import argparse, json, os, re, sys, tempfile
+
+
+def hot_queries():
+    from sqlalchemy import func, select
+    from app.db.models import (EvaluationJob, LongTermMemory, Question, StudyPlan, StudyPlanItem, Submission,
+                               SubmissionTest, User)
+    return {
+        # routers/users.py get_user, routers/submissions.py question upsert
+        "user_by_id": select(User).where(User.id == 1),
+        "question_by_id": select(Question).where(Question.id == "q1"),
+        # routers/users.py list_user_submissions, routers/submissions.py, services/analytics.py compute_weak_topics
+        "submissions_by_user": select(Submission).where(Submission.user_id == 1),
+        # services/analytics.py compute_runtime_percentile
+        "runtime_percentile": (
+            select(func.max(SubmissionTest.time))
+            .join(Submission, Submission.id == SubmissionTest.submission_id)
+            .where(Submission.question_id == "q1", Submission.passed == Submission.total, Submission.id != 1)
+            .group_by(SubmissionTest.submission_id)
+        ),
+        # routers/submissions.py get_submission, _stored_tests
+        "tests_by_submission": select(SubmissionTest).where(SubmissionTest.submission_id == 1).order_by(SubmissionTest.test_index),
+        "job_by_submission": select(EvaluationJob).where(EvaluationJob.submission_id == 1),
+        # services/evaluation_queue.py process_pending
+        "queued_jobs": (
+            select(EvaluationJob.id).where(EvaluationJob.status == "queued", EvaluationJob.created_at < "2030-01-01")
+            .order_by(EvaluationJob.id).limit(20)
+        ),
+        # services/question_dedup.py get_index sync
+        "questions_since": select(Question.id, Question.minhash).where(Question.created_at >= "2030-01-01"),
+        # services/question_pool.py pick_from_pool
+        "pool_pick": (
+            select(Question.raw).where(Question.origin == "generated", Question.kind == "coding",
+                                       Question.topic_key.like("%|arrays|%", escape="\\"), Question.difficulty == "easy")
+            .order_by(Question.created_at.desc()).offset(3).limit(1)
+        ),
+        # routers/plans.py get_user_plans
+        "plans_by_user": select(StudyPlan).where(StudyPlan.user_id == 1),
+        # services/study_plan.py plans_to_dicts, enrich_saved_plan
+        "plan_items_by_plans": (
+            select(StudyPlanItem).where(StudyPlanItem.plan_id.in_([1, 2]))
+            .order_by(StudyPlanItem.plan_id, StudyPlanItem.item_index)
+        ),
+        # services/long_memory.py get_memory, set_memory
+        "long_memory_by_user_key": select(LongTermMemory).where(LongTermMemory.user_id == 1, LongTermMemory.key == "goal"),
+    }
+
+
+def _sqlite_plan(conn, sql: str):
+    from sqlalchemy import text
+    steps = [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    scans = [s for s in steps if re.match(r"SCAN (TABLE )?\w+", s)]
+    return steps, scans
+
+
+def _postgres_plan(conn, sql: str):
+    from sqlalchemy import text
+    conn.execute(text("SET enable_seqscan = off"))
+    plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    steps, scans, stack = [], [], [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        label = f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip()
+        steps.append(label)
+        if node["Node Type"] == "Seq Scan":
+            scans.append(label)
+        stack.extend(node.get("Plans", []))
+    return steps, scans
+
+
+def check(engine) -> dict:
+    explain = _postgres_plan if engine.dialect.name == "postgresql" else _sqlite_plan
+    report = {}
+    with engine.connect() as conn:
+        for name, stmt in hot_queries().items():
+            sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            steps, scans = explain(conn, sql)
+            report[name] = {"ok": not scans, "plan": steps}
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--database-url", help="defaults to a throwaway SQLite database")
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every plan, not just failures")
+    args = ap.parse_args()
+
+    # app.db binds its engine at import time, so the URL has to be in place first
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='placemon-plans-')}/plans.db"
+    from app.db.db import engine
+    from app.db.migrations import upgrade
+    upgrade(engine)
+
+    report = check(engine)
+    for name, r in report.items():
+        print(f"{'ok  ' if r['ok'] else 'FAIL'} {name}")
+        if args.verbose or not r["ok"]:
+            for step in r["plan"]:
+                print(f"       {step}")
+    sys.exit(0 if all(r["ok"] for r in report.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
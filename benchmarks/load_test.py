@@ -0,0 +1,217 @@
+# benchmarks/load_test.py
+"""
+Drive the real FastAPI app (uvicorn app.main:app) against stub Judge0/OpenRouter servers
+and report throughput and p50/p95/p99 latency per endpoint.
+
+    python -m benchmarks.load_test --concurrency 8 --requests 200
+    python -m benchmarks.load_test --save-baseline            # write benchmarks/baseline.json
+    python -m benchmarks.load_test --compare benchmarks/baseline.json --tolerance 0.2
+
+Everything runs against a throwaway SQLite database; the app's own data file is not touched.
+Exits non-zero when --compare finds a regression beyond the tolerance.
+"""
+import argparse, json, os, platform, socket, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import httpx
+from benchmarks.stubs import StubConfig, start_stub
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "latest.json"
+
+QUESTION = {
+    "id": "bench-echo",
+    "title": "Echo",
+    "topics": ["io", "strings"],
+    "sample_testcases": [{"input": "1 2 3", "output": "1 2 3"}],
+    "hidden_testcases": [{"input": str(i), "output": str(i)} for i in range(4)],
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def scenarios(user_id: int):
+    # name -> (method, path, json body or None)
+    return {
+        "submit": ("POST", "/submissions/submit",
+                   {"user_id": user_id, "question": QUESTION, "source_code": "print(input())", "language_id": 71}),
+        "generate_question": ("GET", "/questions/generate-question?topic=arrays&difficulty=easy", None),
+        "plans_generate": ("POST", "/plans/generate",
+                           {"user_id": user_id, "hours_per_week": 8, "target_date": "2030-01-31",
+                            "preferred_days": ["Mon", "Wed", "Fri"], "goal": "bench"}),
+        "weak_topics": ("GET", f"/users/{user_id}/weak-topics", None),
+    }
+
+
+def run_scenario(base_url: str, method: str, path: str, body, requests: int, concurrency: int, timeout: float) -> dict:
+    # 429/503 are load shedding, not failures: counted as rejected and kept out of the percentiles
+    latencies, errors, rejected = [], 0, 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        nonlocal errors, rejected
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=base_url, timeout=timeout)
+        start = time.perf_counter()
+        status, retry_after = None, 0.0
+        try:
+            r = client.request(method, path, json=body)
+            status = r.status_code
+            retry_after = float(r.headers.get("retry-after", 0))
+        except httpx.HTTPError:
+            pass
+        elapsed = time.perf_counter() - start
+        if status in (429, 503):
+            with lock:
+                rejected += 1
+            # Back off like a well-behaved client instead of hammering the server
+            time.sleep(retry_after)
+            return
+        with lock:
+            latencies.append(elapsed)
+            if status is None or status >= 400:
+                errors += 1
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - wall
+    ms = [x * 1000 for x in latencies]
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rejected": rejected,
+        "throughput_rps": round((requests - rejected) / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, cur in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if base[key] > 0 and cur[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {cur[key]} > {base[key]} (+{tolerance:.0%})")
+        if base["throughput_rps"] > 0 and cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput_rps {cur['throughput_rps']} < {base['throughput_rps']} (-{tolerance:.0%})")
+        if cur["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {cur['errors']} > {base['errors']}")
+    return regressions
+
+
+def start_app(port: int, env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=str(ROOT), env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1.0)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become ready in 30s")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    ap.add_argument("--scenarios", default="submit,generate_question,plans_generate,weak_topics")
+    ap.add_argument("--judge0-latency-ms", type=float, default=20.0)
+    ap.add_argument("--llm-latency-ms", type=float, default=200.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    ap.add_argument("--save-baseline", action="store_true", help=f"also write results to {DEFAULT_BASELINE.name}")
+    ap.add_argument("--compare", help="baseline file to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    args = ap.parse_args()
+
+    judge0 = start_stub("judge0", 0, StubConfig(args.judge0_latency_ms, args.jitter_ms, args.error_rate, seed=1))
+    llm = start_stub("openrouter", 0, StubConfig(args.llm_latency_ms, args.jitter_ms, args.error_rate, seed=2))
+    tmp = tempfile.mkdtemp(prefix="placemon-bench-")
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{tmp}/bench.db",
+               SUBMISSIONS_LOG=f"{tmp}/submissions.jsonl",
+               JUDGE0_URL=f"http://127.0.0.1:{judge0.server_address[1]}",
+               OPENROUTER_URL=f"http://127.0.0.1:{llm.server_address[1]}/api/v1/chat/completions",
+               OPENROUTER_API_KEY="stub-key",
+               OR_MODEL="stub/model",
+               TRACE_SLOW_MS="1e9")
+    env.pop("OTEL_EXPORTER_OTLP_ENDPOINT", None)
+    # One client drives every request; lift its rate limits unless the caller set their own
+    env.setdefault("RATE_LIMITS", "execute=1e6/100000,submit=1e6/100000,generate=1e6/100000,plan=1e6/100000")
+    port = _free_port()
+    app = start_app(port, env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        user = httpx.post(f"{base_url}/users/", json={"email": "bench@example.com", "name": "Bench"}).json()
+        table = scenarios(user["id"])
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "concurrency": args.concurrency,
+                "requests_per_scenario": args.requests,
+                "judge0_latency_ms": args.judge0_latency_ms,
+                "llm_latency_ms": args.llm_latency_ms,
+                "error_rate": args.error_rate,
+            },
+            "scenarios": {},
+        }
+        for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+            method, path, body = table[name]
+            res = run_scenario(base_url, method, path, body, args.requests, args.concurrency, args.timeout)
+            results["scenarios"][name] = res
+            print(f"{name:<18} {res['throughput_rps']:>8.1f} req/s  p50 {res['p50_ms']:>8.1f}ms  "
+                  f"p95 {res['p95_ms']:>8.1f}ms  p99 {res['p99_ms']:>8.1f}ms  errors {res['errors']}  "
+                  f"rejected {res['rejected']}")
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        judge0.shutdown()
+        llm.shutdown()
+
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + "\n")
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(results, indent=2) + "\n")
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for r in regressions:
+            print("REGRESSION", r)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/otlp_collector_stub.py
+"""
+Local stand-in for an OTLP/HTTP collector: accepts POST /v1/traces (JSON) and prints one
+line per span, indented by depth. Point the API at it with
+
+    python -m benchmarks.otlp_collector_stub --port 4318
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://127.0.0.1:4318 uvicorn app.main:app
+"""
+import argparse, json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        if self.path != "/v1/traces":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        spans = [s for rs in body.get("resourceSpans", []) for ss in rs.get("scopeSpans", []) for s in ss.get("spans", [])]
+        self.received.extend(spans)
+        _print_spans(spans)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def _print_spans(spans):
+    by_parent = {}
+    for s in spans:
+        by_parent.setdefault(s.get("parentSpanId"), []).append(s)
+
+    def walk(parent, depth):
+        for s in sorted(by_parent.get(parent, []), key=lambda x: int(x["startTimeUnixNano"])):
+            ms = (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6
+            print(f"{'  ' * depth}{s['name']} {ms:.1f}ms trace={s['traceId'][:8]}")
+            walk(s["spanId"], depth + 1)
+    walk(None, 0)
+
+
+def serve(port: int) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer(("127.0.0.1", port), CollectorHandler)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=4318)
+    args = ap.parse_args()
+    print(f"OTLP collector stub on http://127.0.0.1:{args.port}/v1/traces")
+    serve(args.port).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
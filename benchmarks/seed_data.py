@@ -0,0 +1,180 @@
+# benchmarks/seed_data.py
+"""
+Bulk-load synthetic users, questions, submissions and submission_tests for scaling tests.
+
+    python -m benchmarks.seed_data --database-url sqlite:///benchmarks/results/scale.db \\
+        --users 100000 --questions 5000 --submissions-per-user 20 --tests-per-submission 8
+
+Works against SQLite or Postgres (any SQLAlchemy URL). Rows are inserted with Core
+executemany in batches inside large transactions; ids are assigned client-side so child
+rows never need a round trip. Distributions:
+  * submissions per user: exponential around --submissions-per-user (long tail of heavy users)
+  * question popularity: Zipf-like (--zipf-s), so a few questions get most submissions
+  * topics per question: uniform in [--min-topics, --max-topics] from a fixed topic pool
+"""
+import argparse, bisect, itertools, os, random, time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, func, insert, select
+from app.db import models
+from app.db.migrations import upgrade
+
+TOPICS = [
+    "arrays", "strings", "hashing", "two pointers", "sliding window", "binary search", "sorting",
+    "recursion", "backtracking", "dynamic programming", "greedy", "graphs", "trees", "heaps",
+    "stacks", "queues", "linked lists", "bit manipulation", "math", "percentages", "ratios",
+    "time and work", "probability", "permutations",
+]
+LANGUAGES = [71, 54, 62, 63]  # Python 3, C++, Java, JavaScript
+
+
+def _sqlite_fast_load(engine):
+    # Durability is irrelevant for a synthetic dataset; trade it for load speed
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.execute("PRAGMA cache_size=-200000")
+        cur.close()
+
+
+def _batched(it, n):
+    it = iter(it)
+    while True:
+        chunk = list(itertools.islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _next_id(conn, table, col="id"):
+    return (conn.execute(select(func.max(table.c[col]))).scalar() or 0) + 1
+
+
+def _zipf_cdf(n: int, s: float):
+    weights = [1.0 / (k ** s) for k in range(1, n + 1)]
+    total = sum(weights)
+    acc, cdf = 0.0, []
+    for w in weights:
+        acc += w / total
+        cdf.append(acc)
+    return cdf
+
+
+def seed(database_url: str, users: int, questions: int, submissions_per_user: float, tests_per_submission: int,
+         min_topics: int, max_topics: int, test_size: int, zipf_s: float, batch_size: int, seed_value: int) -> dict:
+    rnd = random.Random(seed_value)
+    engine = create_engine(database_url)
+    if engine.dialect.name == "sqlite":
+        _sqlite_fast_load(engine)
+    upgrade(engine)
+
+    t_users = models.User.__table__
+    t_questions = models.Question.__table__
+    t_subs = models.Submission.__table__
+    t_tests = models.SubmissionTest.__table__
+    now = datetime.utcnow()
+    counts = {"users": 0, "questions": 0, "submissions": 0, "submission_tests": 0}
+    started = time.perf_counter()
+    payload = "x" * max(0, test_size - 8)
+
+    with engine.begin() as conn:
+        uid0 = _next_id(conn, t_users)
+        user_ids = list(range(uid0, uid0 + users))
+        for chunk in _batched(user_ids, batch_size):
+            conn.execute(insert(t_users), [
+                {"id": u, "name": f"user{u}", "email": f"user{u}@example.com",
+                 "created_at": now - timedelta(days=rnd.randint(0, 365))}
+                for u in chunk
+            ])
+            counts["users"] += len(chunk)
+
+        # uid0 keeps question ids unique when seeding the same database more than once
+        question_ids = [f"synthetic-{uid0}-{i}" for i in range(questions)]
+        for chunk in _batched(question_ids, batch_size):
+            rows = []
+            for qid in chunk:
+                topics = rnd.sample(TOPICS, rnd.randint(min_topics, max_topics))
+                rows.append({
+                    "id": qid, "title": f"Synthetic {qid}", "difficulty": rnd.choice(["easy", "medium", "hard"]),
+                    "topics": topics,
+                    "raw": {"id": qid, "topics": topics,
+                            "sample_testcases": [{"input": "1", "output": "1"}], "hidden_testcases": []},
+                    "created_at": now - timedelta(days=rnd.randint(0, 365)),
+                })
+            conn.execute(insert(t_questions), rows)
+            counts["questions"] += len(rows)
+
+    cdf = _zipf_cdf(len(question_ids), zipf_s)
+    # Shuffle popularity ranks so "popular" is not correlated with insertion order
+    ranked = question_ids[:]
+    rnd.shuffle(ranked)
+
+    def submissions():
+        for u in user_ids:
+            n = int(rnd.expovariate(1.0 / submissions_per_user)) if submissions_per_user > 0 else 0
+            for _ in range(n):
+                yield u
+
+    with engine.begin() as conn:
+        sid = _next_id(conn, t_subs)
+        tid = _next_id(conn, t_tests)
+        for chunk in _batched(submissions(), batch_size):
+            subs, tests = [], []
+            for u in chunk:
+                qid = ranked[min(bisect.bisect_left(cdf, rnd.random()), len(ranked) - 1)]
+                total = tests_per_submission
+                skill = rnd.random()
+                results = [rnd.random() < skill for _ in range(total)]
+                passed = sum(results)
+                subs.append({
+                    "id": sid, "user_id": u, "question_id": qid, "language_id": rnd.choice(LANGUAGES),
+                    "score_percent": 100.0 * passed / total if total else 0.0, "passed": passed, "total": total,
+                    "created_at": now - timedelta(minutes=rnd.randint(0, 525600)),
+                })
+                for i, ok in enumerate(results):
+                    tests.append({
+                        "id": tid, "submission_id": sid, "test_index": i,
+                        "stdin": f"{i} {payload}", "expected": str(i), "stdout": str(i) if ok else "wrong",
+                        "stderr": None, "passed": ok, "time": round(rnd.uniform(0.005, 1.5), 3),
+                        "memory": rnd.randint(2000, 60000),
+                    })
+                    tid += 1
+                sid += 1
+            conn.execute(insert(t_subs), subs)
+            for tchunk in _batched(tests, batch_size * 4):
+                conn.execute(insert(t_tests), tchunk)
+            counts["submissions"] += len(subs)
+            counts["submission_tests"] += len(tests)
+
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    return dict(counts, seconds=round(elapsed, 2), rows_per_second=round(rows / elapsed) if elapsed else 0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--database-url", default="sqlite:///benchmarks/results/scale.db")
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--questions", type=int, default=2000)
+    ap.add_argument("--submissions-per-user", type=float, default=20.0, help="mean of an exponential distribution")
+    ap.add_argument("--tests-per-submission", type=int, default=8)
+    ap.add_argument("--min-topics", type=int, default=1)
+    ap.add_argument("--max-topics", type=int, default=3)
+    ap.add_argument("--test-size", type=int, default=32, help="approximate stdin size per test row, in chars")
+    ap.add_argument("--zipf-s", type=float, default=1.1, help="question popularity skew")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    if args.database_url.startswith("sqlite:///"):
+        path = args.database_url[len("sqlite:///"):]
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    out = seed(args.database_url, args.users, args.questions, args.submissions_per_user, args.tests_per_submission,
+               args.min_topics, args.max_topics, args.test_size, args.zipf_s, args.batch_size, args.seed)
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
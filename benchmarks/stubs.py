@@ -0,0 +1,160 @@
+# benchmarks/stubs.py
+"""
+Local stand-ins for the Judge0 submissions API and the OpenRouter chat completions API,
+with configurable latency and error rates.
+
+    python -m benchmarks.stubs --judge0-port 2358 --openrouter-port 8081 --latency-ms 50 --error-rate 0.01
+
+Judge0 echoes stdin as stdout (the load-test question is an identity problem), and
+OpenRouter answers question generation, feedback and plan enrichment prompts with
+schema-valid content.
+"""
+import argparse, json, random, threading, time, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def delay_and_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            jitter = self._rnd.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self._rnd.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+        return fail
+
+
+_STORY_WORDS = ("warehouse", "robot", "festival", "river", "library", "market", "satellite", "garden",
+                "tournament", "museum", "railway", "orchard", "harbor", "bakery", "observatory", "canyon",
+                "glacier", "theatre", "vineyard", "lighthouse", "monastery", "stadium", "volcano", "ferry",
+                "carnival", "quarry", "aquarium", "cathedral", "meadow", "refinery", "bazaar", "citadel")
+
+
+def _question(topic: str) -> dict:
+    # A different backstory each time, so generated questions are not near-duplicates of each other
+    story = " ".join(random.sample(_STORY_WORDS, 10))
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"Echo the {topic} input",
+        "description": f"In the {story} log, read the input and print it unchanged.",
+        "topics": [topic, "io"],
+        "estimated_time_min": 10,
+        "input_format": "Any text",
+        "output_format": "The same text",
+        "constraints": "1 <= length <= 10^5",
+        "sample_testcases": [{"input": "1 2 3", "output": "1 2 3"}, {"input": "x", "output": "x"}],
+        "hidden_testcases": [{"input": str(i), "output": str(i)} for i in range(4)],
+        "hints": ["Read all of stdin.", "Print it back."],
+        "canonical_solution": "import sys\nprint(sys.stdin.read(), end='')",
+    }
+
+
+def _chat_content(messages: list) -> str:
+    def text(m):
+        c = m.get("content")
+        if isinstance(c, list):
+            return " ".join(part.get("text", "") for part in c)
+        return c or ""
+    system = text(messages[0]) if messages else ""
+    user = text(messages[-1]) if messages else ""
+    if "question generator" in system:
+        topic = "arrays"
+        for line in user.splitlines():
+            if line.startswith("Topic:"):
+                topic = line.split(":", 1)[1].strip() or topic
+        return json.dumps(_question(topic))
+    if "study activities" in system:
+        drafts = json.loads(user)
+        return json.dumps({"activities": [f"Focused session: {d['activity']}" for d in drafts]})
+    if "Repair" in system:
+        return user
+    if "coding tutor" in system:
+        return "Check your input parsing. Consider edge cases with empty input."
+    return "{}"
+
+
+def _handler(kind: str, config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; without this, keep-alive clients hit Nagle/delayed-ACK stalls
+        disable_nagle_algorithm = True
+
+        def _reply(self, code: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if code == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if config.delay_and_fail():
+                self._reply(random.choice((429, 500, 503)), {"error": "stub failure"})
+                return
+            if kind == "judge0":
+                if not self.path.startswith("/submissions"):
+                    self._reply(404, {"error": "not found"})
+                    return
+                self._reply(201, {
+                    "stdout": payload.get("stdin", ""),
+                    "stderr": None,
+                    "status": {"id": 3, "description": "Accepted"},
+                    "time": "0.010",
+                    "memory": 3200,
+                })
+            else:
+                if not self.path.endswith("/chat/completions"):
+                    self._reply(404, {"error": "not found"})
+                    return
+                content = _chat_content(payload.get("messages", []))
+                self._reply(200, {"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(kind: str, port: int, config: StubConfig) -> ThreadingHTTPServer:
+    """Start a stub server ("judge0" or "openrouter") in a daemon thread; port 0 picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(kind, config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"{kind}-stub", daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--judge0-port", type=int, default=2358)
+    ap.add_argument("--openrouter-port", type=int, default=8081)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    j = start_stub("judge0", args.judge0_port, StubConfig(args.latency_ms, args.jitter_ms, args.error_rate, seed=1))
+    o = start_stub("openrouter", args.openrouter_port, StubConfig(args.latency_ms * 10, args.jitter_ms, args.error_rate, seed=2))
+    print(f"JUDGE0_URL=http://127.0.0.1:{j.server_address[1]}")
+    print(f"OPENROUTER_URL=http://127.0.0.1:{o.server_address[1]}/api/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()